@@ -0,0 +1,191 @@
+"""
+Extrator da Amazon sem Chrome
+A página de produto já traz no HTML tudo o que o Selenium buscava:
+- colorImages/ImageBlockATF: JSON com as imagens da galeria em hiRes
+- data-a-dynamic-image do #landingImage: {url: [largura, altura]}
+- #productTitle, preço (a-offscreen / a-price-whole + a-price-fraction) e descrição
+A leitura é feita com expressões regulares sobre o HTML bruto (a página tem
+centenas de KB; montar a árvore custaria mais que o download). Se a Amazon
+responder com captcha/página de robô, levanta AmazonRobotCheck para que a
+corrida de estratégias caia no Selenium.
+"""
+
+import re
+import json
+import html
+
+from http_client import http_get
+from store_registry import proxies_for
+from metrics import stage
+from structured_logging import get_logger
+
+log = get_logger('amazon')
+
+# Marcas da página de verificação de robô (validateCaptcha) em inglês e português
+_ROBOT_MARKERS = (
+    b'/errors/validateCaptcha',
+    b'captchacharacters',
+    b'Type the characters you see in this image',
+    b'Digite os caracteres que voc',
+    b'api-services-support@amazon.com',
+)
+
+_TITLE_RE = re.compile(r'<span[^>]*\bid="productTitle"[^>]*>(.*?)</span>', re.S)
+_PRICE_AMOUNT_RE = re.compile(r'"priceAmount"\s*:\s*(\d+(?:\.\d+)?)')
+_CORE_PRICE_RE = re.compile(
+    r'id="(?:corePrice_feature_div|corePriceDisplay_desktop_feature_div|corePrice_desktop)"(.{0,4000})', re.S
+)
+_OFFSCREEN_RE = re.compile(r'<span class="a-offscreen">\s*([^<]+?)\s*</span>')
+_WHOLE_FRACTION_RE = re.compile(
+    r'<span class="a-price-whole">\s*([\d.,]+?)\s*(?:<span class="a-price-decimal">[.,]</span>)?\s*</span>'
+    r'\s*<span class="a-price-fraction">\s*(\d+)\s*</span>'
+)
+_DESCRIPTION_RE = re.compile(r'<div[^>]*\bid="productDescription"[^>]*>(.*?)</div>', re.S)
+_FEATURE_BULLETS_RE = re.compile(r'<div[^>]*\bid="feature-bullets"[^>]*>(.*?)</div>', re.S)
+_COLOR_IMAGES_RE = re.compile(r'[\'"]colorImages[\'"]\s*:\s*\{\s*[\'"]initial[\'"]\s*:\s*\[')
+_HIRES_RE = re.compile(r'"hiRes"\s*:\s*"(https?://[^"]+)"')
+_LANDING_IMAGE_RE = re.compile(r'<img[^>]*\bid="landingImage"[^>]*>', re.S)
+_DYNAMIC_IMAGE_RE = re.compile(r'data-a-dynamic-image="([^"]+)"')
+_OLD_HIRES_RE = re.compile(r'data-old-hires="(https?://[^"]+)"')
+_TAG_RE = re.compile(r'<[^>]+>')
+_SPACES_RE = re.compile(r'\s+')
+# ID da imagem na CDN (m.media-amazon.com/images/I/<id>._AC_SL1500_.jpg)
+_IMAGE_ID_RE = re.compile(r'/images/I/([^./]+)')
+
+
+class AmazonRobotCheck(Exception):
+    """A Amazon respondeu com captcha/página de verificação de robô"""
+
+
+def is_robot_page(content, status_code=200):
+    """Detecta a página de captcha (a Amazon às vezes a entrega com status 200)"""
+    if status_code == 503:
+        return True
+    head = content[:200_000]
+    return any(marker in head for marker in _ROBOT_MARKERS)
+
+
+def _clean_text(fragment):
+    return _SPACES_RE.sub(' ', html.unescape(_TAG_RE.sub(' ', fragment))).strip()
+
+
+def _image_id(url):
+    match = _IMAGE_ID_RE.search(url)
+    return match.group(1) if match else url
+
+
+def _color_images(text):
+    """URLs hiRes (ou large) do bloco colorImages.initial, na ordem da galeria"""
+    match = _COLOR_IMAGES_RE.search(text)
+    if not match:
+        return []
+    # Recortar o array com contagem de colchetes (o JSON fica dentro de um script maior)
+    start = match.end() - 1
+    depth = 0
+    for index in range(start, min(len(text), start + 500_000)):
+        char = text[index]
+        if char == '[':
+            depth += 1
+        elif char == ']':
+            depth -= 1
+            if depth == 0:
+                break
+    else:
+        return _HIRES_RE.findall(text)
+    try:
+        entries = json.loads(text[start:index + 1])
+    except ValueError:
+        return _HIRES_RE.findall(text[start:index + 1])
+    return [entry.get('hiRes') or entry.get('large') for entry in entries
+            if isinstance(entry, dict) and (entry.get('hiRes') or entry.get('large'))]
+
+
+def _landing_images(text):
+    """Maior variante do data-a-dynamic-image do #landingImage e o data-old-hires"""
+    tag = _LANDING_IMAGE_RE.search(text)
+    if not tag:
+        return []
+    urls = []
+    dynamic = _DYNAMIC_IMAGE_RE.search(tag.group(0))
+    if dynamic:
+        try:
+            sizes = json.loads(html.unescape(dynamic.group(1)))
+            urls.append(max(sizes, key=lambda url: sizes[url][0] * sizes[url][1]))
+        except (ValueError, TypeError, IndexError):
+            pass
+    old_hires = _OLD_HIRES_RE.search(tag.group(0))
+    if old_hires:
+        urls.append(old_hires.group(1))
+    return urls
+
+
+def _price_text(text):
+    """Preço como texto ('R$ 1.299,90' ou '1299.90'), ou None"""
+    amount = _PRICE_AMOUNT_RE.search(text)
+    if amount:
+        return amount.group(1)
+    core = _CORE_PRICE_RE.search(text)
+    region = core.group(1) if core else text
+    offscreen = _OFFSCREEN_RE.search(region)
+    if offscreen and re.search(r'\d', offscreen.group(1)):
+        return html.unescape(offscreen.group(1))
+    whole = _WHOLE_FRACTION_RE.search(region)
+    if whole:
+        return f"{whole.group(1).rstrip('.,')},{whole.group(2)}"
+    return None
+
+
+def parse_amazon_page(content):
+    """
+    Lê título, preço, descrição e imagens do HTML da página de produto
+
+    Args:
+        content (bytes | str): HTML da página
+
+    Returns:
+        dict: {'title', 'price' (texto), 'description', 'images' (hiRes, sem repetir), 'sources'}
+    """
+    text = content.decode('utf-8', errors='replace') if isinstance(content, bytes) else content
+
+    title = _TITLE_RE.search(text)
+    description = _DESCRIPTION_RE.search(text) or _FEATURE_BULLETS_RE.search(text)
+
+    images, seen, sources = [], set(), []
+    for source, urls in (('color_images', _color_images(text)), ('landing_image', _landing_images(text))):
+        added = 0
+        for url in urls:
+            image_id = _image_id(url)
+            if image_id not in seen:
+                seen.add(image_id)
+                images.append(url)
+                added += 1
+        if added:
+            sources.append(source)
+
+    return {
+        'title': _clean_text(title.group(1)) if title else None,
+        'price': _price_text(text),
+        'description': _clean_text(description.group(1))[:1000] if description else None,
+        'images': images,
+        'sources': sources,
+    }
+
+
+def fetch_amazon_product(url):
+    """
+    Baixa a página de produto pelo pool HTTP e extrai os dados
+
+    Raises:
+        AmazonRobotCheck: captcha/página de robô (usar o Selenium)
+        requests.RequestException: erro de rede ou status HTTP de erro
+    """
+    response = http_get(url, profile='amazon', timeout=20, proxies=proxies_for(url))
+    if is_robot_page(response.content, response.status_code):
+        log.warning("Captcha/página de robô da Amazon", extra={'url': url, 'status_code': response.status_code})
+        raise AmazonRobotCheck(url)
+    response.raise_for_status()
+    with stage('parse', store='amazon', strategy='amazon_http'):
+        data = parse_amazon_page(response.content)
+    log.info(f"Amazon via HTTP: {len(data['images'])} imagens ({', '.join(data['sources']) or 'nenhuma fonte'})",
+             extra={'url': url})
+    return data
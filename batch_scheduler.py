@@ -0,0 +1,90 @@
+"""
+Agendador das extrações em lote
+- Limite de concorrência por host (politeza com cada loja)
+- Limite por executor: itens que usam Chrome disputam só as vagas do pool
+  pesado, então lojas que dependem de Chrome (Amazon) não seguram as que
+  usam só requests (API do Mercado Livre, meta tags genéricas)
+- Ordem intercalada entre plataformas, para todas as lojas avançarem juntas
+"""
+
+import os
+import asyncio
+from collections import OrderedDict
+from urllib.parse import urlparse
+
+BATCH_MAX_URLS = int(os.getenv('BATCH_MAX_URLS', '50'))
+BATCH_PER_HOST_CONCURRENCY = int(os.getenv('BATCH_PER_HOST_CONCURRENCY', '2'))
+
+
+def interleave_by_group(items, group_of):
+    """
+    Reordena os itens alternando entre os grupos (round-robin)
+
+    Args:
+        items (list): Itens a ordenar
+        group_of: Função que retorna o grupo (ex.: plataforma) de um item
+
+    Returns:
+        list: Itens intercalados, preservando a ordem dentro de cada grupo
+    """
+    groups = OrderedDict()
+    for item in items:
+        groups.setdefault(group_of(item), []).append(item)
+    ordered = []
+    queues = list(groups.values())
+    while queues:
+        for queue in queues:
+            ordered.append(queue.pop(0))
+        queues = [q for q in queues if q]
+    return ordered
+
+
+class BatchScheduler:
+    """Controla a concorrência dos itens de lote por host e por executor"""
+
+    def __init__(self, per_host=BATCH_PER_HOST_CONCURRENCY):
+        self.per_host = max(1, per_host)
+        # host -> [semáforo, itens usando o host]; a entrada sai quando o último item termina
+        self._host_semaphores = {}
+        self._executor_semaphores = {}
+
+    @staticmethod
+    def _host_of(url):
+        return (urlparse(url).netloc or '').lower()
+
+    def _acquire_host(self, host):
+        entry = self._host_semaphores.get(host)
+        if entry is None:
+            entry = self._host_semaphores[host] = [asyncio.Semaphore(self.per_host), 0]
+        entry[1] += 1
+        return entry[0]
+
+    def _release_host(self, host):
+        entry = self._host_semaphores[host]
+        entry[1] -= 1
+        if entry[1] == 0:
+            del self._host_semaphores[host]
+
+    def _executor_semaphore(self, executor):
+        semaphore = self._executor_semaphores.get(executor.name)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(executor.max_workers)
+            self._executor_semaphores[executor.name] = semaphore
+        return semaphore
+
+    async def run(self, url, executor, factory):
+        """
+        Executa factory() respeitando os limites do host e do executor
+
+        Args:
+            url (str): URL do item (define o host)
+            executor: BoundedExecutor que fará o trabalho
+            factory: Função sem argumentos que retorna a corrotina do item
+        """
+        host = self._host_of(url)
+        try:
+            async with self._acquire_host(host):
+                async with self._executor_semaphore(executor):
+                    return await factory()
+        finally:
+            self._release_host(host)
@@ -0,0 +1,228 @@
+"""
+Loja falsa local para os benchmarks
+Serve as páginas gravadas em fixtures/ e a API do Mercado Livre, e também
+funciona como proxy HTTP: com HTTP_PROXY/PROXY_HOST apontando para ela, as
+URLs reais das lojas (http://www.amazon.com.br/dp/...) são atendidas
+localmente, sem rede. Imagens são geradas na hora (cabeçalho JPEG/PNG/WebP/GIF
+válido com dimensões determinísticas), com suporte a HEAD e Range.
+
+Páginas e JSON respeitam o Accept-Encoding como as lojas reais (br > gzip >
+deflate), então os perfis de headers passam pela descompressão do cliente.
+"""
+
+import os
+import re
+import json
+import time
+import struct
+import zlib
+import gzip
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+import brotli
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+# (host, prefixo do caminho, fixture, content-type)
+PAGE_ROUTES = [
+    ('www.amazon.com.br', '/dp/', 'amazon_product.html', 'text/html; charset=utf-8'),
+    ('produto.mercadolivre.com.br', '/MLB-', 'mercadolivre_product.html', 'text/html; charset=utf-8'),
+    ('www.kabum.com.br', '/produto/', 'kabum_product.html', 'text/html; charset=utf-8'),
+    ('pt.aliexpress.com', '/item/', 'aliexpress_product.html', 'text/html; charset=utf-8'),
+    ('shopee.com.br', '/', 'shopee_product.html', 'text/html; charset=utf-8'),
+    ('loja.exemplo.com.br', '/produto/', 'generic_product.html', 'text/html; charset=utf-8'),
+]
+ML_API_HOST = 'api.mercadolibre.com'
+
+_IMAGE_PATH_RE = re.compile(r'\.(jpe?g|png|webp|gif|avif)(?:$|[?_])|/file/', re.I)
+_DIMENSIONS_RE = re.compile(r'(\d{3,4})[x-](\d{3,4})')
+
+
+def encode_body(body, accept_encoding):
+    """(corpo, Content-Encoding) pela preferência br > gzip > deflate do cliente"""
+    accepted = {token.split(';')[0].strip().lower() for token in (accept_encoding or '').split(',')}
+    if 'br' in accepted:
+        return brotli.compress(body, quality=1), 'br'
+    if 'gzip' in accepted:
+        return gzip.compress(body, compresslevel=1, mtime=0), 'gzip'
+    if 'deflate' in accepted:
+        return zlib.compress(body, 1), 'deflate'
+    return body, None
+
+
+def _fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name), 'rb') as f:
+        return f.read()
+
+
+def image_spec(path):
+    """Formato, dimensões e tamanho determinísticos para o caminho da imagem"""
+    checksum = zlib.crc32(path.encode())
+    lower = path.lower()
+    fmt = next((ext for ext in ('png', 'webp', 'gif') if f'.{ext}' in lower), 'jpeg')
+    match = _DIMENSIONS_RE.search(path)
+    if match:
+        width, height = int(match.group(1)), int(match.group(2))
+    elif 'thumb' in lower or '_us40_' in lower or '80x80' in lower:
+        width = height = 80
+    else:
+        width = 500 + checksum % 1000
+        height = 500 + (checksum >> 10) % 1000
+    size = 20_000 + checksum % 300_000
+    if width <= 100:
+        size = 2_000 + checksum % 3_000
+    return fmt, width, height, size
+
+
+def image_bytes(fmt, width, height, size):
+    """Cabeçalho válido do formato seguido de preenchimento até size bytes"""
+    if fmt == 'png':
+        ihdr = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+        header = b'\x89PNG\r\n\x1a\n' + struct.pack('>I', 13) + b'IHDR' + ihdr + struct.pack('>I', zlib.crc32(b'IHDR' + ihdr))
+        content_type = 'image/png'
+    elif fmt == 'webp':
+        chunk = b'VP8X' + struct.pack('<I', 10) + b'\x00\x00\x00\x00' + (width - 1).to_bytes(3, 'little') + (height - 1).to_bytes(3, 'little')
+        header = b'RIFF' + struct.pack('<I', size - 8) + b'WEBP' + chunk
+        content_type = 'image/webp'
+    elif fmt == 'gif':
+        header = b'GIF89a' + struct.pack('<HH', width, height) + b'\x00\x00\x00'
+        content_type = 'image/gif'
+    else:
+        app0 = b'\xff\xe0' + struct.pack('>H', 16) + b'JFIF\x00\x01\x01\x00\x00\x01\x00\x01\x00\x00'
+        sof0 = b'\xff\xc0' + struct.pack('>HBHHB', 17, 8, height, width, 3) + b'\x01\x22\x00\x02\x11\x01\x03\x11\x01'
+        header = b'\xff\xd8' + app0 + sof0
+        content_type = 'image/jpeg'
+    body = header + b'\x00' * max(0, size - len(header) - 2) + (b'\xff\xd9' if fmt == 'jpeg' else b'\x00\x00')
+    return body, content_type
+
+
+class FakeStoreHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_version = 'FakeStore/1.0'
+    # Cabeçalhos e corpo saem em escritas separadas: sem TCP_NODELAY o ACK atrasado soma ~40ms
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _target(self):
+        # Requisição via proxy traz a URL absoluta; direta traz só o caminho + Host
+        if self.path.startswith('http://') or self.path.startswith('https://'):
+            parts = urlsplit(self.path)
+            return (parts.hostname or '').lower(), parts.path, parts.query
+        parts = urlsplit(self.path)
+        host = (self.headers.get('Host') or '').split(':')[0].lower()
+        return host, parts.path, parts.query
+
+    def _send(self, status, body, content_type, extra_headers=None, head_only=False):
+        if not content_type.startswith('image/'):
+            body, encoding = encode_body(body, self.headers.get('Accept-Encoding'))
+            if encoding:
+                extra_headers = dict(extra_headers or {}, **{'Content-Encoding': encoding, 'Vary': 'Accept-Encoding'})
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (extra_headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if not head_only:
+            self.wfile.write(body)
+        self.server.count(len(body) if not head_only else 0)
+
+    def _route(self, head_only=False):
+        latency = self.server.latency
+        if latency:
+            time.sleep(latency)
+        host, path, query = self._target()
+
+        if host == ML_API_HOST:
+            return self._ml_api(path, query, head_only)
+
+        if _IMAGE_PATH_RE.search(path):
+            return self._image(path, head_only)
+
+        for route_host, prefix, fixture, content_type in PAGE_ROUTES:
+            if host == route_host and path.startswith(prefix):
+                return self._send(200, _fixture(fixture), content_type, head_only=head_only)
+
+        self._send(404, b'not found', 'text/plain', head_only=head_only)
+
+    def _image(self, path, head_only):
+        fmt, width, height, size = image_spec(path)
+        body, content_type = image_bytes(fmt, width, height, size)
+        headers = {'Accept-Ranges': 'bytes', 'Cache-Control': 'max-age=86400'}
+        range_header = self.headers.get('Range')
+        match = re.match(r'bytes=(\d+)-(\d*)', range_header or '')
+        if match:
+            start = int(match.group(1))
+            end = min(int(match.group(2)) if match.group(2) else len(body) - 1, len(body) - 1)
+            headers['Content-Range'] = f'bytes {start}-{end}/{len(body)}'
+            return self._send(206, body[start:end + 1], content_type, headers, head_only)
+        self._send(200, body, content_type, headers, head_only)
+
+    def _ml_api(self, path, query, head_only):
+        item = json.loads(_fixture('mercadolivre_item.json'))
+        if path == '/items' and query:
+            ids = parse_qs(query).get('ids', [''])[0].split(',')
+            entries = [{'code': 200, 'body': dict(item, id=item_id)} for item_id in ids if item_id]
+            return self._send(200, json.dumps(entries).encode(), 'application/json', head_only=head_only)
+        match = re.match(r'/items/(ML[A-Z]{1,2}\d+)(/description)?$', path)
+        if match:
+            if match.group(2):
+                return self._send(200, _fixture('mercadolivre_description.json'), 'application/json', head_only=head_only)
+            return self._send(200, json.dumps(dict(item, id=match.group(1))).encode(), 'application/json', head_only=head_only)
+        if path.startswith('/users/'):
+            return self._send(200, _fixture('mercadolivre_user.json'), 'application/json', head_only=head_only)
+        self._send(404, b'{"error": "not_found"}', 'application/json', head_only=head_only)
+
+    def do_GET(self):
+        self._route()
+
+    def do_HEAD(self):
+        self._route(head_only=True)
+
+    def do_CONNECT(self):
+        # HTTPS exigiria interceptar TLS: os benchmarks usam só URLs http://
+        self.send_response(502)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+
+class FakeStoreServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port=0, latency=0.0):
+        super().__init__(('127.0.0.1', port), FakeStoreHandler)
+        self.latency = latency
+        self.requests = 0
+        self.bytes_sent = 0
+        self._lock = threading.Lock()
+
+    def count(self, body_bytes):
+        with self._lock:
+            self.requests += 1
+            self.bytes_sent += body_bytes
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server_address[1]}'
+
+
+def start_fake_store(port=0, latency=0.0):
+    """Sobe a loja falsa em uma thread; retorna o servidor (server.url, server.shutdown())"""
+    server = FakeStoreServer(port, latency)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Loja falsa/proxy HTTP com as fixtures dos benchmarks')
+    parser.add_argument('--port', type=int, default=8899)
+    parser.add_argument('--latency-ms', type=float, default=0.0)
+    args = parser.parse_args()
+    server = FakeStoreServer(args.port, args.latency_ms / 1000)
+    print(f"🏪 Loja falsa em {server.url} (use como HTTP_PROXY)")
+    server.serve_forever()
@@ -0,0 +1,285 @@
+"""
+Benchmark offline dos extratores
+Sobe a loja falsa (fake_store.py) como servidor e proxy HTTP, aponta os
+proxies/variáveis de ambiente para ela e executa extract_product_images,
+extract_seo_meta_tags e extract_product de ponta a ponta (inclusive as
+sondagens das imagens) contra as páginas gravadas em fixtures/.
+
+Relata vazão, latência p50/p95/p99 e pico de RSS por cenário e compara
+com benchmarks/baseline.json.
+
+Uso:
+    python benchmarks/run.py                      # roda e compara com o baseline
+    python benchmarks/run.py --save-baseline      # grava o resultado como novo baseline
+    python benchmarks/run.py --scenarios images:amazon,product:mercadolivre -n 50 -c 8
+"""
+
+import os
+import sys
+import json
+import time
+import math
+import argparse
+import resource
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from fake_store import start_fake_store
+
+BASELINE_PATH = os.path.join(BENCH_DIR, 'baseline.json')
+
+# URLs reais das lojas (http://, atendidas pela loja falsa via proxy)
+STORE_URLS = {
+    'amazon': 'http://www.amazon.com.br/dp/B0BENCH001',
+    'mercadolivre': 'http://produto.mercadolivre.com.br/MLB-3456789012-smartphone-modelo-x-128gb-preto-_JM',
+    'kabum': 'http://www.kabum.com.br/produto/512345/notebook-gamer-modelo-z',
+    'aliexpress': 'http://pt.aliexpress.com/item/1005001234567890.html',
+    'shopee': 'http://shopee.com.br/Tenis-Esportivo-Modelo-R-i.123.456',
+    'generic': 'http://loja.exemplo.com.br/produto/cafeteira-eletrica-modelo-c',
+}
+
+
+def configure_environment(server_url, verbose=False):
+    """Variáveis lidas na importação dos módulos: precisam vir antes dos imports do app"""
+    port = server_url.rsplit(':', 1)[1]
+    os.environ.update({
+        'CHROME_ENABLED': '0',
+        'HTTP_PROXY': server_url,
+        'http_proxy': server_url,
+        'HTTPS_PROXY': server_url,
+        'https_proxy': server_url,
+        'NO_PROXY': '',
+        'no_proxy': '',
+        'PROXY_HOST': '127.0.0.1',
+        'PROXY_PORT': port,
+        'PROXY_USER': 'bench',
+        'PROXY_PASS': 'bench',
+        'MERCADOLIVRE_API_URL': 'http://api.mercadolibre.com',
+        # Ordem fixa das estratégias: resultados comparáveis entre execuções
+        'ROUTER_EXPLORE_RATE': '0',
+        'ROUTER_MIN_SAMPLES': '1000000',
+        'METRICS_ENABLED': '1',
+        # Logs dos extratores só com --verbose (a escrita no terminal distorce a medição)
+        'LOG_LEVEL': 'DEBUG' if verbose else 'WARNING',
+        'LOG_FORMAT': 'text',
+    })
+
+
+def build_scenarios():
+    from image_extractor import extract_product_images
+    from seo_extractor import extract_seo_meta_tags
+    from product_extractor import extract_product
+
+    def images(url):
+        result = extract_product_images(url)
+        return bool(result and result.get('images'))
+
+    def seo(url):
+        result = extract_seo_meta_tags(url)
+        return bool(result and result.get('status') == 'success' and result.get('image'))
+
+    def product(url):
+        result = extract_product(url)
+        return bool(result and result.status != 'error' and result.title)
+
+    scenarios = {}
+    for store, url in STORE_URLS.items():
+        scenarios[f'images:{store}'] = (images, url)
+        scenarios[f'seo:{store}'] = (seo, url)
+        scenarios[f'product:{store}'] = (product, url)
+    return scenarios
+
+
+def percentile(sorted_values, p):
+    """Percentil pelo método nearest-rank"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(p / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def peak_rss_mb():
+    # ru_maxrss em KB no Linux e em bytes no macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def run_scenario(fn, url, iterations, concurrency, warmup):
+    def timed():
+        start = time.perf_counter()
+        try:
+            ok = fn(url)
+        except Exception:
+            ok = False
+        return time.perf_counter() - start, ok
+
+    for _ in range(warmup):
+        timed()
+
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        samples = list(executor.map(lambda _: timed(), range(iterations)))
+    wall = time.perf_counter() - wall_start
+
+    latencies = sorted(seconds * 1000 for seconds, _ in samples)
+    return {
+        'iterations': iterations,
+        'errors': sum(1 for _, ok in samples if not ok),
+        'throughput_rps': round(iterations / wall, 2) if wall else 0.0,
+        'p50_ms': round(percentile(latencies, 50), 2),
+        'p95_ms': round(percentile(latencies, 95), 2),
+        'p99_ms': round(percentile(latencies, 99), 2),
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def median_run(runs):
+    """Mediana de cada métrica entre as repetições (reduz o ruído de uma rodada isolada)"""
+    merged = dict(runs[0])
+    for key in ('throughput_rps', 'p50_ms', 'p95_ms', 'p99_ms'):
+        merged[key] = round(statistics.median(run[key] for run in runs), 2)
+    merged['errors'] = max(run['errors'] for run in runs)
+    merged['peak_rss_mb'] = max(run['peak_rss_mb'] for run in runs)
+    merged['repeats'] = len(runs)
+    return merged
+
+
+# Parâmetros que mudam as latências medidas: com valores diferentes dos do
+# baseline a comparação não diz nada
+COMPARABLE_CONFIG_KEYS = ('iterations', 'concurrency', 'latency_ms')
+
+
+def config_mismatches(config, baseline_config):
+    """Lista de parâmetros (COMPARABLE_CONFIG_KEYS) diferentes dos do baseline"""
+    return [f"{key}: {baseline_config.get(key)} -> {config.get(key)}"
+            for key in COMPARABLE_CONFIG_KEYS if config.get(key) != baseline_config.get(key)]
+
+
+def compare(results, baseline, tolerance):
+    """
+    Lista de regressões em relação ao baseline
+
+    p50 e vazão usam a tolerância; o p95, mais ruidoso com poucas execuções,
+    usa o dobro. Qualquer erro novo também conta como regressão.
+    """
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get('scenarios', {}).get(name)
+        if not previous:
+            continue
+        for key, slack in (('p50_ms', tolerance), ('p95_ms', 2 * tolerance)):
+            if previous[key] and current[key] > previous[key] * (1 + slack):
+                regressions.append(f"{name} {key}: {previous[key]:.1f} -> {current[key]:.1f}")
+        if previous['throughput_rps'] and current['throughput_rps'] < previous['throughput_rps'] / (1 + tolerance):
+            regressions.append(f"{name} throughput_rps: {previous['throughput_rps']:.1f} -> {current['throughput_rps']:.1f}")
+        if current['errors'] > previous['errors']:
+            regressions.append(f"{name} errors: {previous['errors']} -> {current['errors']}")
+    return regressions
+
+
+def print_table(results, baseline):
+    previous = baseline.get('scenarios', {}) if baseline else {}
+    header = f"{'cenário':<24}{'n':>5}{'erros':>7}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'Δp50':>9}"
+    print(header)
+    print('-' * len(header))
+    for name, r in results.items():
+        delta = ''
+        if name in previous and previous[name]['p50_ms']:
+            delta = f"{(r['p50_ms'] / previous[name]['p50_ms'] - 1) * 100:+.0f}%"
+        print(f"{name:<24}{r['iterations']:>5}{r['errors']:>7}{r['throughput_rps']:>9.1f}"
+              f"{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}{r['p99_ms']:>10.1f}{delta:>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark offline dos extratores contra a loja falsa')
+    parser.add_argument('-n', '--iterations', type=int, default=50, help='execuções medidas por cenário')
+    parser.add_argument('-c', '--concurrency', type=int, default=4, help='execuções simultâneas')
+    parser.add_argument('-r', '--repeat', type=int, default=3, help='rodadas por cenário (vale a mediana)')
+    parser.add_argument('--warmup', type=int, default=3, help='execuções descartadas por cenário')
+    parser.add_argument('--latency-ms', type=float, default=20.0, help='latência simulada da loja falsa')
+    parser.add_argument('--scenarios', default='', help='lista separada por vírgula (padrão: todos)')
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save-baseline', action='store_true', help='grava o resultado como baseline')
+    parser.add_argument('--force-compare', action='store_true',
+                        help='compara mesmo com iterações/concorrência/latência diferentes das do baseline')
+    parser.add_argument('--tolerance', type=float, default=0.5, help='folga antes de acusar regressão')
+    parser.add_argument('--json', dest='json_path', help='grava o resultado completo em JSON')
+    parser.add_argument('--verbose', action='store_true', help='mostra os logs dos extratores')
+    args = parser.parse_args()
+
+    server = start_fake_store(latency=args.latency_ms / 1000)
+    configure_environment(server.url, args.verbose)
+    scenarios = build_scenarios()
+    selected = [s.strip() for s in args.scenarios.split(',') if s.strip()] or list(scenarios)
+    unknown = [s for s in selected if s not in scenarios]
+    if unknown:
+        parser.error(f"cenários desconhecidos: {', '.join(unknown)} (disponíveis: {', '.join(scenarios)})")
+
+    results = {}
+    started = time.perf_counter()
+    for name in selected:
+        fn, url = scenarios[name]
+        runs = [run_scenario(fn, url, args.iterations, args.concurrency, args.warmup if i == 0 else 0)
+                for i in range(max(1, args.repeat))]
+        results[name] = median_run(runs)
+        print(f"⏱️ {name}: p50 {results[name]['p50_ms']:.1f} ms, {results[name]['errors']} erros", file=sys.stderr)
+
+    report = {
+        'config': {
+            'iterations': args.iterations,
+            'concurrency': args.concurrency,
+            'repeat': args.repeat,
+            'warmup': args.warmup,
+            'latency_ms': args.latency_ms,
+            'python': sys.version.split()[0],
+        },
+        'duration_s': round(time.perf_counter() - started, 2),
+        'peak_rss_mb': peak_rss_mb(),
+        'fake_store': {'requests': server.requests, 'bytes_sent': server.bytes_sent},
+        'scenarios': results,
+    }
+    server.shutdown()
+
+    baseline = None
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    print_table(results, baseline)
+    print(f"\nDuração: {report['duration_s']}s | pico de RSS: {report['peak_rss_mb']} MB | "
+          f"requisições à loja falsa: {server.requests}")
+
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+            f.write('\n')
+        print(f"💾 Baseline gravado em {args.baseline}")
+        return 0
+
+    if baseline:
+        mismatches = config_mismatches(report['config'], baseline.get('config', {}))
+        if mismatches:
+            print(f"\n⚠️ Configuração diferente da do baseline ({'; '.join(mismatches)})")
+            if not args.force_compare:
+                print("   Comparação recusada: rode com os mesmos parâmetros do baseline ou use --force-compare")
+                return 2
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regressões (tolerância {args.tolerance:.0%}):")
+            for line in regressions:
+                print(f"   {line}")
+            return 1
+        print(f"\n✅ Sem regressões em relação ao baseline (tolerância {args.tolerance:.0%})")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
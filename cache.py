@@ -0,0 +1,293 @@
+"""
+Cache de resultados de extração
+- Chave pela URL canônica (encurtadores resolvidos, verificação do ML removida,
+  parâmetros de rastreamento removidos)
+- Camada em memória (LRU com TTL) + camada opcional em disco (SQLite), que
+  sobrevive a reinícios do dyno
+- Cache negativo para falhas, com TTL curto
+"""
+
+import os
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+from urllib.parse import urlparse, urlunparse, parse_qsl, urlencode
+
+from structured_logging import get_logger
+
+log = get_logger('cache')
+
+# TTLs por endpoint (segundos)
+RESULT_CACHE_TTLS = {
+    'images': int(os.getenv('RESULT_CACHE_TTL_IMAGES', '21600')),
+    'seo': int(os.getenv('RESULT_CACHE_TTL_SEO', '21600')),
+    'product': int(os.getenv('RESULT_CACHE_TTL_PRODUCT', '1800')),
+}
+RESULT_CACHE_NEGATIVE_TTL = int(os.getenv('RESULT_CACHE_NEGATIVE_TTL', '60'))
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv('RESULT_CACHE_MAX_ENTRIES', '512'))
+# Caminho do SQLite (vazio = sem camada em disco)
+RESULT_CACHE_DB = os.getenv('RESULT_CACHE_DB', '')
+
+# Parâmetros de rastreamento que não mudam o conteúdo da página
+TRACKING_PARAMS = {'fbclid', 'gclid', 'msclkid', 'igshid', 'mc_cid', 'mc_eid'}
+TRACKING_PREFIXES = ('utm_',)
+
+# Parâmetros de rastreamento específicos de cada loja (chave = trecho do host)
+STORE_TRACKING_PARAMS = {
+    'amazon': ({'ref', 'ref_', 'tag', 'psc', 'sr', 'qid', 'crid', 'sprefix', 'keywords',
+                'dchild', 'content-id', 'linkcode', 'linkid', 'camp', 'creative'},
+               ('pf_rd_', 'pd_rd_')),
+    'mercadolivre': ({'tracking_id', 'sid', 'position', 'search_layout', 'type',
+                      'polycard_client', 'c_id', 'c_uid', 'c_element_order', 'c_campaign',
+                      'reco_backend', 'reco_client', 'reco_item_pos', 'reco_id', 'matt_tool',
+                      'matt_word', 'forcein'},
+                     ()),
+    'shopee': ({'sp_atk', 'xptdk', 'smtt', 'uls_trackid', 'mmp_pid'}, ()),
+    'aliexpress': ({'spm', 'scm', 'pvid', 'algo_pvid', 'algo_exp_id', 'utparam', 'gatewayadapt',
+                    'sk', 'afref', 'mall_affr', 'af', 'cv', 'dp', 'pdp_npi', 'pdp_ext_f'},
+                   ('aff_', '_randl_')),
+}
+
+
+def _tracking_rules_for_host(netloc):
+    params, prefixes = set(TRACKING_PARAMS), TRACKING_PREFIXES
+    for host_key, (store_params, store_prefixes) in STORE_TRACKING_PARAMS.items():
+        if host_key in netloc:
+            params |= store_params
+            prefixes = prefixes + store_prefixes
+    return params, prefixes
+
+
+def strip_tracking_params(url: str) -> str:
+    """Remove fragmento e parâmetros de rastreamento, normalizando host e ordem da query"""
+    try:
+        parsed = urlparse(url)
+        netloc = (parsed.netloc or '').lower()
+        params, prefixes = _tracking_rules_for_host(netloc)
+        query = [
+            (k, v) for k, v in parse_qsl(parsed.query, keep_blank_values=True)
+            if k.lower() not in params and not k.lower().startswith(prefixes)
+        ]
+        if netloc.endswith(':443') and parsed.scheme == 'https':
+            netloc = netloc[:-4]
+        elif netloc.endswith(':80') and parsed.scheme == 'http':
+            netloc = netloc[:-3]
+        return urlunparse((
+            parsed.scheme.lower(),
+            netloc,
+            parsed.path or '/',
+            parsed.params,
+            urlencode(sorted(query)),
+            ''
+        ))
+    except Exception:
+        return url
+
+
+def canonical_url(url: str) -> str:
+    """
+    URL canônica usada como chave de cache
+
+    Resolve encurtadores (requisição de rede apenas para hosts encurtadores),
+    remove a página de verificação do Mercado Livre e os parâmetros de rastreamento.
+    """
+    from product_extractor import resolve_shortened_url
+    from seo_extractor import normalize_mercado_livre_url
+
+    url = resolve_shortened_url(url)
+    url = normalize_mercado_livre_url(url)
+    return strip_tracking_params(url)
+
+
+class TTLCache:
+    """Cache em memória com limite LRU e expiração por entrada (thread-safe)"""
+
+    def __init__(self, max_entries=RESULT_CACHE_MAX_ENTRIES):
+        self.max_entries = max(1, max_entries)
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """Retorna (valor, expires_at) ou None se ausente/expirado"""
+        now = time.time()
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            if item[1] <= now:
+                del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item
+
+    def set(self, key, value, ttl, expires_at=None):
+        expires_at = expires_at or (time.time() + ttl)
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            size = len(self._data)
+        lookups = self.hits + self.misses
+        return {
+            'entries': size,
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+
+class SQLiteCache:
+    """Camada persistente em SQLite (valores serializados em JSON)"""
+
+    PURGE_EVERY = 200
+
+    def __init__(self, path, table='cache'):
+        self.path = path
+        self.table = table
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=5)
+        with self._lock:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute(
+                f'CREATE TABLE IF NOT EXISTS {table} '
+                '(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)'
+            )
+            self._conn.commit()
+
+    def get(self, key):
+        """Retorna (valor, expires_at) ou None se ausente/expirado"""
+        with self._lock:
+            row = self._conn.execute(
+                f'SELECT value, expires_at FROM {self.table} WHERE key = ?', (key,)
+            ).fetchone()
+        if not row or row[1] <= time.time():
+            return None
+        return json.loads(row[0]), row[1]
+
+    def set(self, key, value, ttl, expires_at=None):
+        expires_at = expires_at or (time.time() + ttl)
+        payload = json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            self._conn.execute(
+                f'INSERT OR REPLACE INTO {self.table} (key, value, expires_at) VALUES (?, ?, ?)',
+                (key, payload, expires_at)
+            )
+            self._writes += 1
+            if self._writes % self.PURGE_EVERY == 0:
+                self._conn.execute(f'DELETE FROM {self.table} WHERE expires_at <= ?', (time.time(),))
+            self._conn.commit()
+
+    def delete(self, key):
+        with self._lock:
+            self._conn.execute(f'DELETE FROM {self.table} WHERE key = ?', (key,))
+            self._conn.commit()
+
+
+class TieredCache:
+    """Memória (LRU) na frente de uma camada opcional em disco"""
+
+    def __init__(self, max_entries=RESULT_CACHE_MAX_ENTRIES, db_path='', table='cache'):
+        self.memory = TTLCache(max_entries)
+        self.disk = None
+        self.disk_hits = 0
+        if db_path:
+            try:
+                self.disk = SQLiteCache(db_path, table)
+            except Exception as e:
+                log.warning(f"SQLite indisponível ({db_path}): {e}")
+
+    def get(self, key):
+        item = self.memory.get(key)
+        if item is not None or self.disk is None:
+            return item
+        try:
+            item = self.disk.get(key)
+        except Exception as e:
+            log.warning(f"Erro lendo SQLite: {e}")
+            return None
+        if item is not None:
+            self.disk_hits += 1
+            # Promover para a memória
+            self.memory.set(key, item[0], 0, expires_at=item[1])
+        return item
+
+    def set(self, key, value, ttl):
+        expires_at = time.time() + ttl
+        self.memory.set(key, value, ttl, expires_at=expires_at)
+        if self.disk is not None:
+            try:
+                self.disk.set(key, value, ttl, expires_at=expires_at)
+            except Exception as e:
+                log.warning(f"Erro gravando SQLite: {e}")
+
+    def stats(self):
+        stats = self.memory.stats()
+        stats['disk_enabled'] = self.disk is not None
+        stats['disk_hits'] = self.disk_hits
+        return stats
+
+
+class ResultCache:
+    """Cache dos resultados dos endpoints (positivos e negativos)"""
+
+    def __init__(self, max_entries=RESULT_CACHE_MAX_ENTRIES, db_path=RESULT_CACHE_DB):
+        self._cache = TieredCache(max_entries, db_path, table='results')
+
+    @staticmethod
+    def make_key(endpoint, url, extra=None):
+        key = f"{endpoint}:{url}"
+        return f"{key}|{extra}" if extra else key
+
+    def get(self, key):
+        """
+        Retorna a entrada em cache ou None
+
+        A entrada é um dict com 'ok' (bool), 'value' (resultado, se ok),
+        'status_code'/'detail' (se falha) e 'max_age' (segundos restantes).
+        """
+        item = self._cache.get(key)
+        if item is None:
+            return None
+        entry, expires_at = item
+        entry = dict(entry)
+        entry['max_age'] = max(0, int(expires_at - time.time()))
+        return entry
+
+    def set_success(self, key, endpoint, value):
+        ttl = RESULT_CACHE_TTLS.get(endpoint, 3600)
+        self._cache.set(key, {'ok': True, 'value': value}, ttl)
+        return ttl
+
+    def set_failure(self, key, status_code, detail):
+        self._cache.set(key, {'ok': False, 'status_code': status_code, 'detail': detail}, RESULT_CACHE_NEGATIVE_TTL)
+        return RESULT_CACHE_NEGATIVE_TTL
+
+    def stats(self):
+        return self._cache.stats()
+
+
+result_cache = ResultCache()
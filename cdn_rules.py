@@ -0,0 +1,117 @@
+"""
+Regras por CDN de imagens
+Cada CDN serve a mesma foto em várias variantes de tamanho, e as páginas
+misturam miniaturas, zoom e versões intermediárias. Para cada CDN conhecida,
+uma regra (regex sobre host + caminho) dá:
+- a identidade da foto, igual para todas as variantes (deduplicação antes
+  da sondagem)
+- a URL da maior resolução conhecida, obtida por reescrita (sem rede)
+
+Regras: Mercado Livre (D_NQ_NP_2X_<id>-F), Amazon (._AC_SL1500_.), Shopee
+(sem _tn), AliExpress/alicdn (sem o sufixo _80x80.jpg, _Q90.jpg_.webp...),
+VTEX (/arquivos/ids/<id> sem -largura-altura) e Kabum (_gg).
+"""
+
+import re
+from urllib.parse import urlsplit, urlunsplit
+
+
+class CdnRule:
+    """Regra de uma CDN: padrão sobre host + caminho e modelos de identidade e reescrita"""
+
+    def __init__(self, key, marker, pattern, identity, max_resolution):
+        self.key = key
+        # Substring que a URL precisa conter (filtro barato antes da regex)
+        self.marker = marker
+        self.pattern = re.compile(pattern, re.I)
+        # Modelos de re.Match.expand (\g<grupo>)
+        self.identity = identity
+        self.max_resolution = max_resolution
+
+    def match(self, target):
+        return self.pattern.search(target) if self.marker in target.lower() else None
+
+    def __repr__(self):
+        return f"CdnRule({self.key!r})"
+
+
+CDN_RULES = [
+    # http2.mlstatic.com/D_Q_NP_<id>-V.webp, D_NQ_NP_<id>-O.jpg, D_<id>-F.jpg...
+    CdnRule(
+        'mercadolivre', 'mlstatic.com',
+        r'^(?P<host>(?:[\w-]+\.)*mlstatic\.com)/D_(?:N?Q_NP_|N?Q_)?(?:2X_)?'
+        r'(?P<id>\d+-ML[A-Z]{1,2}\d+(?:_\d+)?)-[A-Z](?P<ext>\.\w+)$',
+        r'mlstatic:\g<id>',
+        r'\g<host>/D_NQ_NP_2X_\g<id>-F\g<ext>',
+    ),
+    # m.media-amazon.com/images/I/<id>._AC_SX679_.jpg, <id>._SS40_.jpg, <id>.jpg
+    CdnRule(
+        'amazon', '/images/i/',
+        r'^(?P<host>[\w.-]*(?:media-amazon|ssl-images-amazon|images-amazon)\.com)/images/I/'
+        r'(?P<id>[^./]+)\.(?:_[^/]*_\.)?(?P<ext>jpe?g|png|webp|gif)$',
+        r'amazon:\g<id>',
+        r'\g<host>/images/I/\g<id>._AC_SL1500_.\g<ext>',
+    ),
+    # down-br.img.susercontent.com/file/<hash>_tn, cf.shopee.com.br/file/<hash>_tn.webp
+    CdnRule(
+        'shopee', '/file/',
+        r'^(?P<host>[\w.-]*(?:susercontent\.com|shopee\.[a-z.]+|shopeemobile\.com))/file/'
+        r'(?P<id>[\w-]+?)(?:_tn)?(?P<ext>\.\w+)?$',
+        r'shopee:\g<id>',
+        r'\g<host>/file/\g<id>\g<ext>',
+    ),
+    # ae01.alicdn.com/kf/<nome>.jpg_80x80.jpg, <nome>.jpg_Q90.jpg_.webp
+    CdnRule(
+        'aliexpress', 'alicdn.com',
+        r'^(?P<host>[\w.-]*alicdn\.com)/kf/(?P<id>[^/]+?\.(?:jpe?g|png|webp))(?:_[^/]*)?$',
+        r'alicdn:\g<id>',
+        r'\g<host>/kf/\g<id>',
+    ),
+    # <loja>.vtexassets.com/arquivos/ids/<id>-500-500/nome.jpg (qualquer host VTEX)
+    CdnRule(
+        'vtex', '/arquivos/ids/',
+        r'^(?P<host>[\w.-]+)/arquivos/ids/(?P<id>\d+)(?:-\d+-\d+)?(?P<rest>/.*)$',
+        r'vtex:\g<host>:\g<id>',
+        r'\g<host>/arquivos/ids/\g<id>\g<rest>',
+    ),
+    # images.kabum.com.br/produtos/fotos/.../<nome>_p.jpg, _m, _g, _gg
+    CdnRule(
+        'kabum', 'kabum.com.br',
+        r'^(?P<host>[\w.-]*kabum\.com\.br)/produtos/fotos/(?P<id>.+?)_(?:p|m|g|gg)(?P<ext>\.\w+)$',
+        r'kabum:\g<id>',
+        r'\g<host>/produtos/fotos/\g<id>_gg\g<ext>',
+    ),
+]
+
+
+def _match(url):
+    """(regra, match, partes da URL) da primeira regra que reconhece a URL, ou None"""
+    try:
+        parts = urlsplit(url)
+    except ValueError:
+        return None
+    target = f"{parts.netloc.lower()}{parts.path}"
+    for rule in CDN_RULES:
+        match = rule.match(target)
+        if match:
+            return rule, match, parts
+    return None
+
+
+def canonical_image_id(url):
+    """Identidade da foto, comum a todas as variantes de tamanho da CDN (None se a CDN não é conhecida)"""
+    found = _match(url)
+    if not found:
+        return None
+    rule, match, _ = found
+    return match.expand(rule.identity)
+
+
+def max_resolution_url(url):
+    """URL da maior resolução conhecida da foto (a própria URL se a CDN não é conhecida)"""
+    found = _match(url)
+    if not found:
+        return url
+    rule, match, parts = found
+    netloc, _, path = match.expand(rule.max_resolution).partition('/')
+    return urlunsplit((parts.scheme, netloc, '/' + path, parts.query, ''))
@@ -0,0 +1,110 @@
+"""
+Coleta em lote de atributos do DOM no Selenium
+Cada get_attribute é uma ida e volta HTTP ao chromedriver; uma página com
+200 imagens passava de mil chamadas. Aqui um único execute_script devolve
+todos os atributos dos candidatos (src, currentSrc, srcset, data-* de lazy
+loading, naturalWidth/naturalHeight, meta tags) de uma vez.
+"""
+
+import os
+import re
+
+# Permite voltar à coleta elemento a elemento (get_attribute) se necessário
+SELENIUM_BULK_HARVEST = os.getenv('SELENIUM_BULK_HARVEST', '1') == '1'
+
+_HARVEST_IMAGES_SCRIPT = """
+var images = [];
+var nodes = document.getElementsByTagName('img');
+for (var i = 0; i < nodes.length; i++) {
+    var img = nodes[i];
+    images.push({
+        src: img.src || '',
+        current_src: img.currentSrc || '',
+        srcset: img.getAttribute('srcset') || '',
+        lazy_src: img.getAttribute('data-src') || img.getAttribute('data-lazy-src') || img.getAttribute('data-original') || '',
+        alt: img.getAttribute('alt') || '',
+        title: img.getAttribute('title') || '',
+        width: img.width || '',
+        height: img.height || '',
+        natural_width: img.naturalWidth || 0,
+        natural_height: img.naturalHeight || 0,
+        'class': img.className || '',
+        id: img.id || ''
+    });
+}
+var metas = [];
+var metaNodes = document.querySelectorAll("meta[property*='image']");
+for (var j = 0; j < metaNodes.length; j++) {
+    metas.push({
+        content: metaNodes[j].getAttribute('content') || '',
+        property: metaNodes[j].getAttribute('property') || ''
+    });
+}
+return {images: images, metas: metas};
+"""
+
+_AMAZON_FIELDS_SCRIPT = """
+function text(selector) {
+    var el = document.querySelector(selector);
+    return el ? (el.innerText || el.textContent || '').trim() : null;
+}
+var images = [];
+var nodes = document.querySelectorAll('#altImages img, #imgTagWrapperId img');
+for (var i = 0; i < nodes.length; i++) {
+    if (nodes[i].src) { images.push(nodes[i].src); }
+}
+return {
+    title: text('#productTitle'),
+    price: text('.a-price-whole'),
+    description: text('#productDescription'),
+    images: images
+};
+"""
+
+_SRCSET_ENTRY_RE = re.compile(r'\s*(\S+)(?:\s+(\d+(?:\.\d+)?)([wx]))?\s*')
+
+
+def largest_srcset_candidate(srcset):
+    """Retorna a URL de maior largura/densidade de um srcset (ou None)"""
+    best_url, best_size = None, -1.0
+    for entry in (srcset or '').split(','):
+        match = _SRCSET_ENTRY_RE.fullmatch(entry)
+        if not match:
+            continue
+        size = float(match.group(2)) if match.group(2) else 1.0
+        if size > best_size:
+            best_url, best_size = match.group(1), size
+    return best_url
+
+
+def element_attributes(record):
+    """Atributos no formato aceito por create_image_info (dimensões naturais quando carregada)"""
+    natural_width = record.get('natural_width') or 0
+    natural_height = record.get('natural_height') or 0
+    return {
+        'alt': record.get('alt', ''),
+        'title': record.get('title', ''),
+        'width': str(natural_width or record.get('width') or ''),
+        'height': str(natural_height or record.get('height') or ''),
+        'class': record.get('class', ''),
+        'id': record.get('id', ''),
+        'element_type': 'img',
+    }
+
+
+def harvest_images(driver):
+    """
+    Coleta imagens e meta tags de imagem da página em uma única chamada
+
+    Returns:
+        dict: {'images': [...], 'metas': [...]} (listas de dicts de atributos)
+    """
+    data = driver.execute_script(_HARVEST_IMAGES_SCRIPT) or {}
+    return {'images': data.get('images') or [], 'metas': data.get('metas') or []}
+
+
+def harvest_amazon_fields(driver):
+    """Título, preço (texto), descrição e imagens da página da Amazon em uma única chamada"""
+    data = driver.execute_script(_AMAZON_FIELDS_SCRIPT) or {}
+    data.setdefault('images', [])
+    return data
@@ -0,0 +1,315 @@
+"""
+Pool de drivers Chrome pré-aquecidos
+Evita subir um Chrome novo (e um perfil novo em /tmp) a cada requisição:
+os drivers ficam abertos, são emprestados via checkout/checkin, têm o estado
+limpo entre usos e são reciclados após K páginas ou quando quebram.
+"""
+
+import os
+import time
+import threading
+from contextlib import contextmanager
+
+from selenium.common.exceptions import TimeoutException, WebDriverException
+
+from metrics import stage
+from structured_logging import get_logger
+
+log = get_logger('pool')
+
+# Configurações do pool (ajustáveis por variável de ambiente no Heroku)
+CHROME_POOL_SIZE = int(os.getenv('CHROME_POOL_SIZE', '1'))
+CHROME_POOL_MAX_USES = int(os.getenv('CHROME_POOL_MAX_USES', '20'))
+CHROME_POOL_CHECKOUT_TIMEOUT = float(os.getenv('CHROME_POOL_CHECKOUT_TIMEOUT', '60'))
+# 0 = sem Chrome (benchmarks/ambientes sem o binário): as estratégias Selenium falham na hora
+CHROME_ENABLED = os.getenv('CHROME_ENABLED', '1') == '1'
+
+
+class PooledDriver:
+    """Driver Chrome emprestado pelo pool, com seu diretório temporário e contagem de usos"""
+
+    def __init__(self, driver, temp_dir):
+        self.driver = driver
+        self.temp_dir = temp_dir
+        self.uses = 0
+        self.created_at = time.time()
+
+
+class ChromeDriverPool:
+    """Mantém até N drivers Chrome headless prontos para uso"""
+
+    def __init__(self, size=CHROME_POOL_SIZE, max_uses=CHROME_POOL_MAX_USES, factory=None, cleanup=None,
+                 enabled=CHROME_ENABLED):
+        self.size = max(1, size)
+        self.enabled = enabled
+        self.max_uses = max(1, max_uses)
+        self._factory = factory
+        self._cleanup = cleanup
+        self._idle = []
+        self._total = 0  # drivers ociosos + emprestados + em criação
+        self._closed = False
+        self._condition = threading.Condition()
+        self._stats = {
+            'created': 0,
+            'create_failures': 0,
+            'retired': 0,
+            'recycled_max_uses': 0,
+            'recycled_broken': 0,
+            'checkouts': 0,
+            'checkout_timeouts': 0,
+            'checkout_wait_total_s': 0.0,
+        }
+
+    # ───────────────────────────── criação / descarte ─────────────────────────────
+
+    def _create(self):
+        """Sobe um Chrome novo usando a configuração do Heroku"""
+        factory = self._factory
+        if factory is None:
+            from image_extractor import setup_chrome_driver_heroku
+            factory = setup_chrome_driver_heroku
+        driver, temp_dir = factory()
+        if not driver:
+            return None
+        return PooledDriver(driver, temp_dir)
+
+    def _retire(self, pooled):
+        """Fecha o Chrome e limpa o diretório temporário"""
+        with stage('driver_teardown') as timer:
+            try:
+                pooled.driver.quit()
+            except Exception as e:
+                log.warning(f"Erro ao fechar Chrome: {e}")
+                timer.outcome = 'error'
+            cleanup = self._cleanup
+            if cleanup is None:
+                from image_extractor import cleanup_chrome_temp_dir
+                cleanup = cleanup_chrome_temp_dir
+            if pooled.temp_dir:
+                cleanup(pooled.temp_dir)
+        with self._condition:
+            self._stats['retired'] += 1
+
+    @staticmethod
+    def _frame_origins(driver):
+        """Origens HTTP(S) da aba atual: frame principal e iframes"""
+        tree = driver.execute_cdp_cmd('Page.getFrameTree', {})['frameTree']
+        origins = set()
+        pending = [tree]
+        while pending:
+            node = pending.pop()
+            origin = node.get('frame', {}).get('securityOrigin', '')
+            if origin.startswith(('http://', 'https://')):
+                origins.add(origin)
+            pending.extend(node.get('childFrames', []))
+        return origins
+
+    def _reset(self, pooled):
+        """
+        Limpa o estado do driver (abas extras, cookies, storage) entre usos
+
+        Os cookies saem de todas as origens (Network.clearBrowserCookies); o
+        storage, que o Chrome só limpa por origem, sai das origens abertas nas
+        abas e iframes. Qualquer falha sobe para o checkin, que recicla o driver.
+        """
+        driver = pooled.driver
+        handles = driver.window_handles
+        origins = set()
+        for handle in reversed(handles):
+            driver.switch_to.window(handle)
+            origins |= self._frame_origins(driver)
+            if handle != handles[0]:
+                driver.close()
+        driver.switch_to.window(handles[0])
+        driver.execute_cdp_cmd('Network.clearBrowserCookies', {})
+        for origin in origins:
+            driver.execute_cdp_cmd('Storage.clearDataForOrigin', {
+                'origin': origin,
+                'storageTypes': 'local_storage,session_storage,indexeddb,websql,service_workers,cache_storage',
+            })
+        log.debug(f"Driver limpo ({len(origins)} origens)", extra={'origins': sorted(origins)})
+        driver.get('about:blank')
+
+    # ───────────────────────────── API do pool ─────────────────────────────
+
+    def warm(self):
+        """Pré-lança drivers até completar o tamanho do pool"""
+        if not self.enabled:
+            return
+        while True:
+            with self._condition:
+                if self._closed or self._total >= self.size:
+                    return
+                self._total += 1
+            pooled = self._create_counted()
+            if not pooled:
+                return
+            with self._condition:
+                self._idle.append(pooled)
+                self._condition.notify()
+
+    def _create_counted(self):
+        """Cria um driver já reservado em _total, devolvendo a vaga se falhar"""
+        with stage('driver_setup') as timer:
+            try:
+                pooled = self._create()
+            except Exception as e:
+                log.error(f"Erro ao criar driver: {e}")
+                pooled = None
+            if not pooled:
+                timer.outcome = 'error'
+        with self._condition:
+            if pooled:
+                self._stats['created'] += 1
+            else:
+                self._stats['create_failures'] += 1
+                self._total -= 1
+                self._condition.notify()
+        return pooled
+
+    def checkout(self, timeout=None):
+        """
+        Empresta um driver do pool
+
+        Args:
+            timeout (float, optional): Tempo máximo de espera por um driver livre
+
+        Returns:
+            PooledDriver ou None se não houver driver disponível a tempo
+        """
+        if not self.enabled:
+            return None
+        timeout = CHROME_POOL_CHECKOUT_TIMEOUT if timeout is None else timeout
+        start = time.time()
+        create = False
+        with self._condition:
+            while True:
+                if self._closed:
+                    return None
+                if self._idle:
+                    pooled = self._idle.pop()
+                    break
+                if self._total < self.size:
+                    self._total += 1
+                    create = True
+                    pooled = None
+                    break
+                remaining = timeout - (time.time() - start)
+                if remaining <= 0:
+                    self._stats['checkout_timeouts'] += 1
+                    log.warning("Nenhum driver livre dentro do prazo")
+                    return None
+                self._condition.wait(remaining)
+
+        if create:
+            log.info("Criando novo driver Chrome")
+            pooled = self._create_counted()
+            if not pooled:
+                return None
+
+        with self._condition:
+            self._stats['checkouts'] += 1
+            self._stats['checkout_wait_total_s'] += time.time() - start
+        pooled.uses += 1
+        return pooled
+
+    def checkin(self, pooled, broken=False):
+        """
+        Devolve o driver ao pool
+
+        O driver é reciclado se estiver quebrado, se atingiu o limite de usos
+        ou se a limpeza de estado falhar.
+        """
+        if pooled is None:
+            return
+        reason = None
+        if broken:
+            reason = 'recycled_broken'
+        elif pooled.uses >= self.max_uses:
+            reason = 'recycled_max_uses'
+        else:
+            try:
+                self._reset(pooled)
+            except Exception as e:
+                log.warning(f"Falha ao limpar driver, reciclando: {e}")
+                reason = 'recycled_broken'
+
+        if reason or self._closed:
+            if reason:
+                log.info(f"Reciclando driver ({reason}, {pooled.uses} usos)")
+            self._retire(pooled)
+            with self._condition:
+                if reason:
+                    self._stats[reason] += 1
+                self._total -= 1
+                self._condition.notify()
+            if reason and not self._closed:
+                # Repor o driver reciclado em segundo plano para manter o pool aquecido
+                threading.Thread(target=self.warm, daemon=True).start()
+            return
+
+        with self._condition:
+            self._idle.append(pooled)
+            self._condition.notify()
+
+    @contextmanager
+    def session(self, timeout=None):
+        """
+        Context manager que empresta um driver e o devolve ao final
+
+        Entrega None se não houver driver. Um WebDriverException (exceto timeout
+        de página) marca o driver como quebrado para reciclagem.
+        """
+        with stage('driver_checkout') as timer:
+            pooled = self.checkout(timeout)
+            if not pooled:
+                timer.outcome = 'unavailable'
+        broken = False
+        try:
+            yield pooled.driver if pooled else None
+        except TimeoutException:
+            raise
+        except WebDriverException:
+            broken = True
+            raise
+        finally:
+            self.checkin(pooled, broken=broken)
+
+    def stats(self):
+        """Retorna estatísticas do pool"""
+        with self._condition:
+            stats = dict(self._stats)
+            stats['size'] = self.size
+            stats['enabled'] = self.enabled
+            stats['max_uses'] = self.max_uses
+            stats['total'] = self._total
+            stats['idle'] = len(self._idle)
+            stats['busy'] = self._total - len(self._idle)
+        checkouts = stats['checkouts']
+        stats['checkout_wait_avg_s'] = round(stats['checkout_wait_total_s'] / checkouts, 3) if checkouts else 0.0
+        stats['checkout_wait_total_s'] = round(stats['checkout_wait_total_s'], 3)
+        return stats
+
+    def shutdown(self):
+        """Fecha todos os drivers ociosos e impede novos checkouts"""
+        with self._condition:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._total -= len(idle)
+            self._condition.notify_all()
+        for pooled in idle:
+            self._retire(pooled)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_driver_pool():
+    """Retorna o pool global de drivers (criado sob demanda)"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ChromeDriverPool()
+    return _pool
@@ -0,0 +1,117 @@
+"""
+Executores dedicados para rodar as extrações fora do event loop do FastAPI
+Há um pool para trabalho leve (requests + BeautifulSoup) e outro para
+trabalho pesado (Chrome), cada um com limite de concorrência, limite de
+fila (acima dele a requisição é recusada com 503) e timeout por requisição.
+"""
+
+import os
+import asyncio
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+from driver_pool import CHROME_POOL_SIZE, CHROME_POOL_CHECKOUT_TIMEOUT
+from structured_logging import get_logger
+
+log = get_logger('executor')
+
+# Pool leve: requests/BeautifulSoup/API
+EXTRACT_LIGHT_WORKERS = int(os.getenv('EXTRACT_LIGHT_WORKERS', '8'))
+EXTRACT_LIGHT_QUEUE = int(os.getenv('EXTRACT_LIGHT_QUEUE', '32'))
+EXTRACT_LIGHT_TIMEOUT = float(os.getenv('EXTRACT_LIGHT_TIMEOUT', '45'))
+
+# Pool pesado: Selenium/Chrome (por padrão, um worker por driver do pool de Chrome)
+EXTRACT_CHROME_WORKERS = int(os.getenv('EXTRACT_CHROME_WORKERS', str(CHROME_POOL_SIZE)))
+EXTRACT_CHROME_QUEUE = int(os.getenv('EXTRACT_CHROME_QUEUE', '4'))
+EXTRACT_CHROME_TIMEOUT = float(os.getenv('EXTRACT_CHROME_TIMEOUT', '120'))
+
+
+class ExecutorSaturated(Exception):
+    """Fila do executor cheia: a requisição deve ser recusada (503)"""
+
+
+class BoundedExecutor:
+    """ThreadPoolExecutor com limite de tarefas pendentes (em execução + na fila)"""
+
+    def __init__(self, name, max_workers, max_queue, timeout):
+        self.name = name
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max(0, max_queue)
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=f"extract-{name}")
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._stats = {'submitted': 0, 'rejected': 0, 'timeouts': 0, 'completed': 0, 'failed': 0}
+
+    def submit(self, fn, *args, **kwargs):
+        """Agenda fn no pool, levantando ExecutorSaturated se a fila estiver cheia"""
+        with self._lock:
+            if self._pending >= self.max_workers + self.max_queue:
+                self._stats['rejected'] += 1
+                raise ExecutorSaturated(f"Executor '{self.name}' saturado ({self._pending} tarefas pendentes)")
+            self._pending += 1
+            self._stats['submitted'] += 1
+
+        # Propagar o contexto (contextvars) da requisição para a thread do pool
+        context = contextvars.copy_context()
+        try:
+            future = self._executor.submit(context.run, fn, *args, **kwargs)
+        except Exception:
+            with self._lock:
+                self._pending -= 1
+            raise
+        future.add_done_callback(self._on_done)
+        return future
+
+    def _on_done(self, future):
+        with self._lock:
+            self._pending -= 1
+            if future.cancelled():
+                return
+            if future.exception() is not None:
+                self._stats['failed'] += 1
+            else:
+                self._stats['completed'] += 1
+
+    async def run(self, fn, *args, timeout=None, **kwargs):
+        """
+        Executa fn no pool sem bloquear o event loop
+
+        A tarefa ainda na fila é cancelada se o timeout estourar; uma tarefa já
+        em execução termina em segundo plano e continua ocupando sua vaga.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        future = self.submit(fn, *args, **kwargs)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except asyncio.TimeoutError:
+            with self._lock:
+                self._stats['timeouts'] += 1
+            raise
+
+    def stats(self):
+        """Retorna estatísticas do executor"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['pending'] = self._pending
+        stats['max_workers'] = self.max_workers
+        stats['max_queue'] = self.max_queue
+        stats['timeout_s'] = self.timeout
+        return stats
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+light_executor = BoundedExecutor('light', EXTRACT_LIGHT_WORKERS, EXTRACT_LIGHT_QUEUE, EXTRACT_LIGHT_TIMEOUT)
+chrome_executor = BoundedExecutor('chrome', EXTRACT_CHROME_WORKERS, EXTRACT_CHROME_QUEUE, EXTRACT_CHROME_TIMEOUT)
+
+# A tarefa do pool de Chrome pode esperar até CHROME_POOL_CHECKOUT_TIMEOUT por um
+# driver antes de começar a navegar: com um timeout menor, a requisição vira 504
+# enquanto a thread segue presa esperando o driver
+if EXTRACT_CHROME_TIMEOUT <= CHROME_POOL_CHECKOUT_TIMEOUT:
+    log.warning(
+        f"EXTRACT_CHROME_TIMEOUT ({EXTRACT_CHROME_TIMEOUT:.0f}s) não cobre a espera por um driver "
+        f"(CHROME_POOL_CHECKOUT_TIMEOUT={CHROME_POOL_CHECKOUT_TIMEOUT:.0f}s)"
+    )
@@ -7,6 +7,11 @@ import os
 import tempfile
 import shutil
 
+from structured_logging import get_logger
+
+log = get_logger('chrome')
+
+
 def get_heroku_chrome_options():
     """Retorna opções do Chrome que funcionam no Heroku"""
     from selenium.webdriver.chrome.options import Options
@@ -67,9 +72,9 @@ def cleanup_heroku_chrome_temp(temp_dir):
     if temp_dir and os.path.exists(temp_dir):
         try:
             shutil.rmtree(temp_dir)
-            print(f"🧹 Diretório temporário do Heroku limpo: {temp_dir}")
+            log.info(f"Diretório temporário do Heroku limpo: {temp_dir}")
         except Exception as e:
-            print(f"⚠️ Erro ao limpar diretório do Heroku: {e}")
+            log.warning(f"Erro ao limpar diretório do Heroku: {e}")
 
 def get_heroku_environment():
     """Retorna configurações de ambiente do Heroku"""
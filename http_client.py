@@ -0,0 +1,203 @@
+"""
+Cliente HTTP compartilhado por todos os extratores
+- Sessões requests reaproveitadas (keep-alive, pool de conexões por host)
+- Uma sessão por proxy, para que as conexões via proxy não se misturem
+- Perfis de headers por loja (WhatsApp, Mercado Livre sem brotli, AliExpress tipo curl...)
+- Re-tentativa sem keep-alive quando ocorre SSLError
+"""
+
+import os
+import time
+import threading
+from http.cookiejar import DefaultCookiePolicy
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from metrics import observe_http
+from store_registry import lookup_store
+from structured_logging import get_logger
+
+log = get_logger('http')
+
+# Tamanho dos pools: quantos hosts manter em cache e quantas conexões por host
+HTTP_POOL_CONNECTIONS = int(os.getenv('HTTP_POOL_CONNECTIONS', '32'))
+HTTP_POOL_MAXSIZE = int(os.getenv('HTTP_POOL_MAXSIZE', '32'))
+
+_CHROME_WINDOWS_UA = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+_CHROME_MAC_UA = 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+_WHATSAPP_UA = 'WhatsApp/2.23.24.81 (iPhone; iOS 17.1.2; Scale/3.00)'
+
+# Perfis de headers por tipo de requisição/loja
+HEADER_PROFILES = {
+    # Navegador comum (extração de imagens via requests)
+    'browser': {
+        'User-Agent': _CHROME_WINDOWS_UA,
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+        'Accept-Language': 'pt-BR,pt;q=0.9,en;q=0.8',
+        'Accept-Encoding': 'gzip, deflate, br',
+        'DNT': '1',
+        'Connection': 'keep-alive',
+        'Upgrade-Insecure-Requests': '1',
+    },
+    # Mercado Livre: alguns proxies/WAF têm problemas com brotli; evitar 'br'
+    'mercadolivre': {
+        'User-Agent': _CHROME_WINDOWS_UA,
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+        'Accept-Language': 'pt-BR,pt;q=0.9,en;q=0.8',
+        'Accept-Encoding': 'gzip, deflate',
+        'DNT': '1',
+        'Connection': 'keep-alive',
+        'Upgrade-Insecure-Requests': '1',
+        'Referer': 'https://www.mercadolivre.com.br/',
+    },
+    'kabum': {
+        'User-Agent': _CHROME_WINDOWS_UA,
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+        'Accept-Language': 'pt-BR,pt;q=0.9,en;q=0.8',
+        'Accept-Encoding': 'gzip, deflate, br',
+        'DNT': '1',
+        'Connection': 'keep-alive',
+        'Upgrade-Insecure-Requests': '1',
+        'Referer': 'https://www.kabum.com.br/',
+    },
+    # Amazon: sem 'br' (a página de produto tem centenas de KB; gzip basta e não depende do brotli)
+    'amazon': {
+        'User-Agent': _CHROME_WINDOWS_UA,
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8',
+        'Accept-Language': 'pt-BR,pt;q=0.9,en;q=0.8',
+        'Accept-Encoding': 'gzip, deflate',
+        'Connection': 'keep-alive',
+        'Upgrade-Insecure-Requests': '1',
+        'Referer': 'https://www.amazon.com.br/',
+    },
+    # Bot de link preview do WhatsApp (meta tags SEO)
+    'whatsapp': {
+        'User-Agent': _WHATSAPP_UA,
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+        'Accept-Language': 'pt-BR,pt;q=0.9,en;q=0.8',
+        'Accept-Encoding': 'gzip, deflate, br',
+        'Connection': 'keep-alive',
+        'Upgrade-Insecure-Requests': '1',
+        'Cache-Control': 'no-cache',
+        'Pragma': 'no-cache',
+    },
+    # WhatsApp para Mercado Livre - SEM Accept-Encoding para evitar problemas de compressão
+    'whatsapp_ml': {
+        'User-Agent': _WHATSAPP_UA,
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+        'Accept-Language': 'pt-BR,pt;q=0.9,en;q=0.8',
+        'Connection': 'keep-alive',
+        'Upgrade-Insecure-Requests': '1',
+    },
+    # WhatsApp com headers mínimos (extração genérica de produto, também fallback do
+    # Mercado Livre): sem Accept-Encoding, vale o padrão do requests, que
+    # só anuncia 'br' quando há decodificador de brotli instalado
+    'whatsapp_plain': {
+        'User-Agent': _WHATSAPP_UA,
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+    },
+    # AliExpress: headers mínimos = mesmo que curl -L (só User-Agent browser + Accept)
+    'aliexpress': {
+        'User-Agent': _CHROME_MAC_UA,
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+    },
+    'youtube': {
+        'User-Agent': _CHROME_WINDOWS_UA,
+        'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+        'Accept-Language': 'pt-BR,pt;q=0.9,en;q=0.8',
+    },
+    # Sondagem de imagens (HEAD)
+    'image': {
+        'User-Agent': _CHROME_WINDOWS_UA,
+    },
+}
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+def _proxy_key(proxies):
+    """Identifica o proxy usado (uma sessão/pool por proxy)"""
+    if not proxies:
+        return None
+    return proxies.get('https') or proxies.get('http')
+
+
+def _build_session():
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=HTTP_POOL_CONNECTIONS, pool_maxsize=HTTP_POOL_MAXSIZE)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    # Não persistir cookies entre requisições de clientes diferentes
+    # (cookies de redirect dentro da mesma requisição continuam funcionando)
+    session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+    return session
+
+
+def get_session(proxies=None):
+    """Retorna a sessão compartilhada para o proxy informado (ou conexão direta)"""
+    key = _proxy_key(proxies)
+    session = _sessions.get(key)
+    if session is None:
+        with _sessions_lock:
+            session = _sessions.get(key)
+            if session is None:
+                session = _build_session()
+                _sessions[key] = session
+    return session
+
+
+def build_headers(profile=None, headers=None):
+    """Monta os headers a partir de um perfil, com sobrescritas opcionais"""
+    merged = dict(HEADER_PROFILES[profile]) if profile else {}
+    if headers:
+        merged.update(headers)
+    return merged
+
+
+def http_request(method, url, profile=None, headers=None, proxies=None, timeout=15, **kwargs):
+    """
+    Faz uma requisição usando a sessão compartilhada
+
+    Args:
+        method (str): Método HTTP
+        url (str): URL
+        profile (str, optional): Nome do perfil de headers (HEADER_PROFILES)
+        headers (dict, optional): Headers extras/sobrescritas
+        proxies (dict, optional): Proxies no formato do requests
+        timeout (float): Timeout em segundos
+
+    Returns:
+        requests.Response
+    """
+    request_headers = build_headers(profile, headers)
+    session = get_session(proxies)
+    start = time.perf_counter()
+    response = None
+    try:
+        try:
+            response = session.request(method, url, headers=request_headers, proxies=proxies, timeout=timeout, **kwargs)
+        except requests.exceptions.SSLError:
+            # Tentar novamente com conexão fechada
+            log.info("Re-tentando sem keep-alive por SSLError", extra={'url': url})
+            request_headers['Connection'] = 'close'
+            response = session.request(method, url, headers=request_headers, proxies=proxies, timeout=timeout, **kwargs)
+        return response
+    finally:
+        # Em streaming o corpo ainda não foi lido: quem lê contabiliza os bytes
+        body_bytes = len(response.content) if response is not None and not kwargs.get('stream') else 0
+        observe_http(method, lookup_store(url).key, bool(proxies), time.perf_counter() - start,
+                     str(response.status_code) if response is not None else 'error', body_bytes)
+
+
+def http_get(url, profile=None, headers=None, proxies=None, timeout=15, allow_redirects=True, **kwargs):
+    """GET pela sessão compartilhada"""
+    return http_request('GET', url, profile=profile, headers=headers, proxies=proxies,
+                        timeout=timeout, allow_redirects=allow_redirects, **kwargs)
+
+
+def http_head(url, profile=None, headers=None, proxies=None, timeout=10, allow_redirects=True, **kwargs):
+    """HEAD pela sessão compartilhada"""
+    return http_request('HEAD', url, profile=profile, headers=headers, proxies=proxies,
+                        timeout=timeout, allow_redirects=allow_redirects, **kwargs)
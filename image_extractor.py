@@ -1,5 +1,6 @@
 import time
 import json
+import heapq
 import re
 import os
 from urllib.parse import urljoin, urlparse, parse_qs
@@ -16,71 +17,45 @@ import requests
 from bs4 import BeautifulSoup
 import tempfile
 import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
 from seo_extractor import extract_seo_meta_tags
+from driver_pool import get_driver_pool
+from http_client import http_get, http_head
+from page_readiness import wait_for_page_ready
+from resource_blocking import load_page
+from structured_data import extract_structured_product
+from amazon_extractor import fetch_amazon_product, AmazonRobotCheck
+from cdn_rules import canonical_image_id
+from image_probe import (probe_cache, apply_probe, apply_cached_probe, pixel_area_score, PROBE_FIELDS,
+                         IMAGE_PIXEL_SCORE_CAP, max_resolution_candidate)
+from dom_harvest import SELENIUM_BULK_HARVEST, harvest_images, element_attributes, largest_srcset_candidate
+from store_registry import lookup_store, rule_for_store, proxies_for, IMAGE_EXCLUDE_RE, IMAGE_EXTENSIONS
+from strategy_race import Strategy, race, policy_for, IMAGE_HEDGE_POLICIES, HEDGE_MIN_IMAGES
+from strategy_router import strategy_router
+from metrics import stage
+from structured_logging import get_logger, SAMPLED
+
+log = get_logger('images')
+
+# Sondagem de tamanho das imagens: workers paralelos e prazo global (segundos)
+IMAGE_PROBE_WORKERS = int(os.getenv('IMAGE_PROBE_WORKERS', '16'))
+IMAGE_PROBE_DEADLINE = float(os.getenv('IMAGE_PROBE_DEADLINE', '8'))
+# Seleção top-k: candidatas extras sondadas por rodada além das limit melhores
+IMAGE_TOPK_MARGIN = int(os.getenv('IMAGE_TOPK_MARGIN', '5'))
+# Rodadas seguidas sem mudança no top-k antes de parar de sondar (0 = só o limite exato pelo teto)
+IMAGE_TOPK_PATIENCE = int(os.getenv('IMAGE_TOPK_PATIENCE', '2'))
+# Quantidade de imagens de /extract-images (padrão e máximo do parâmetro limit)
+IMAGES_DEFAULT_LIMIT = int(os.getenv('IMAGES_DEFAULT_LIMIT', '15'))
+IMAGES_MAX_LIMIT = int(os.getenv('IMAGES_MAX_LIMIT', '50'))
 
 def detect_store_from_url(url):
     """Detecta automaticamente a loja baseado na URL"""
-    url_lower = url.lower()
-    
-    if 'amazon' in url_lower:
-        return 'Amazon'
-    elif 'mercadolivre' in url_lower or 'mlstatic.com' in url_lower:
-        return 'Mercado Livre'
-    elif 'aliexpress' in url_lower:
-        return 'AliExpress'
-    elif 'americanas' in url_lower:
-        return 'Americanas'
-    elif 'casasbahia' in url_lower:
-        return 'Casas Bahia'
-    elif 'shopee' in url_lower:
-        return 'Shopee'
-    elif 'shein' in url_lower:
-        return 'Shein'
-    elif 'kabum' in url_lower:
-        return 'Kabum'
-    else:
-        return 'Generic'
-
-def _get_proxy_from_env():
-    """Retorna dict de proxy se PROXY_HOST ou PROXY_USER estiver configurado."""
-    host = os.getenv('PROXY_HOST')
-    username = os.getenv('PROXY_USER')
-    if not host and not username:
-        return None
-    try:
-        host = host or 'proxy.smartproxy.net'
-        port = int(os.getenv('PROXY_PORT', '3120'))
-        username = username or ''
-        password = os.getenv('PROXY_PASS', '')
-        proxy_url = f"http://{username}:{password}@{host}:{port}" if username else f"http://{host}:{port}"
-        return {'http': proxy_url, 'https': proxy_url}
-    except Exception:
-        return None
-
+    return lookup_store(url).name
 
 def get_proxies_for_url(url, store_name=None):
     """Retorna dicionário de proxies para Mercado Livre (sempre) e AliExpress (quando PROXY_* configurado)."""
-    try:
-        url_lower = (url or '').lower()
-        is_ml = (store_name == 'Mercado Livre') or ('mercadolivre' in url_lower) or ('mlstatic.com' in url_lower)
-        is_ae = (store_name == 'AliExpress') or ('aliexpress' in url_lower)
-        if is_ae:
-            return _get_proxy_from_env()  # AliExpress: só usa proxy quando env configurado (ex.: Heroku)
-        if not is_ml:
-            return None
-
-        host = os.getenv('PROXY_HOST', 'proxy.smartproxy.net')
-        port = int(os.getenv('PROXY_PORT', '3120'))
-        username = os.getenv('PROXY_USER', 'smart-rsrg25meix8s_area-BR_city-aracruz')
-        password = os.getenv('PROXY_PASS', 'OGf8dvp75MD79qUN')
-
-        proxy_url = f"http://{username}:{password}@{host}:{port}"
-        return {
-            'http': proxy_url,
-            'https': proxy_url
-        }
-    except Exception:
-        return None
+    return proxies_for(url, store_name)
 
 def normalize_mercado_livre_url(url: str) -> str:
     """Se for página de verificação (gz/account-verification), extrai o parâmetro 'go'"""
@@ -95,7 +70,7 @@ def normalize_mercado_livre_url(url: str) -> str:
                 from urllib.parse import unquote
                 real_url = unquote(go_vals[0])
                 if real_url:
-                    print("↪️ Redirecionando para URL real do produto (go):", real_url)
+                    log.info(f"Redirecionando para URL real do produto (go): {real_url}")
                     return real_url
         return url
     except Exception:
@@ -113,8 +88,8 @@ def setup_chrome_driver_heroku():
         chrome_options.add_argument('--disable-gpu')
         
         # SOLUÇÃO COMPROVADA: Usar diretório temporário único e limpo
-        temp_dir = f"/tmp/chrome-{os.getpid()}-{int(time.time())}"
-        os.makedirs(temp_dir, exist_ok=True)
+        # (mkdtemp garante unicidade mesmo com vários drivers do pool no mesmo segundo)
+        temp_dir = tempfile.mkdtemp(prefix=f"chrome-{os.getpid()}-{int(time.time())}-", dir='/tmp')
         
         chrome_options.add_argument(f'--user-data-dir={temp_dir}')
         chrome_options.add_argument(f'--data-path={temp_dir}')
@@ -153,24 +128,30 @@ def setup_chrome_driver_heroku():
         chrome_options.add_argument('--allow-running-insecure-content')
         chrome_options.add_argument('--disable-features=VizDisplayCompositor')
         
+        # driver.get retorna no DOMContentLoaded; a prontidão real é aguardada por wait_for_page_ready
+        chrome_options.page_load_strategy = 'eager'
+        
+        # Log de performance (eventos de rede) para o relatório de bloqueio de recursos
+        chrome_options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
+        
         chrome_bin = os.environ.get('GOOGLE_CHROME_SHIM') or os.environ.get('CHROME_BIN')
         chromedriver_path = os.environ.get('CHROMEDRIVER_PATH', '/usr/local/bin/chromedriver')
 
         if chrome_bin:
             chrome_options.binary_location = chrome_bin
-            print(f"🔧 Chrome binary: {chrome_bin}")
+            log.debug("Chrome binary: %s", chrome_bin)
 
-        print(f"🔧 Configurando Chrome com diretório temporário: {temp_dir}")
+        log.debug("Configurando Chrome com diretório temporário: %s", temp_dir)
 
         service = Service(executable_path=chromedriver_path) if os.path.exists(chromedriver_path) else None
         driver = webdriver.Chrome(service=service, options=chrome_options) if service else webdriver.Chrome(options=chrome_options)
         driver.execute_script("Object.defineProperty(navigator, 'webdriver', {get: () => undefined})")
         
-        print("✅ Chrome configurado com sucesso para Heroku")
+        log.debug("Chrome configurado com sucesso para Heroku")
         return driver, temp_dir
         
     except Exception as e:
-        print(f"❌ Erro ao configurar Chrome para Heroku: {e}")
+        log.error(f"Erro ao configurar Chrome para Heroku: {e}")
         return None, None
 
 def cleanup_chrome_temp_dir(temp_dir):
@@ -178,337 +159,429 @@ def cleanup_chrome_temp_dir(temp_dir):
     if temp_dir and os.path.exists(temp_dir):
         try:
             shutil.rmtree(temp_dir)
-            print(f"🧹 Diretório temporário limpo: {temp_dir}")
+            log.debug("Diretório temporário limpo: %s", temp_dir)
         except Exception as e:
-            print(f"⚠️ Erro ao limpar diretório: {e}")
+            log.warning(f"Erro ao limpar diretório: {e}")
+
+def structured_image_infos(product, store_name):
+    """Converte as imagens de um produto estruturado em candidatas (create_image_info)"""
+    element = {'alt': product.get('title') or '', 'element_type': 'structured_data'}
+    return [create_image_info(src, element, store_name) for src in product.get('images', [])]
+
+def _structured_images_from_content(content, url, store_name, metadata=None):
+    """Fast path: imagens dos dados estruturados da página (sem montar a árvore do HTML)"""
+    with stage('parse_structured', store=rule_for_store(store_name).key):
+        product = extract_structured_product(content, url)
+    if not product or not product['images']:
+        return []
+    log.info(f"Dados estruturados ({', '.join(product['sources'])}): {len(product['images'])} imagens")
+    if metadata is not None:
+        metadata['structured_sources'] = product['sources']
+    return structured_image_infos(product, store_name)
+
+def extract_images_from_structured_data(url, store_name, metadata=None):
+    """Baixa a página e extrai só as imagens dos dados estruturados (antes do Selenium)"""
+    try:
+        log.debug("Buscando dados estruturados para %s", store_name)
+        rule = rule_for_store(store_name)
+        response = http_get(url, profile=rule.header_profile, timeout=20, proxies=get_proxies_for_url(url, store_name))
+        response.raise_for_status()
+        return _structured_images_from_content(response.content, url, store_name, metadata)
+    except Exception as e:
+        log.warning(f"Dados estruturados indisponíveis: {str(e)}")
+        return []
+
+def extract_images_from_amazon_page(url, store_name, metadata=None):
+    """Amazon sem Chrome: imagens hiRes do colorImages/data-a-dynamic-image (None em captcha/erro)"""
+    try:
+        product = fetch_amazon_product(url)
+    except AmazonRobotCheck:
+        return None
+    except Exception as e:
+        log.warning(f"Amazon via HTTP falhou: {e}", extra={'url': url})
+        return None
+    if metadata is not None:
+        metadata['structured_sources'] = product['sources']
+    return structured_image_infos(product, store_name)
 
-def extract_images_with_requests(url, store_name):
+def extract_images_with_requests(url, store_name, metadata=None):
     """SOLUÇÃO PRINCIPAL: Extrai imagens usando requests + BeautifulSoup com filtros flexíveis"""
     try:
-        print(f"🔄 Extraindo com requests + BeautifulSoup para {store_name}")
+        log.info(f"Extraindo com requests + BeautifulSoup para {store_name}")
         
         # Normalizar URL do Mercado Livre (evitar página de verificação)
         if store_name == 'Mercado Livre':
             url = normalize_mercado_livre_url(url)
 
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-            'Accept-Language': 'pt-BR,pt;q=0.9,en;q=0.8',
-            # Alguns proxies/WAF têm problemas com brotli; evitar 'br' para ML
-            'Accept-Encoding': 'gzip, deflate' if store_name == 'Mercado Livre' else 'gzip, deflate, br',
-            'DNT': '1',
-            'Connection': 'keep-alive',
-            'Upgrade-Insecure-Requests': '1',
-        }
-        if store_name == 'Mercado Livre':
-            headers['Referer'] = 'https://www.mercadolivre.com.br/'
+        # Perfil de headers da loja (ex.: Mercado Livre sem brotli e com Referer)
+        profile = rule_for_store(store_name).header_profile
         
         proxies = get_proxies_for_url(url, store_name)
         if proxies:
-            print("🛡️ Usando proxy para Mercado Livre")
-        try:
-            response = requests.get(url, headers=headers, timeout=30, proxies=proxies, allow_redirects=True)
-        except requests.exceptions.SSLError:
-            # Tentar novamente com conexão fechada
-            print("♻️ Re-tentando sem keep-alive por SSLError")
-            headers_retry = dict(headers)
-            headers_retry['Connection'] = 'close'
-            response = requests.get(url, headers=headers_retry, timeout=30, proxies=proxies, allow_redirects=True)
+            log.debug("Usando proxy para Mercado Livre")
+        response = http_get(url, profile=profile, timeout=30, proxies=proxies)
         response.raise_for_status()
         
-        soup = BeautifulSoup(response.content, 'html.parser')
-        images_found = []
-        
-        # Buscar imagens <img> com filtros FLEXÍVEIS
-        img_elements = soup.find_all('img')
-        print(f"📸 Encontradas {len(img_elements)} imagens <img> via requests")
+        # Fast path: produto em JSON-LD/__NEXT_DATA__/__PRELOADED_STATE__
+        if rule_for_store(store_name).structured_data:
+            structured_images = _structured_images_from_content(response.content, url, store_name, metadata)
+            if structured_images:
+                return structured_images
         
-        for img in img_elements:
-            try:
-                src = img.get('src') or img.get('data-src') or img.get('data-lazy-src') or img.get('data-original')
-                if src and is_main_product_image_flexible(src, img, store_name):
-                    # Converter para URL absoluta se necessário
-                    if src.startswith('//'):
-                        src = 'https:' + src
-                    elif src.startswith('/'):
-                        src = urljoin(url, src)
-                    elif not src.startswith('http'):
-                        src = urljoin(url, src)
-                    
-                    image_info = create_image_info(src, img, store_name)
-                    images_found.append(image_info)
-            except Exception as e:
-                continue
+        store_key = rule_for_store(store_name).key
+        with stage('parse', store=store_key, strategy='requests'):
+            soup = BeautifulSoup(response.content, 'html.parser')
         
-        # Buscar meta tags de imagem
-        meta_images = soup.find_all('meta', property=re.compile(r'image', re.I))
-        print(f"📸 Encontradas {len(meta_images)} meta tags de imagem via requests")
-        
-        for meta in meta_images:
-            try:
-                content = meta.get('content')
-                if content and is_main_product_image_flexible(content, meta, store_name):
-                    if content.startswith('//'):
-                        content = 'https:' + content
-                    elif content.startswith('/'):
-                        content = urljoin(url, content)
-                    elif not content.startswith('http'):
-                        content = urljoin(url, content)
-                    
-                    image_info = create_image_info(content, meta, store_name)
-                    images_found.append(image_info)
-            except Exception as e:
-                continue
-        
-        # Buscar imagens em CSS (background-image)
-        print("🔍 Buscando imagens em CSS...")
-        style_elements = soup.find_all('style')
-        for style in style_elements:
-            if style.string:
-                # Extrair URLs de background-image
-                background_images = re.findall(r'background-image:\s*url\(["\']?([^"\')\s]+)["\']?\)', style.string)
-                for bg_img in background_images:
-                    if bg_img and is_main_product_image_flexible(bg_img, style, store_name):
-                        if bg_img.startswith('//'):
-                            bg_img = 'https:' + bg_img
-                        elif bg_img.startswith('/'):
-                            bg_img = urljoin(url, bg_img)
-                        elif not bg_img.startswith('http'):
-                            bg_img = urljoin(url, bg_img)
+        with stage('collect', store=store_key, strategy='requests'):
+            images_found = []
+            
+            # Buscar imagens <img> com filtros FLEXÍVEIS
+            img_elements = soup.find_all('img')
+            log.debug("Encontradas %d imagens <img> via requests", len(img_elements))
+            
+            for img in img_elements:
+                try:
+                    src = img.get('src') or img.get('data-src') or img.get('data-lazy-src') or img.get('data-original')
+                    if src and is_main_product_image_flexible(src, img, store_name):
+                        # Converter para URL absoluta se necessário
+                        if src.startswith('//'):
+                            src = 'https:' + src
+                        elif src.startswith('/'):
+                            src = urljoin(url, src)
+                        elif not src.startswith('http'):
+                            src = urljoin(url, src)
                         
-                        image_info = create_image_info(bg_img, style, store_name)
+                        image_info = create_image_info(src, img, store_name)
                         images_found.append(image_info)
-        
-        print(f"✅ Total de imagens encontradas via requests: {len(images_found)}")
+                        log.debug("Candidata <img>: %s", src, extra=SAMPLED)
+                except Exception as e:
+                    log.debug("Candidata <img> ignorada: %s", e, extra=SAMPLED)
+                    continue
+            
+            # Buscar meta tags de imagem
+            meta_images = soup.find_all('meta', property=re.compile(r'image', re.I))
+            log.debug("Encontradas %d meta tags de imagem via requests", len(meta_images))
+            
+            for meta in meta_images:
+                try:
+                    content = meta.get('content')
+                    if content and is_main_product_image_flexible(content, meta, store_name):
+                        if content.startswith('//'):
+                            content = 'https:' + content
+                        elif content.startswith('/'):
+                            content = urljoin(url, content)
+                        elif not content.startswith('http'):
+                            content = urljoin(url, content)
+                        
+                        image_info = create_image_info(content, meta, store_name)
+                        images_found.append(image_info)
+                        log.debug("Candidata meta: %s", content, extra=SAMPLED)
+                except Exception as e:
+                    log.debug("Candidata meta ignorada: %s", e, extra=SAMPLED)
+                    continue
+            
+            # Buscar imagens em CSS (background-image)
+            log.debug("Buscando imagens em CSS")
+            style_elements = soup.find_all('style')
+            for style in style_elements:
+                if style.string:
+                    # Extrair URLs de background-image
+                    background_images = re.findall(r'background-image:\s*url\(["\']?([^"\')\s]+)["\']?\)', style.string)
+                    for bg_img in background_images:
+                        if bg_img and is_main_product_image_flexible(bg_img, style, store_name):
+                            if bg_img.startswith('//'):
+                                bg_img = 'https:' + bg_img
+                            elif bg_img.startswith('/'):
+                                bg_img = urljoin(url, bg_img)
+                            elif not bg_img.startswith('http'):
+                                bg_img = urljoin(url, bg_img)
+                            
+                            image_info = create_image_info(bg_img, style, store_name)
+                            images_found.append(image_info)
+        
+        log.info(f"Total de imagens encontradas via requests: {len(images_found)}")
         return images_found
         
     except Exception as e:
-        print(f"❌ Erro no requests: {str(e)}")
+        log.warning(f"Erro no requests: {str(e)}")
         return []
 
 def is_main_product_image_flexible(src, element, store_name):
-    """Filtro FLEXÍVEL para imagens principais de produto"""
+    """Filtro FLEXÍVEL para imagens principais de produto
+    
+    Usa os padrões pré-compilados do registro de lojas: a imagem é aceita se não
+    casar nenhuma exclusão e casar um padrão da loja ou tiver extensão de imagem.
+    """
     if not src:
         return False
     
-    src_lower = src.lower()
-    
     # Verificar se é uma URL válida (http/https)
     if not src.startswith(('http://', 'https://')):
         return False
     
-    # Padrões específicos para cada loja (MAIS FLEXÍVEIS)
-    store_patterns = {
-        'Amazon': [
-            'images-na.ssl-images-amazon.com/images/',
-            'images.amazon.com/images/',
-            'm.media-amazon.com/images/',
-            'product', 'prod', 'amazon'
-        ],
-        'Mercado Livre': [
-            'http2.mlstatic.com/',
-            'http2.mlstatic.com/D_',
-            'mlstatic.com/',
-            'product', 'produto', 'mercadolivre'
-        ],
-        'AliExpress': [
-            'ae01.alicdn.com/kf/',
-            'ae02.alicdn.com/kf/',
-            'ae03.alicdn.com/kf/',
-            'ae04.alicdn.com/kf/',
-            'product', 'prod', 'item', 'aliexpress'
-        ],
-        'Americanas': [
-            'americanas.vtexassets.com/arquivos/ids/',
-            'vtexassets.com/arquivos/ids/',
-            'product', 'produto', 'americanas'
-        ],
-        'Casas Bahia': [
-            'casasbahia.com.br/arquivos/ids/',
-            'vtexassets.com/arquivos/ids/',
-            'product', 'produto', 'casasbahia'
-        ],
-        'Shopee': [
-            'cf.shopee.com.br/',
-            'shopee.com.br/arquivos/',
-            'shopee.com.br/images/',
-            'deo.shopeemobile.com/',
-            'down-br.img.susercontent.com/',
-            'down-cvs-br.img.susercontent.com/',
-            'img.susercontent.com/',
-            'susercontent.com/',
-            'product', 'produto', 'shopee'
-        ],
-        'Shein': [
-            'img.ltwebstatic.com/images3_ccc/',
-            'sheinm.ltwebstatic.com/pwa_dist/images/',
-            'product', 'produto', 'shein'
-        ],
-        'Kabum': [
-            'images.kabum.com.br/produtos/fotos/',
-            'kabum.com.br/produtos/fotos/',
-            'kabum.com.br',
-            'product', 'produto', 'kabum'
-        ]
-    }
-    
-    # Padrões de EXCLUSÃO MENOS RIGOROSOS
-    exclude_patterns = [
-        'logo', 'icon', 'sprite', 'banner', 'ad', 'social',
-        'favicon', 'avatar', 'profile', 'thumb', 'small',
-        'transparent-pixel', 'grey-pixel', 'swatch-image',
-        'cr-lightbox', 'review-image', 'community-reviews',
-        'attach-accessory', 'button-icon', 'media-cheveron',
-        'loading', 'placeholder', 'no-image', 'blank',
-        'star', 'rating', 'review', 'coupon', 'discount',
-        'arrow', 'chevron', 'close', 'menu', 'hamburger',
-        'search', 'filter', 'sort', 'pagination',
-        'vlibras', 'accessibility', 'a11y', 'libras'
-    ]
-    
-    # Verificar exclusões (menos rigoroso)
-    for pattern in exclude_patterns:
-        if pattern in src_lower:
-            return False
+    src_lower = src.lower()
     
-    # Verificar se é uma imagem muito pequena (provavelmente ícone)
-    if any(size in src_lower for size in ['16x16', '24x24', '32x32', '48x48', '64x64']):
+    # Exclusões (ícones, sprites, tamanhos de ícone...)
+    if IMAGE_EXCLUDE_RE.search(src_lower):
         return False
     
-    # Verificar padrões da loja específica (MAIS FLEXÍVEL)
-    patterns = store_patterns.get(store_name, [])
-    for pattern in patterns:
-        if pattern in src_lower:
-            return True
+    # Padrões da loja específica
+    if rule_for_store(store_name).matches_include(src_lower):
+        return True
     
     # Verificar extensões de imagem válidas
-    if not any(src_lower.endswith(ext) for ext in ['.jpg', '.jpeg', '.png', '.webp']):
-        return False
-    
-    # Verificar se parece uma URL de produto (MAIS FLEXÍVEL)
-    if 'http' in src_lower:
-        # Aceitar mais padrões
-        product_indicators = ['product', 'prod', 'item', 'image', 'photo', 'pic', 'gallery', 'foto', 'imagem']
-        if any(indicator in src_lower for indicator in product_indicators):
-            return True
-        
-        # Para Kabum, aceitar URLs que contenham números (IDs de produto)
-        if store_name == 'Kabum' and re.search(r'\d+', src_lower):
-            return True
-    
-    return True
+    return src_lower.endswith(IMAGE_EXTENSIONS)
 
-def extract_images_with_selenium(url, store_name):
-    """Extrai imagens usando Selenium - versão otimizada para Heroku"""
-    driver = None
-    temp_dir = None
+def extract_images_with_selenium(url, store_name, metadata=None, cancel_token=None):
+    """Extrai imagens usando Selenium - usa um driver do pool de Chrome pré-aquecido
+    
+    Se metadata (dict) for informado, recebe 'page_ready_wait_s' com o tempo de espera da página.
+    Se cancel_token for informado e a estratégia perder a corrida, o Chrome é fechado
+    (o pool recicla o driver).
+    """
     try:
-        print(f"🚀 Tentando extração com Selenium para {store_name}...")
+        log.info(f"Tentando extração com Selenium para {store_name}")
+        
+        with get_driver_pool().session() as driver:
+            if not driver:
+                log.warning("Nenhum Chrome disponível no pool, tentando fallback")
+                return None
+            if cancel_token is None:
+                return _selenium_images(driver, url, store_name, metadata)
+            with cancel_token.guard(driver.quit):
+                if cancel_token.cancelled:
+                    return None
+                return _selenium_images(driver, url, store_name, metadata)
         
-        driver, temp_dir = setup_chrome_driver_heroku()
-        if not driver:
-            print("❌ Falha ao configurar Chrome, tentando fallback...")
+    except Exception as e:
+        if cancel_token is not None and cancel_token.cancelled:
+            log.info("Selenium cancelado (outra estratégia venceu)")
             return None
-        
-        print("🌐 Navegando para a URL...")
-        driver.get(url)
-        
-        # Aguardar carregamento básico
-        time.sleep(random.uniform(3, 5))
-        
-        images_found = []
-        
-        # Buscar imagens <img>
-        print("🔍 Buscando imagens <img>...")
-        img_elements = driver.find_elements(By.TAG_NAME, "img")
-        print(f"📸 Encontradas {len(img_elements)} imagens <img>")
-        
-        for img in img_elements:
+        log.warning(f"Erro no Selenium: {str(e)}")
+        return None
+
+def _selenium_images(driver, url, store_name, metadata):
+    """Navega, aguarda a prontidão e coleta as imagens com o driver já emprestado"""
+    log.debug("Navegando para a URL")
+    # Imagens, mídia, fontes e rastreadores bloqueados; aguardar a página ficar
+    # pronta (seletores da loja / rede ociosa, com teto)
+    store_key = rule_for_store(store_name).key
+    with stage('page_load', store=store_key, strategy='selenium'):
+        waited, network_report = load_page(driver, url, store_name, wait_for_page_ready)
+    if metadata is not None:
+        metadata['page_ready_wait_s'] = round(waited, 3)
+        metadata['network'] = network_report
+    
+    with stage('collect', store=store_key, strategy='selenium'):
+        if SELENIUM_BULK_HARVEST:
             try:
-                src = img.get_attribute('src')
-                if src and is_main_product_image_flexible(src, img, store_name):
-                    image_info = create_image_info(src, img, store_name)
-                    images_found.append(image_info)
-            except Exception as e:
+                images_found = _collect_images_bulk(driver, url, store_name)
+            except WebDriverException as e:
+                log.warning(f"Coleta em lote falhou ({str(e)[:80]}), usando get_attribute por elemento")
+                images_found = _collect_images_per_element(driver, store_name)
+        else:
+            images_found = _collect_images_per_element(driver, store_name)
+    
+    log.info(f"Selenium encontrou {len(images_found)} imagens")
+    return images_found
+
+def _collect_images_bulk(driver, page_url, store_name):
+    """Coleta todos os atributos das imagens e meta tags em uma única chamada execute_script"""
+    harvested = harvest_images(driver)
+    log.debug("Coletadas %d imagens <img> e %d meta tags em uma chamada", len(harvested['images']), len(harvested['metas']))
+    
+    images_found = []
+    for record in harvested['images']:
+        element = element_attributes(record)
+        # src, currentSrc, maior variante do srcset e atributos de lazy loading
+        candidates = [record.get('src'), record.get('current_src'),
+                      largest_srcset_candidate(record.get('srcset')), record.get('lazy_src')]
+        seen = set()
+        for src in candidates:
+            if not src:
                 continue
-        
-        # Buscar imagens com lazy loading
-        print("🔍 Buscando imagens com lazy loading...")
-        lazy_images = driver.find_elements(By.CSS_SELECTOR, "img[data-src], img[data-lazy-src], img[data-original]")
-        print(f"📸 Encontradas {len(lazy_images)} imagens lazy loading")
-        
-        for img in lazy_images:
-            try:
-                src = img.get_attribute('data-src') or img.get_attribute('data-lazy-src') or img.get_attribute('data-original')
-                if src and is_main_product_image_flexible(src, img, store_name):
-                    image_info = create_image_info(src, img, store_name)
-                    images_found.append(image_info)
-            except Exception as e:
+            src = urljoin(page_url, src)
+            if src in seen:
                 continue
-        
-        # Buscar meta tags
-        print("🔍 Buscando meta tags de imagem...")
-        meta_images = driver.find_elements(By.CSS_SELECTOR, "meta[property*='image']")
-        print(f"📸 Encontradas {len(meta_images)} meta tags de imagem")
-        
-        for meta in meta_images:
-            try:
-                content = meta.get_attribute('content')
-                if content and is_main_product_image_flexible(content, meta, store_name):
-                    image_info = create_image_info(content, meta, store_name)
-                    images_found.append(image_info)
-            except Exception as e:
-                continue
-        
-        print(f"✅ Selenium encontrou {len(images_found)} imagens")
-        return images_found
-        
-    except Exception as e:
-        print(f"❌ Erro no Selenium: {str(e)}")
-        return None
+            seen.add(src)
+            if is_main_product_image_flexible(src, element, store_name):
+                images_found.append(create_image_info(src, element, store_name))
     
-    finally:
-        if driver:
-            try:
-                print("🧹 Limpando recursos do Chrome...")
-                driver.quit()
-                print("✅ Chrome fechado com sucesso")
-            except Exception as e:
-                print(f"⚠️ Erro ao fechar Chrome: {e}")
-        
-        # Limpar diretório temporário
-        if temp_dir:
-            cleanup_chrome_temp_dir(temp_dir)
+    for meta in harvested['metas']:
+        content = meta.get('content')
+        if content and is_main_product_image_flexible(content, None, store_name):
+            images_found.append(create_image_info(content, {'element_type': 'meta'}, store_name))
+    
+    return images_found
+
+def _collect_images_per_element(driver, store_name):
+    """Coleta elemento a elemento (uma chamada ao chromedriver por atributo)"""
+    images_found = []
+    
+    # Buscar imagens <img>
+    log.debug("Buscando imagens <img>")
+    img_elements = driver.find_elements(By.TAG_NAME, "img")
+    log.debug("Encontradas %d imagens <img>", len(img_elements))
+    
+    for img in img_elements:
+        try:
+            src = img.get_attribute('src')
+            if src and is_main_product_image_flexible(src, img, store_name):
+                image_info = create_image_info(src, img, store_name)
+                images_found.append(image_info)
+        except Exception as e:
+            log.debug("Elemento ignorado: %s", e, extra=SAMPLED)
+            continue
+    
+    # Buscar imagens com lazy loading
+    log.debug("Buscando imagens com lazy loading")
+    lazy_images = driver.find_elements(By.CSS_SELECTOR, "img[data-src], img[data-lazy-src], img[data-original]")
+    log.debug("Encontradas %d imagens lazy loading", len(lazy_images))
+    
+    for img in lazy_images:
+        try:
+            src = img.get_attribute('data-src') or img.get_attribute('data-lazy-src') or img.get_attribute('data-original')
+            if src and is_main_product_image_flexible(src, img, store_name):
+                image_info = create_image_info(src, img, store_name)
+                images_found.append(image_info)
+        except Exception as e:
+            log.debug("Elemento ignorado: %s", e, extra=SAMPLED)
+            continue
+    
+    # Buscar meta tags
+    log.debug("Buscando meta tags de imagem")
+    meta_images = driver.find_elements(By.CSS_SELECTOR, "meta[property*='image']")
+    log.debug("Encontradas %d meta tags de imagem", len(meta_images))
+    
+    for meta in meta_images:
+        try:
+            content = meta.get_attribute('content')
+            if content and is_main_product_image_flexible(content, meta, store_name):
+                image_info = create_image_info(content, meta, store_name)
+                images_found.append(image_info)
+        except Exception as e:
+            log.debug("Elemento ignorado: %s", e, extra=SAMPLED)
+            continue
+    
+    return images_found
 
 def is_main_product_image(src, element, store_name):
     """Filtro rigoroso para imagens principais de produto (mantido para compatibilidade)"""
     return is_main_product_image_flexible(src, element, store_name)
 
-def get_image_dimensions(url):
-    """Obtém o tamanho real da imagem via HEAD request"""
+def get_image_dimensions(url, check_cache=True):
+    """
+    Formato, dimensões em pixels e tamanho da imagem por leitura parcial
+
+    Returns:
+        tuple: (sondada, ImageProbe | None) - sondada=False em erro de rede/servidor
+    """
     try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+        return True, probe_cache.probe(url, proxies=get_proxies_for_url(url), check_cache=check_cache)
+    except Exception as e:
+        log.debug("Sondagem falhou para %s: %s", url, e, extra=SAMPLED)
+        return False, None
+
+def _probe_candidate(img, check_cache):
+    """
+    Sonda a candidata; se a URL reescrita para a maior resolução não existir
+    (404/410, conteúdo que não é imagem), sonda a URL original da página
+
+    Returns:
+        tuple: (URL original a restaurar ou None, sondada, ImageProbe | None)
+    """
+    probed, probe = get_image_dimensions(img['url'], check_cache)
+    original_url = img.get('original_url')
+    if probed and probe is None and original_url:
+        log.debug("Reescrita sem imagem, voltando à original: %s", img['url'], extra=SAMPLED)
+        return (original_url, *get_image_dimensions(original_url))
+    return None, probed, probe
+
+def _variant_size_hint(url):
+    """Estimativa do tamanho da variante pelo token de tamanho na URL (ex.: ._AC_SL1500_.)"""
+    numbers = re.findall(r'\._[A-Z]{2}_?[A-Z]*(\d+)', url)
+    return max((int(n) for n in numbers), default=0)
+
+def probe_image_sizes(images, max_workers=None, deadline=None):
+    """
+    Sonda formato, dimensões reais e tamanho das imagens em paralelo antes do score
+    
+    - Agrupa os candidatos por get_base_image_url e sonda só uma variante por grupo
+      (a que aparenta ser a maior); as demais são duplicatas descartadas depois
+    - Imagens já resolvidas pelo cache de sondagens (probed=True) não vão para a rede
+    - Uma reescrita de CDN que não existe volta para a URL original (original_url)
+    - Usa um pool limitado de workers e um prazo global: o que não terminar
+      dentro do prazo fica sem dimensões (file_size_bytes = 0)
+    
+    Args:
+        images (list): Lista de dicts criados por create_image_info
+        max_workers (int, optional): Número máximo de sondagens simultâneas
+        deadline (float, optional): Prazo global em segundos
+    
+    Returns:
+        list: A mesma lista, com file_size_bytes, pixel_width, pixel_height e format preenchidos
+    """
+    max_workers = max_workers or IMAGE_PROBE_WORKERS
+    deadline = IMAGE_PROBE_DEADLINE if deadline is None else deadline
+    
+    # Uma variante representante por URL base
+    representatives = {}
+    for img in images:
+        base_url = get_base_image_url(img['url'])
+        current = representatives.get(base_url)
+        if current is None or _variant_size_hint(img['url']) > _variant_size_hint(current['url']):
+            representatives[base_url] = img
+    
+    # Representantes já resolvidos pelo cache (create_image_info) não são sondados de novo
+    representatives = {base_url: img for base_url, img in representatives.items() if not img.get('probed')}
+    if not representatives:
+        return images
+    
+    log.debug("Sondando tamanho de %d imagens únicas (%d candidatas)", len(representatives), len(images))
+    start_time = time.time()
+    
+    executor = ThreadPoolExecutor(max_workers=min(max_workers, len(representatives)))
+    try:
+        futures = {
+            # 'probed' ausente: a imagem não passou por create_image_info, consultar o cache
+            executor.submit(_probe_candidate, img, 'probed' not in img): img
+            for img in representatives.values()
         }
-        # Tentar usar proxy quando for Mercado Livre
-        proxies = get_proxies_for_url(url)
-        response = requests.head(url, headers=headers, timeout=10, allow_redirects=True, proxies=proxies)
-        
-        if response.status_code == 200:
-            content_length = response.headers.get('content-length', 0)
-            return int(content_length) if content_length else 0
-        return 0
-    except:
-        return 0
+        done, not_done = wait(futures, timeout=deadline)
+        for future in done:
+            original_url, probed, probe = future.result()
+            img = futures[future]
+            if original_url:
+                img['url'] = img.pop('original_url')
+            if probed:
+                apply_probe(img, probe)
+        if not_done:
+            log.warning(f"Prazo de sondagem esgotado: {len(not_done)} imagens sem dimensões")
+    finally:
+        # Não esperar sondagens pendentes: elas terminam sozinhas pelo timeout da requisição
+        executor.shutdown(wait=False, cancel_futures=True)
+    
+    log.debug("Sondagem concluída em %.2fs", time.time() - start_time)
+    return images
 
 def create_image_info(src, element, store_name):
-    """Cria informações da imagem com dados para ordenação por qualidade"""
+    """Cria informações da imagem com dados para ordenação por qualidade
+    
+    Formato, dimensões e tamanho vêm do cache de sondagens quando a imagem já
+    foi vista; senão são preenchidos depois, em lote, por probe_image_sizes.
+    """
     try:
-        file_size = get_image_dimensions(src)
-        
         # Extrair atributos baseado no tipo de elemento
-        if hasattr(element, 'get'):
+        if isinstance(element, dict):
+            # Atributos já coletados (dados estruturados, scripts no navegador)
+            alt = element.get('alt') or ''
+            title = element.get('title') or ''
+            width = element.get('width') or ''
+            height = element.get('height') or ''
+            class_attr = element.get('class') or ''
+            id_attr = element.get('id') or ''
+            tag_name = element.get('element_type') or 'unknown'
+        elif hasattr(element, 'get'):
             # Elemento BeautifulSoup
             alt = element.get('alt', '')
             title = element.get('title', '')
@@ -527,7 +600,7 @@ def create_image_info(src, element, store_name):
             id_attr = element.get_attribute('id') or ''
             tag_name = element.tag_name
         
-        return {
+        return apply_cached_probe({
             'url': src,
             'alt': alt,
             'title': title,
@@ -536,11 +609,11 @@ def create_image_info(src, element, store_name):
             'class': class_attr,
             'id': id_attr,
             'element_type': tag_name,
-            'file_size_bytes': file_size,
+            'file_size_bytes': 0,
             'quality_score': 0
-        }
+        })
     except:
-        return {
+        return apply_cached_probe({
             'url': src,
             'alt': '',
             'title': '',
@@ -551,16 +624,23 @@ def create_image_info(src, element, store_name):
             'element_type': 'unknown',
             'file_size_bytes': 0,
             'quality_score': 0
-        }
+        })
 
-def calculate_quality_score(image_info, store_name):
-    """Calcula score de qualidade baseado em resolução e tamanho real"""
-    score = 0
-    url = image_info['url'].lower()
+def size_quality_score(image_info):
+    """
+    Parte do score que vem do tamanho da imagem, entre 0 e IMAGE_PIXEL_SCORE_CAP
     
-    # Pontuar por tamanho do arquivo (mais preciso que dimensões HTML)
+    Área real em pixels (sondagem); sem ela, tamanho do arquivo e dimensões do HTML.
+    O teto é o que permite à seleção top-k descartar candidatas sem sondá-las.
+    """
+    # Dimensões reais do cabeçalho do arquivo
+    pixel_score = pixel_area_score(image_info)
+    if pixel_score:
+        return pixel_score
+    
+    score = 0
     if image_info['file_size_bytes'] > 0:
-        # Normalizar tamanho: 1MB = 100 pontos
+        # Sem dimensões decodificadas: tamanho do arquivo como aproximação (1MB = 100 pontos)
         score += (image_info['file_size_bytes'] / 1024 / 1024) * 100
     
     # Pontuar por dimensões HTML (se disponível)
@@ -573,6 +653,13 @@ def calculate_quality_score(image_info, store_name):
         except:
             pass
     
+    return min(score, IMAGE_PIXEL_SCORE_CAP)
+
+def static_quality_score(image_info, store_name):
+    """Parte do score que não depende da sondagem (extensão, padrões da loja e da URL, alt)"""
+    score = 0
+    url = image_info['url'].lower()
+    
     # Pontuar por extensão de arquivo
     if url.endswith('.jpg') or url.endswith('.jpeg'):
         score += 15
@@ -581,60 +668,8 @@ def calculate_quality_score(image_info, store_name):
     elif url.endswith('.webp'):
         score += 10
     
-    # Pontuar por padrões específicos da loja
-    if store_name == 'Amazon':
-        if 'images-na.ssl-images-amazon.com/images/' in url:
-            score += 30
-        if 'm.media-amazon.com/images/' in url:
-            score += 30
-        if 'product' in url:
-            score += 25
-    
-    elif store_name == 'Mercado Livre':
-        if 'http2.mlstatic.com/D_' in url:
-            score += 30
-        if 'mlstatic.com/' in url:
-            score += 25
-        if 'product' in url:
-            score += 20
-    
-    elif store_name == 'AliExpress':
-        if 'ae01.alicdn.com/kf/' in url:
-            score += 30
-        if 'product' in url:
-            score += 25
-    
-    elif store_name == 'Americanas':
-        if 'americanas.vtexassets.com/arquivos/ids/' in url:
-            score += 30
-        if 'product' in url:
-            score += 25
-    
-    elif store_name == 'Casas Bahia':
-        if 'casasbahia.com.br/arquivos/ids/' in url:
-            score += 30
-        if 'product' in url:
-            score += 25
-    
-    elif store_name == 'Shopee':
-        if 'shopee.com.br/arquivos/' in url:
-            score += 30
-        if 'product' in url:
-            score += 25
-    
-    elif store_name == 'Shein':
-        if 'img.ltwebstatic.com/images3_ccc/' in url:
-            score += 30
-        if 'product' in url:
-            score += 25
-    
-    elif store_name == 'Kabum':
-        if 'images.kabum.com.br/produtos/fotos/' in url:
-            score += 30
-        if 'kabum.com.br' in url:
-            score += 25
-        if 'product' in url:
-            score += 25
+    # Pontuar por padrões específicos da loja (pesos do registro de lojas)
+    score += rule_for_store(store_name).score_url(url)
     
     # Pontuar por padrões de qualidade na URL
     if any(term in url for term in ['high', 'large', 'original', 'full', 'hd', '4k', '1280', '1920']):
@@ -646,8 +681,104 @@ def calculate_quality_score(image_info, store_name):
     
     return score
 
+def calculate_quality_score(image_info, store_name):
+    """Calcula score de qualidade baseado em resolução e tamanho real"""
+    return static_quality_score(image_info, store_name) + size_quality_score(image_info)
+
+def select_top_images(images, store_name, limit=None, margin=None, deadline=None, patience=None):
+    """
+    Seleciona as limit melhores imagens sondando só as candidatas que ainda podem entrar
+    
+    - O score estático (sem rede) ordena as candidatas; o tamanho soma no máximo
+      IMAGE_PIXEL_SCORE_CAP, então estático + teto é um limite superior do score final
+    - Candidatas já resolvidas pelo cache de sondagens entram direto
+    - Sonda em rodadas (limit + margin na primeira, margin nas seguintes) as de maior
+      score estático e mantém um heap com as limit melhores
+    - Para quando o resultado estabiliza: a melhor candidata não sondada não alcança
+      a última do heap nem com o teto, ou patience rodadas seguidas não mudaram
+      as limit melhores (heurística; patience=0 deixa só o limite exato)
+    - Também para quando o prazo global acaba; as restantes ficam só com o score
+      sem sondagem
+    
+    Args:
+        images (list): Candidatas únicas (canonicalize_candidates)
+        store_name (str): Nome da loja (pesos de score)
+        limit (int, optional): Quantidade de imagens (None = todas, sondando todas)
+        margin (int, optional): Candidatas extras por rodada
+        patience (int, optional): Rodadas sem mudança antes de parar (0 = nunca)
+        deadline (float, optional): Prazo global das sondagens em segundos
+    
+    Returns:
+        list: Até limit imagens, da melhor para a pior, com quality_score
+    """
+    limit = len(images) if limit is None else limit
+    margin = IMAGE_TOPK_MARGIN if margin is None else margin
+    patience = IMAGE_TOPK_PATIENCE if patience is None else patience
+    deadline_at = time.time() + (IMAGE_PROBE_DEADLINE if deadline is None else deadline)
+    if limit <= 0:
+        return []
+    
+    top = []  # heap mínimo (score, ordem, imagem) com as limit melhores
+    
+    def offer(static_score, order, img):
+        img['quality_score'] = static_score + size_quality_score(img)
+        entry = (img['quality_score'], -order, img)
+        if len(top) < limit:
+            heapq.heappush(top, entry)
+        elif entry[:2] > top[0][:2]:
+            heapq.heapreplace(top, entry)
+        else:
+            return False
+        return True
+    
+    pending = []  # heap máximo pelo score estático das que ainda não foram sondadas
+    for order, img in enumerate(images):
+        static_score = static_quality_score(img, store_name)
+        if img.get('probed'):
+            offer(static_score, order, img)
+        else:
+            pending.append((-static_score, order, img))
+    heapq.heapify(pending)
+    
+    rounds = probed = stable_rounds = 0
+    batch_size = limit + margin
+    while pending:
+        threshold = top[0][0] if len(top) >= limit else float('-inf')
+        batch = []
+        while pending and len(batch) < batch_size and -pending[0][0] + IMAGE_PIXEL_SCORE_CAP > threshold:
+            batch.append(heapq.heappop(pending))
+        remaining = deadline_at - time.time()
+        if not batch or remaining <= 0:
+            # Resultado estável (ou sem prazo): nenhuma restante precisa de rede
+            pending.extend(batch)
+            break
+        was_full = len(top) >= limit
+        probe_image_sizes([img for _, _, img in batch], deadline=remaining)
+        entered = sum(offer(-negative_static, order, img) for negative_static, order, img in batch)
+        rounds += 1
+        probed += len(batch)
+        batch_size = max(1, margin)
+        if was_full and not entered:
+            # Rodadas seguidas sem mudança nas limit melhores: resultado estável
+            stable_rounds += 1
+            if patience and stable_rounds >= patience:
+                break
+        else:
+            stable_rounds = 0
+    
+    # As não sondadas entram com o score sem sondagem (só ficam se couberem)
+    for negative_static, order, img in pending:
+        offer(-negative_static, order, img)
+    
+    log.debug("Top-%d: %d de %d candidatas sondadas em %d rodadas", limit, probed, len(images), rounds)
+    return [img for _, _, img in sorted(top, key=lambda entry: entry[:2], reverse=True)]
+
 def get_base_image_url(url):
-    """Remove parâmetros de URL para identificar imagens duplicadas"""
+    """Identidade da imagem para deduplicação (regra da CDN ou URL sem parâmetros e tokens de tamanho)"""
+    image_id = canonical_image_id(url)
+    if image_id:
+        return image_id
+    
     base_url = url.split('?')[0].split('#')[0]
     
     # Remover parâmetros de tamanho específicos
@@ -657,30 +788,157 @@ def get_base_image_url(url):
     
     return base_url
 
-def extract_product_images(url, store_name=None):
+def canonicalize_candidates(images):
+    """
+    Reescreve cada candidata para a maior resolução conhecida da CDN e junta as
+    variantes da mesma foto (cdn_rules), antes da sondagem
+    
+    A primeira ocorrência (ordem da página) é mantida, com o alt mais descritivo
+    entre as variantes. Largura/altura do HTML descrevem a variante original e são
+    descartadas quando a URL é reescrita; a URL original fica em original_url
+    (a sondagem volta para ela se a reescrita não existir).
+    """
+    unique = {}
+    for img in images:
+        url = max_resolution_candidate(img['url'])
+        if url != img['url']:
+            img = {key: value for key, value in img.items() if key not in PROBE_FIELDS}
+            img = apply_cached_probe(dict(img, url=url, original_url=img['url'], width='', height='',
+                                          file_size_bytes=0))
+        key = get_base_image_url(url)
+        current = unique.get(key)
+        if current is None:
+            unique[key] = img
+        elif len(img.get('alt') or '') > len(current.get('alt') or ''):
+            current['alt'] = img['alt']
+    if len(unique) < len(images):
+        log.debug("Variantes de CDN: %d candidatas -> %d fotos", len(images), len(unique))
+    return list(unique.values())
+
+def extract_images_with_seo(url):
+    """Fallback SEO estilo WhatsApp: a imagem do og:image como única imagem"""
+    seo_result = extract_seo_meta_tags(url)
+    if seo_result['status'] != 'success' or not seo_result.get('image'):
+        return None
+    
+    # Criar uma imagem fake baseada no resultado SEO
+    seo_image = {
+        'url': seo_result['image'],
+        'alt': seo_result.get('title', ''),
+        'title': seo_result.get('title', ''),
+        'width': '',
+        'height': '',
+        'class': '',
+        'id': '',
+        'element_type': 'seo_fallback',
+        'file_size_bytes': 0,
+        'quality_score': 50  # Score médio para SEO
+    }
+    log.info(f"Fallback SEO encontrou 1 imagem: {seo_result['image'][:80]}...")
+    return [seo_image]
+
+# Estratégia vencedora -> extraction_method da resposta
+IMAGE_STRATEGY_METHODS = {
+    'structured': 'structured_data',
+    'amazon_http': 'amazon_http',
+    'selenium': 'selenium_headless',
+    'requests': 'requests_beautifulsoup',
+    'seo': 'seo_whatsapp_fallback',
+}
+
+def race_image_strategies(url, store_name):
+    """
+    Corre as estratégias de imagem da política da loja (ver strategy_race), na ordem
+    aprendida para o host (ver strategy_router)
+    
+    Cada estratégia preenche o seu próprio metadata; o resultado é (imagens, metadata).
+    Completa = pelo menos HEDGE_MIN_IMAGES imagens (o fallback SEO nunca é completo).
+    """
+    rule = rule_for_store(store_name)
+    
+    def structured(token):
+        metadata = {}
+        return extract_images_from_structured_data(url, store_name, metadata), metadata
+    
+    # Página da Amazon lida via HTTP (sem captcha): o Chrome não acharia mais nada
+    amazon_page_read = threading.Event()
+    
+    def amazon_http(token):
+        metadata = {}
+        images = extract_images_from_amazon_page(url, store_name, metadata)
+        if images:
+            amazon_page_read.set()
+        return images, metadata
+    
+    def selenium(token):
+        # Chrome só como fallback; desistir cancela o token e não conta como falha
+        if amazon_page_read.is_set():
+            token.cancel()
+            return None, {}
+        metadata = {}
+        return extract_images_with_selenium(url, store_name, metadata, cancel_token=token), metadata
+    
+    def with_requests(token):
+        metadata = {}
+        return extract_images_with_requests(url, store_name, metadata), metadata
+    
+    def seo(token):
+        return extract_images_with_seo(url), {}
+    
+    runners = {
+        'structured': structured, 'amazon_http': amazon_http, 'selenium': selenium,
+        'requests': with_requests, 'seo': seo,
+    }
+    policy = [
+        (name, delay) for name, delay in policy_for(IMAGE_HEDGE_POLICIES, rule.key)
+        if name in runners and (name != 'structured' or rule.structured_data)
+    ]
+    # Ordem ajustada pelo histórico do host (strategy_router)
+    strategies = [Strategy(name, runners[name], delay) for name, delay in strategy_router.plan(url, policy)]
+    log.info(f"Estratégias para {store_name}: {', '.join(f'{s.name}@{s.delay:g}s' for s in strategies)}")
+    
+    def is_complete(result):
+        images, _ = result or (None, {})
+        return bool(images) and len(images) >= HEDGE_MIN_IMAGES and images[0].get('element_type') != 'seo_fallback'
+    
+    def is_usable(result):
+        images, _ = result or (None, {})
+        return bool(images)
+    
+    outcome = race(strategies, is_complete, is_usable, store=rule.key)
+    strategy_router.record_outcome(url, outcome)
+    return outcome
+
+def extract_product_images(url, store_name=None, limit=None):
     """
     Função principal para extrair imagens de produto com estratégia híbrida
     
     Args:
         url (str): URL do produto
         store_name (str, optional): Nome da loja (será detectado automaticamente se não fornecido)
+        limit (int, optional): Quantidade máxima de imagens (None = todas)
     
     Returns:
         dict: Dicionário com informações das imagens extraídas
+              (total_images_found conta todas as candidatas únicas)
     """
     try:
         # Detectar loja automaticamente se não fornecida
         if not store_name:
             store_name = detect_store_from_url(url)
         
-        print(f"Iniciando extração para {store_name}: {url}")
+        log.info(f"Iniciando extração para {store_name}", extra={'url': url, 'store': store_name})
+        metadata = {}
         
         # Estratégia ESPECIAL para Kabum (sem Chrome)
         if store_name == 'Kabum':
-            print("🎯 Usando extrator específico do Kabum...")
+            log.debug("Usando extrator específico do Kabum")
             from kabum_extractor import extract_kabum_images, calculate_kabum_quality_score
             
-            images = extract_kabum_images(url)
+            with stage('collect', store='kabum', strategy='kabum') as timer:
+                images = extract_kabum_images(url)
+                if not images:
+                    timer.outcome = 'empty'
             if images:
                 # Calcular scores específicos do Kabum
                 for img in images:
@@ -699,7 +957,18 @@ def extract_product_images(url, store_name=None):
                         seen_urls.add(base_url)
                         unique_images.append(img)
                 
-                print(f"✅ Kabum: {len(unique_images)} imagens únicas encontradas")
+                log.info(f"Kabum: {len(unique_images)} imagens únicas encontradas")
+                
+                # Reescritas _gg ainda não sondadas entre as escolhidas: confirmar que existem
+                # (as que não existem voltam para a URL original) e reordenar
+                top_images = unique_images[:limit]
+                unverified = [img for img in top_images if img.get('original_url') and not img.get('probed')]
+                if unverified:
+                    with stage('select', store='kabum', strategy='kabum'):
+                        probe_image_sizes(unverified)
+                    for img in unverified:
+                        img['quality_score'] = calculate_kabum_quality_score(img)
+                    top_images.sort(key=lambda x: x['quality_score'], reverse=True)
                 
                 return {
                     'store_name': store_name,
@@ -707,84 +976,47 @@ def extract_product_images(url, store_name=None):
                     'extraction_date': datetime.now().isoformat(),
                     'total_images_found': len(unique_images),
                     'extraction_method': 'kabum_specific_extractor',
-                    'images': unique_images
+                    'images': top_images
                 }
         
-        # Para Mercado Livre, priorizar requests com proxy em vez de Selenium
-        if store_name == 'Mercado Livre':
-            print("🎯 Mercado Livre detectado: usando requests + proxy")
-            images = extract_images_with_requests(url, store_name)
-        else:
-            # Estratégia 1: Tentar Selenium primeiro (mais robusto)
-            images = extract_images_with_selenium(url, store_name)
-        
-        # Estratégia 2: Se Selenium falhar, usar requests + BeautifulSoup (MAIS FLEXÍVEL)
-        if not images:
-            print("🔄 Selenium falhou, tentando fallback com requests...")
-            images = extract_images_with_requests(url, store_name)
+        # Estratégias em corrida com hedge (política por loja): a primeira completa vence
+        outcome = race_image_strategies(url, store_name)
+        images, strategy_metadata = outcome.result or (None, {})
+        metadata.update(strategy_metadata)
         
-        # Estratégia 3: Se tudo falhar, usar método SEO estilo WhatsApp (FALLBACK FINAL)
         if not images:
-            print("🔄 Métodos tradicionais falharam, tentando fallback SEO estilo WhatsApp...")
-            seo_result = extract_seo_meta_tags(url)
-            
-            if seo_result['status'] == 'success' and seo_result.get('image'):
-                # Criar uma imagem fake baseada no resultado SEO
-                seo_image = {
-                    'url': seo_result['image'],
-                    'alt': seo_result.get('title', ''),
-                    'title': seo_result.get('title', ''),
-                    'width': '',
-                    'height': '',
-                    'class': '',
-                    'id': '',
-                    'element_type': 'seo_fallback',
-                    'file_size_bytes': 0,
-                    'quality_score': 50  # Score médio para SEO
-                }
-                images = [seo_image]
-                print(f"✅ Fallback SEO encontrou 1 imagem: {seo_result['image'][:80]}...")
-        
-        if not images:
-            print("❌ Nenhuma imagem encontrada com nenhuma estratégia")
+            log.warning("Nenhuma imagem encontrada com nenhuma estratégia")
             return None
         
-        print(f"Encontradas {len(images)} imagens de produto")
-        
-        # Calcular scores de qualidade
-        for img in images:
-            img['quality_score'] = calculate_quality_score(img, store_name)
+        log.info(f"Encontradas {len(images)} imagens de produto")
         
-        # Ordenar por qualidade (melhor para pior)
-        images.sort(key=lambda x: x['quality_score'], reverse=True)
+        store_key = rule_for_store(store_name).key
         
-        # Remover duplicatas baseado na URL base
-        unique_images = []
-        seen_urls = set()
+        # Variantes da mesma foto -> uma candidata na maior resolução (regras por CDN, sem rede)
+        with stage('canonicalize', store=store_key, strategy=outcome.winner):
+            images = canonicalize_candidates(images)
         
-        for img in images:
-            base_url = get_base_image_url(img['url'])
-            if base_url not in seen_urls:
-                seen_urls.add(base_url)
-                unique_images.append(img)
+        # Top-k: score estático para todas, sondagem só para as que podem entrar
+        with stage('select', store=store_key, strategy=outcome.winner):
+            top_images = select_top_images(images, store_name, limit)
         
-        print(f"Após remoção de duplicatas: {len(unique_images)} imagens únicas")
+        log.info(f"{len(images)} imagens únicas, {len(top_images)} selecionadas")
         
-        # Determinar método de extração usado
-        if any(img.get('element_type') == 'seo_fallback' for img in images):
-            extraction_method = 'seo_whatsapp_fallback'
-        else:
-            extraction_method = 'selenium_headless' if images else 'requests_beautifulsoup'
+        # Método de extração = estratégia vencedora da corrida
+        extraction_method = IMAGE_STRATEGY_METHODS.get(outcome.winner, outcome.winner)
         
         return {
             'store_name': store_name,
             'url': url,
             'extraction_date': datetime.now().isoformat(),
-            'total_images_found': len(unique_images),
+            'total_images_found': len(images),
             'extraction_method': extraction_method,
-            'images': unique_images
+            'page_ready_wait_s': metadata.get('page_ready_wait_s'),
+            'network': metadata.get('network'),
+            'strategy_timings': outcome.timings,
+            'images': top_images
         }
         
     except Exception as e:
-        print(f"Erro na extração: {str(e)}")
+        log.exception(f"Erro na extração: {e}", extra={'url': url})
         raise e
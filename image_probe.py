@@ -0,0 +1,389 @@
+"""
+Sondagem das imagens por leitura parcial
+Em vez de um HEAD por imagem (Content-Length não diz nada sobre resolução:
+um WebP tem metade dos bytes de um JPEG igual, e muitas CDNs nem mandam o
+cabeçalho), pede só os primeiros KB com Range e decodifica o cabeçalho do
+arquivo para obter formato, largura e altura reais:
+- JPEG: segmento SOFn (pula APPn/EXIF até IMAGE_PROBE_MAX_BYTES)
+- PNG: IHDR; GIF: descritor da tela lógica
+- WebP: VP8 / VP8L / VP8X; AVIF: caixa ispe
+O tamanho total vem do Content-Range (ou Content-Length). O HEAD só é usado
+quando o servidor recusa o Range.
+
+Os resultados ficam em um cache do processo (probe_cache), compartilhado entre
+requisições: as mesmas imagens de CDN aparecem em várias páginas e extrações.
+LRU com TTL, entradas negativas para 404/410 e camada opcional em SQLite.
+"""
+
+import os
+import re
+import struct
+
+from http_client import http_get, http_head
+from store_registry import lookup_store
+from cache import TieredCache, strip_tracking_params
+from cdn_rules import max_resolution_url
+from metrics import count_response_bytes
+from structured_logging import get_logger, SAMPLED
+
+log = get_logger('probe')
+
+# Primeira leitura (cobre PNG/GIF/WebP/AVIF e a maioria dos JPEG)
+IMAGE_PROBE_RANGE_BYTES = int(os.getenv('IMAGE_PROBE_RANGE_BYTES', '4096'))
+# Teto para JPEG com EXIF/miniatura grande antes do SOF
+IMAGE_PROBE_MAX_BYTES = int(os.getenv('IMAGE_PROBE_MAX_BYTES', '65536'))
+IMAGE_PROBE_TIMEOUT = float(os.getenv('IMAGE_PROBE_TIMEOUT', '10'))
+# Teto dos pontos por área em pixels no score de qualidade (200 = 2000x2000)
+IMAGE_PIXEL_SCORE_CAP = float(os.getenv('IMAGE_PIXEL_SCORE_CAP', '200'))
+
+# Cache das sondagens (a imagem de uma URL de CDN praticamente não muda)
+IMAGE_PROBE_CACHE_TTL = int(os.getenv('IMAGE_PROBE_CACHE_TTL', '86400'))
+IMAGE_PROBE_CACHE_NEGATIVE_TTL = int(os.getenv('IMAGE_PROBE_CACHE_NEGATIVE_TTL', '600'))
+IMAGE_PROBE_CACHE_MAX_ENTRIES = int(os.getenv('IMAGE_PROBE_CACHE_MAX_ENTRIES', '20000'))
+# Caminho do SQLite (vazio = só memória)
+IMAGE_PROBE_CACHE_DB = os.getenv('IMAGE_PROBE_CACHE_DB', '')
+
+_CONTENT_RANGE_RE = re.compile(r'bytes\s+\d+-\d+/(\d+)')
+# Marcadores SOFn (exceto DHT 0xC4, JPG 0xC8 e DAC 0xCC)
+_JPEG_SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+# Marcadores sem campo de tamanho (TEM, RSTn, SOI, EOI)
+_JPEG_STANDALONE_MARKERS = frozenset([0x01, *range(0xD0, 0xDA)])
+_AVIF_BRANDS = (b'avif', b'avis')
+# Status em que o servidor não aceitou o Range: tentar o HEAD
+_RANGE_REJECTED = (405, 416, 501)
+# Imagem inexistente (resultado definitivo, vai para o cache negativo)
+_MISSING_STATUS = (404, 410)
+
+
+class NeedMoreData(Exception):
+    """O cabeçalho da imagem continua depois dos bytes lidos"""
+
+
+class ImageProbe:
+    """Resultado da sondagem de uma imagem"""
+
+    __slots__ = ('format', 'width', 'height', 'file_size_bytes', 'content_type', 'bytes_read', 'method')
+
+    def __init__(self, format=None, width=0, height=0, file_size_bytes=0, content_type='', bytes_read=0,
+                 method='range'):
+        self.format = format
+        self.width = width
+        self.height = height
+        self.file_size_bytes = file_size_bytes
+        self.content_type = content_type
+        self.bytes_read = bytes_read
+        self.method = method
+
+    @property
+    def pixels(self):
+        return self.width * self.height
+
+    def to_dict(self):
+        return {'format': self.format, 'width': self.width, 'height': self.height,
+                'file_size_bytes': self.file_size_bytes, 'content_type': self.content_type}
+
+    @classmethod
+    def from_dict(cls, data, method='cache'):
+        return cls(data.get('format'), data.get('width', 0), data.get('height', 0),
+                   data.get('file_size_bytes', 0), data.get('content_type', ''), method=method)
+
+    def __repr__(self):
+        return (f"ImageProbe({self.format}, {self.width}x{self.height}, "
+                f"{self.file_size_bytes} bytes, via {self.method})")
+
+
+def _jpeg_size(data):
+    offset = 2
+    while True:
+        # Bytes 0xFF de preenchimento antes do marcador são permitidos
+        while offset < len(data) and data[offset] == 0xFF:
+            offset += 1
+        if offset >= len(data):
+            raise NeedMoreData
+        marker = data[offset]
+        offset += 1
+        if marker in _JPEG_STANDALONE_MARKERS:
+            continue
+        if marker == 0xDA:
+            # Início dos dados da imagem sem SOF: arquivo inválido
+            return None
+        if offset + 2 > len(data):
+            raise NeedMoreData
+        length = struct.unpack_from('>H', data, offset)[0]
+        if marker in _JPEG_SOF_MARKERS:
+            if offset + 7 > len(data):
+                raise NeedMoreData
+            height, width = struct.unpack_from('>HH', data, offset + 3)
+            return width, height
+        if length < 2:
+            return None
+        offset += length
+
+
+def _webp_size(data):
+    if len(data) < 30:
+        raise NeedMoreData
+    chunk = data[12:16]
+    if chunk == b'VP8X':
+        return (int.from_bytes(data[24:27], 'little') + 1,
+                int.from_bytes(data[27:30], 'little') + 1)
+    if chunk == b'VP8 ':
+        # Quadro-chave: 3 bytes de tag, assinatura 9d 01 2a e as dimensões (14 bits)
+        width, height = struct.unpack_from('<HH', data, 26)
+        return width & 0x3FFF, height & 0x3FFF
+    if chunk == b'VP8L':
+        bits = int.from_bytes(data[21:25], 'little')
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    return None
+
+
+def _avif_size(data):
+    # ispe (largura/altura da imagem) fica dentro do meta, no começo do arquivo;
+    # com miniatura/canal alfa há mais de um: vale o maior
+    sizes = []
+    offset = data.find(b'ispe')
+    while offset != -1:
+        if offset + 16 > len(data):
+            break
+        sizes.append(struct.unpack_from('>II', data, offset + 8))
+        offset = data.find(b'ispe', offset + 4)
+    if not sizes:
+        if b'mdat' in data:
+            return None
+        raise NeedMoreData
+    return max(sizes, key=lambda size: size[0] * size[1])
+
+
+def parse_image_header(data):
+    """
+    Formato e dimensões a partir dos primeiros bytes do arquivo
+
+    Args:
+        data (bytes): Início do arquivo
+
+    Returns:
+        tuple | None: (formato, largura, altura), ou None se não for uma imagem reconhecida
+
+    Raises:
+        NeedMoreData: o cabeçalho continua depois de data
+    """
+    if data[:3] == b'\xff\xd8\xff':
+        size = _jpeg_size(data)
+        return ('jpeg', *size) if size else None
+    if data[:8] == b'\x89PNG\r\n\x1a\n':
+        if len(data) < 24:
+            raise NeedMoreData
+        return ('png', *struct.unpack_from('>II', data, 16))
+    if data[:6] in (b'GIF87a', b'GIF89a'):
+        if len(data) < 10:
+            raise NeedMoreData
+        return ('gif', *struct.unpack_from('<HH', data, 6))
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        size = _webp_size(data)
+        return ('webp', *size) if size else None
+    if data[4:8] == b'ftyp' and any(brand in data[8:struct.unpack_from('>I', data, 0)[0]] for brand in _AVIF_BRANDS):
+        size = _avif_size(data)
+        return ('avif', *size) if size else None
+    if len(data) < 32:
+        raise NeedMoreData
+    return None
+
+
+def _total_size(response):
+    content_range = _CONTENT_RANGE_RE.match(response.headers.get('content-range', ''))
+    if content_range:
+        return int(content_range.group(1))
+    if response.status_code == 200:
+        return int(response.headers.get('content-length') or 0)
+    return 0
+
+
+def _read_header(response, buffer, limit):
+    """
+    Lê o corpo até decodificar o cabeçalho ou atingir limit bytes
+
+    Resposta 206 é lida até o fim (o intervalo já é pequeno e a conexão volta
+    ao pool); 200 é interrompida no cabeçalho e a conexão é fechada.
+    """
+    if response.status_code == 206:
+        buffer.extend(response.content)
+        return parse_image_header(bytes(buffer))
+    for chunk in response.iter_content(chunk_size=4096):
+        buffer.extend(chunk)
+        try:
+            return parse_image_header(bytes(buffer))
+        except NeedMoreData:
+            if len(buffer) >= limit:
+                raise
+    return parse_image_header(bytes(buffer))
+
+
+def _probe_with_head(url, proxies, timeout):
+    response = http_head(url, profile='image', timeout=timeout, proxies=proxies)
+    if response.status_code in _MISSING_STATUS:
+        return None
+    response.raise_for_status()
+    return ImageProbe(file_size_bytes=int(response.headers.get('content-length') or 0),
+                      content_type=response.headers.get('content-type', ''), method='head')
+
+
+def probe_image(url, proxies=None, timeout=IMAGE_PROBE_TIMEOUT):
+    """
+    Sonda formato, dimensões e tamanho da imagem com leitura parcial
+
+    Args:
+        url (str): URL da imagem
+        proxies (dict, optional): Proxies no formato do requests
+        timeout (float): Timeout de cada requisição
+
+    Returns:
+        ImageProbe | None: None se a imagem não existe (404/410)
+
+    Raises:
+        requests.RequestException: erro de rede ou outro status HTTP de erro
+    """
+    buffer = bytearray()
+    probe = None
+    response = http_get(url, profile='image', timeout=timeout, proxies=proxies, stream=True,
+                        headers={'Range': f'bytes=0-{IMAGE_PROBE_RANGE_BYTES - 1}'})
+    try:
+        if response.status_code in _RANGE_REJECTED:
+            response.close()
+            return _probe_with_head(url, proxies, timeout)
+        if response.status_code in _MISSING_STATUS:
+            return None
+        response.raise_for_status()
+        total = _total_size(response)
+        # 206: a leitura acaba no fim do intervalo; 200 (Range ignorado): para no limite
+        limit = IMAGE_PROBE_RANGE_BYTES if response.status_code == 206 else IMAGE_PROBE_MAX_BYTES
+        probe = ImageProbe(file_size_bytes=total, content_type=response.headers.get('content-type', ''),
+                           method='range' if response.status_code == 206 else 'get')
+        try:
+            header = _read_header(response, buffer, limit)
+        except NeedMoreData:
+            header = None
+            if response.status_code == 206 and len(buffer) < min(total or IMAGE_PROBE_MAX_BYTES, IMAGE_PROBE_MAX_BYTES):
+                # JPEG com EXIF longo: mais um intervalo até o teto
+                response.close()
+                response = http_get(url, profile='image', timeout=timeout, proxies=proxies, stream=True,
+                                    headers={'Range': f'bytes={len(buffer)}-{IMAGE_PROBE_MAX_BYTES - 1}'})
+                if response.status_code == 206:
+                    try:
+                        header = _read_header(response, buffer, IMAGE_PROBE_MAX_BYTES)
+                    except NeedMoreData:
+                        pass
+        if header:
+            probe.format, probe.width, probe.height = header
+        else:
+            log.debug("Cabeçalho não reconhecido em %s (%d bytes lidos)", url, len(buffer), extra=SAMPLED)
+        return probe
+    finally:
+        response.close()
+        if probe is not None:
+            probe.bytes_read = len(buffer)
+        count_response_bytes(lookup_store(url).key, bool(proxies), len(buffer))
+
+
+class ProbeCache:
+    """Cache das sondagens por URL normalizada da imagem (positivas e negativas)"""
+
+    def __init__(self, max_entries=IMAGE_PROBE_CACHE_MAX_ENTRIES, db_path=IMAGE_PROBE_CACHE_DB):
+        self._cache = TieredCache(max_entries, db_path, table='image_probes')
+
+    @staticmethod
+    def make_key(url):
+        return strip_tracking_params(url)
+
+    def lookup(self, url):
+        """
+        Consulta sem rede
+
+        Returns:
+            tuple: (encontrado, ImageProbe | None) - (True, None) é uma entrada negativa
+        """
+        item = self._cache.get(self.make_key(url))
+        if item is None:
+            return False, None
+        entry = item[0]
+        return True, (ImageProbe.from_dict(entry) if entry.get('ok') else None)
+
+    def store(self, url, probe):
+        if probe is None:
+            self._cache.set(self.make_key(url), {'ok': False}, IMAGE_PROBE_CACHE_NEGATIVE_TTL)
+        else:
+            self._cache.set(self.make_key(url), {'ok': True, **probe.to_dict()}, IMAGE_PROBE_CACHE_TTL)
+
+    def probe(self, url, proxies=None, timeout=IMAGE_PROBE_TIMEOUT, check_cache=True):
+        """
+        probe_image com cache; erros de rede e status 5xx não são gravados
+
+        Args:
+            check_cache (bool): False quando o chamador já consultou o cache (lookup)
+        """
+        if check_cache:
+            found, probe = self.lookup(url)
+            if found:
+                return probe
+        probe = probe_image(url, proxies=proxies, timeout=timeout)
+        self.store(url, probe)
+        return probe
+
+    def stats(self):
+        return self._cache.stats()
+
+
+probe_cache = ProbeCache()
+
+
+# Campos que a sondagem acrescenta ao dict da imagem
+PROBE_FIELDS = ('probed', 'pixel_width', 'pixel_height', 'format')
+
+
+def apply_probe(image_info, probe):
+    """Copia o resultado da sondagem para o dict da imagem"""
+    image_info['probed'] = True
+    if probe is not None:
+        image_info['file_size_bytes'] = probe.file_size_bytes
+        image_info['pixel_width'] = probe.width
+        image_info['pixel_height'] = probe.height
+        image_info['format'] = probe.format
+    return image_info
+
+
+def apply_cached_probe(image_info):
+    """
+    Preenche a imagem com a sondagem em cache, se houver (sem rede)
+
+    'probed' fica False na falta: probe_image_sizes sonda sem consultar o cache de novo.
+    """
+    found, probe = probe_cache.lookup(image_info['url'])
+    if found:
+        return apply_probe(image_info, probe)
+    image_info['probed'] = False
+    return image_info
+
+
+def max_resolution_candidate(url):
+    """
+    URL da maior resolução da CDN (cdn_rules), salvo se o cache de sondagens já
+    sabe que ela não existe (entrada negativa): aí fica a URL original
+
+    A reescrita é só um palpite: quem a usa guarda a original em 'original_url'
+    para voltar a ela se a sondagem da reescrita falhar.
+    """
+    rewritten = max_resolution_url(url)
+    if rewritten != url:
+        found, probe = probe_cache.lookup(rewritten)
+        if found and probe is None:
+            return url
+    return rewritten
+
+
+def pixel_area_score(image_info):
+    """
+    Pontos pela área real em pixels (1000x1000 = 50), com teto; 0 sem sondagem
+
+    Acima de ~2000x2000 a diferença não aparece para o usuário.
+    """
+    pixels = image_info.get('pixel_width', 0) * image_info.get('pixel_height', 0)
+    return min(pixels / 20000, IMAGE_PIXEL_SCORE_CAP)
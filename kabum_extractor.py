@@ -5,122 +5,145 @@ Baseado na estrutura HTML específica do site
 
 import requests
 from bs4 import BeautifulSoup
+from http_client import http_get
+from store_registry import IMAGE_EXCLUDE_RE
+from structured_data import extract_structured_product
+from structured_logging import get_logger
+from image_probe import apply_cached_probe, pixel_area_score, max_resolution_candidate
 from urllib.parse import urljoin
 import re
 import time
 import random
 
+log = get_logger('kabum')
+
+# Tipos de fonte em ordem de prioridade (menor índice = fonte mais confiável)
+KABUM_SOURCE_PRIORITY = {
+    'structured': -1,
+    'gallery': 0,
+    'kabum_pattern': 1,
+    'meta': 2,
+    'all_images': 3,
+    'css': 4,
+    'data_attr': 5,
+}
+
+_GALLERY_CLASS_RE = re.compile(r'gallery|main|principal|product', re.I)
+_KABUM_SRC_RE = re.compile(r'kabum\.com\.br|images\.kabum\.com\.br')
+_META_IMAGE_RE = re.compile(r'image', re.I)
+_CSS_BACKGROUND_RE = re.compile(r'background-image:\s*url\(["\']?([^"\')\s]+)["\']?\)')
+_DATA_IMAGE_ATTR_RE = re.compile(r'data-.*(?:image|img|foto)', re.I)
+
+
+def _img_src(img):
+    return img.get('src') or img.get('data-src') or img.get('data-lazy-src') or img.get('data-original')
+
+
+def _has_gallery_class(img):
+    classes = img.get('class') or []
+    if isinstance(classes, str):
+        classes = classes.split()
+    return any(_GALLERY_CLASS_RE.search(c) for c in classes)
+
+
+def _classify_kabum_node(node):
+    """
+    Classifica um elemento nas fontes de imagem do Kabum
+
+    Returns:
+        list: Pares (src, source_type) candidatos encontrados no elemento
+    """
+    candidates = []
+    name = node.name
+
+    if name == 'img':
+        src = _img_src(node)
+        if _has_gallery_class(node) and src and is_valid_kabum_image(src):
+            candidates.append((src, 'gallery'))
+        raw_src = node.get('src')
+        if isinstance(raw_src, str) and _KABUM_SRC_RE.search(raw_src) and is_valid_kabum_image(raw_src):
+            candidates.append((raw_src, 'kabum_pattern'))
+        if src and is_valid_kabum_image_flexible(src):
+            candidates.append((src, 'all_images'))
+    elif name == 'meta':
+        prop = node.get('property')
+        content = node.get('content')
+        if isinstance(prop, str) and _META_IMAGE_RE.search(prop) and content and is_valid_kabum_image(content):
+            candidates.append((content, 'meta'))
+    elif name == 'style':
+        if node.string:
+            for bg_img in _CSS_BACKGROUND_RE.findall(node.string):
+                if bg_img and is_valid_kabum_image_flexible(bg_img):
+                    candidates.append((bg_img, 'css'))
+
+    for attr_name, attr_value in node.attrs.items():
+        if isinstance(attr_value, str) and _DATA_IMAGE_ATTR_RE.match(attr_name) and is_valid_kabum_image_flexible(attr_value):
+            candidates.append((attr_value, 'data_attr'))
+
+    return candidates
+
+
+def collect_kabum_images(soup, base_url):
+    """
+    Percorre a árvore uma única vez, classificando cada elemento nas fontes
+    (galeria, padrão Kabum, meta, <img>, CSS, data-*) e mantendo, para cada URL,
+    apenas a fonte de maior prioridade
+
+    Args:
+        soup (BeautifulSoup): Página parseada
+        base_url (str): URL da página (para resolver URLs relativas)
+
+    Returns:
+        list: Informações das imagens, sem URLs repetidas
+    """
+    best = {}
+    source_counts = dict.fromkeys(KABUM_SOURCE_PRIORITY, 0)
+
+    for node in soup.find_all(True):
+        for src, source_type in _classify_kabum_node(node):
+            source_counts[source_type] += 1
+            try:
+                # Variantes _p/_m/_g viram a _gg (cdn_rules): uma entrada por foto
+                original = normalize_kabum_url(src, base_url)
+                src = max_resolution_candidate(original)
+            except Exception:
+                continue
+            current = best.get(src)
+            if current is None or KABUM_SOURCE_PRIORITY[source_type] < KABUM_SOURCE_PRIORITY[current['source_type']]:
+                best[src] = create_kabum_image_info(src, node, source_type)
+                if src != original:
+                    # A _gg é um palpite: a sondagem volta para a original se ela não existir
+                    best[src]['original_url'] = original
+
+    log.debug("Candidatas por fonte: %s", source_counts)
+    return list(best.values())
+
+
 def extract_kabum_images(url):
     """Extrai imagens do Kabum usando requests + BeautifulSoup"""
     try:
-        print(f"🎯 Extraindo imagens específicas do Kabum: {url}")
-        
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-            'Accept-Language': 'pt-BR,pt;q=0.9,en;q=0.8',
-            'Accept-Encoding': 'gzip, deflate, br',
-            'DNT': '1',
-            'Connection': 'keep-alive',
-            'Upgrade-Insecure-Requests': '1',
-            'Referer': 'https://www.kabum.com.br/',
-        }
+        log.info("Extraindo imagens específicas do Kabum", extra={'url': url})
         
-        response = requests.get(url, headers=headers, timeout=30)
+        response = http_get(url, profile='kabum', timeout=30)
         response.raise_for_status()
         
-        soup = BeautifulSoup(response.content, 'html.parser')
-        images_found = []
-        
-        # Estratégia 1: Imagens principais do produto (galeria)
-        print("🔍 Buscando imagens da galeria principal...")
-        gallery_images = soup.find_all('img', {'class': re.compile(r'gallery|main|principal|product', re.I)})
-        print(f"📸 Encontradas {len(gallery_images)} imagens da galeria")
-        
-        for img in gallery_images:
-            try:
-                src = img.get('src') or img.get('data-src') or img.get('data-lazy-src') or img.get('data-original')
-                if src and is_valid_kabum_image(src):
-                    src = normalize_kabum_url(src, url)
-                    image_info = create_kabum_image_info(src, img, 'gallery')
-                    images_found.append(image_info)
-            except Exception as e:
-                continue
-        
-        # Estratégia 2: Imagens com padrões específicos do Kabum
-        print("🔍 Buscando imagens com padrões do Kabum...")
-        kabum_images = soup.find_all('img', src=re.compile(r'kabum\.com\.br|images\.kabum\.com\.br'))
-        print(f"📸 Encontradas {len(kabum_images)} imagens do Kabum")
+        # Fast path: imagens em resolução cheia do JSON-LD/__NEXT_DATA__ (sem montar a árvore)
+        product = extract_structured_product(response.content, url)
+        if product and product['images']:
+            log.info(f"Dados estruturados ({', '.join(product['sources'])}): {len(product['images'])} imagens")
+            element = {'alt': product.get('title') or '', 'element_type': 'structured_data'}
+            images_found = [create_kabum_image_info(src, element, 'structured') for src in product['images']]
+            log.info(f"Total de imagens encontradas no Kabum: {len(images_found)}")
+            return images_found
         
-        for img in kabum_images:
-            try:
-                src = img.get('src')
-                if src and is_valid_kabum_image(src):
-                    src = normalize_kabum_url(src, url)
-                    image_info = create_kabum_image_info(src, img, 'kabum_pattern')
-                    images_found.append(image_info)
-            except Exception as e:
-                continue
-        
-        # Estratégia 3: Meta tags de imagem
-        print("🔍 Buscando meta tags de imagem...")
-        meta_images = soup.find_all('meta', property=re.compile(r'image', re.I))
-        print(f"📸 Encontradas {len(meta_images)} meta tags de imagem")
-        
-        for meta in meta_images:
-            try:
-                content = meta.get('content')
-                if content and is_valid_kabum_image(content):
-                    content = normalize_kabum_url(content, url)
-                    image_info = create_kabum_image_info(content, meta, 'meta')
-                    images_found.append(image_info)
-            except Exception as e:
-                continue
-        
-        # Estratégia 4: Todas as imagens <img> com filtro flexível
-        print("🔍 Buscando todas as imagens <img>...")
-        all_images = soup.find_all('img')
-        print(f"📸 Total de imagens encontradas: {len(all_images)}")
-        
-        for img in all_images:
-            try:
-                src = img.get('src') or img.get('data-src') or img.get('data-lazy-src') or img.get('data-original')
-                if src and is_valid_kabum_image_flexible(src):
-                    src = normalize_kabum_url(src, url)
-                    image_info = create_kabum_image_info(src, img, 'all_images')
-                    images_found.append(image_info)
-            except Exception as e:
-                continue
-        
-        # Estratégia 5: Imagens em CSS (background-image)
-        print("🔍 Buscando imagens em CSS...")
-        style_elements = soup.find_all('style')
-        for style in style_elements:
-            if style.string:
-                # Extrair URLs de background-image
-                background_images = re.findall(r'background-image:\s*url\(["\']?([^"\')\s]+)["\']?\)', style.string)
-                for bg_img in background_images:
-                    if bg_img and is_valid_kabum_image_flexible(bg_img):
-                        bg_img = normalize_kabum_url(bg_img, url)
-                        image_info = create_kabum_image_info(bg_img, style, 'css')
-                        images_found.append(image_info)
-        
-        # Estratégia 6: Imagens em atributos data-*
-        print("🔍 Buscando imagens em atributos data-*...")
-        data_images = soup.find_all(attrs=re.compile(r'data-.*image|data-.*img|data-.*foto'))
-        for element in data_images:
-            for attr_name, attr_value in element.attrs.items():
-                if 'image' in attr_name.lower() or 'img' in attr_name.lower() or 'foto' in attr_name.lower():
-                    if attr_value and is_valid_kabum_image_flexible(attr_value):
-                        attr_value = normalize_kabum_url(attr_value, url)
-                        image_info = create_kabum_image_info(attr_value, element, 'data_attr')
-                        images_found.append(image_info)
+        soup = BeautifulSoup(response.content, 'html.parser')
+        images_found = collect_kabum_images(soup, url)
         
-        print(f"✅ Total de imagens encontradas no Kabum: {len(images_found)}")
+        log.info(f"Total de imagens encontradas no Kabum: {len(images_found)}")
         return images_found
         
     except Exception as e:
-        print(f"❌ Erro ao extrair imagens do Kabum: {str(e)}")
+        log.error(f"Erro ao extrair imagens do Kabum: {e}", extra={'url': url})
         return []
 
 def is_valid_kabum_image(src):
@@ -167,24 +190,8 @@ def is_valid_kabum_image_flexible(src):
     if not src.startswith(('http://', 'https://')):
         return False
     
-    # Padrões de EXCLUSÃO
-    exclude_patterns = [
-        'logo', 'icon', 'sprite', 'banner', 'ad', 'social',
-        'favicon', 'avatar', 'profile', 'thumb', 'small',
-        'transparent-pixel', 'grey-pixel', 'loading', 'placeholder',
-        'no-image', 'blank', 'star', 'rating', 'review',
-        'coupon', 'discount', 'arrow', 'chevron', 'close',
-        'menu', 'hamburger', 'search', 'filter', 'sort',
-        'pagination', 'vlibras', 'accessibility', 'a11y', 'libras'
-    ]
-    
-    # Verificar exclusões
-    for pattern in exclude_patterns:
-        if pattern in src_lower:
-            return False
-    
-    # Verificar se é uma imagem muito pequena
-    if any(size in src_lower for size in ['16x16', '24x24', '32x32', '48x48', '64x64']):
+    # Exclusões e tamanhos de ícone (regex pré-compilada)
+    if IMAGE_EXCLUDE_RE.search(src_lower):
         return False
     
     # Aceitar qualquer imagem que não seja claramente um ícone
@@ -201,10 +208,19 @@ def normalize_kabum_url(src, base_url):
     return src
 
 def create_kabum_image_info(src, element, source_type):
-    """Cria informações da imagem do Kabum"""
+    """Cria informações da imagem do Kabum (com as dimensões do cache de sondagens, se houver)"""
     try:
         # Extrair atributos baseado no tipo de elemento
-        if hasattr(element, 'get'):
+        if isinstance(element, dict):
+            # Atributos já coletados (dados estruturados)
+            alt = element.get('alt') or ''
+            title = element.get('title') or ''
+            width = element.get('width') or ''
+            height = element.get('height') or ''
+            class_attr = element.get('class') or ''
+            id_attr = element.get('id') or ''
+            tag_name = element.get('element_type') or 'unknown'
+        elif hasattr(element, 'get'):
             # Elemento BeautifulSoup
             alt = element.get('alt', '')
             title = element.get('title', '')
@@ -223,7 +239,7 @@ def create_kabum_image_info(src, element, source_type):
             id_attr = element.get_attribute('id') or ''
             tag_name = element.tag_name
         
-        return {
+        return apply_cached_probe({
             'url': src,
             'alt': alt,
             'title': title,
@@ -235,9 +251,9 @@ def create_kabum_image_info(src, element, source_type):
             'source_type': source_type,
             'file_size_bytes': 0,
             'quality_score': 0
-        }
+        })
     except:
-        return {
+        return apply_cached_probe({
             'url': src,
             'alt': '',
             'title': '',
@@ -249,7 +265,7 @@ def create_kabum_image_info(src, element, source_type):
             'source_type': source_type,
             'file_size_bytes': 0,
             'quality_score': 0
-        }
+        })
 
 def calculate_kabum_quality_score(image_info):
     """Calcula score de qualidade para imagens do Kabum"""
@@ -258,7 +274,9 @@ def calculate_kabum_quality_score(image_info):
     
     # Pontuar por tipo de fonte
     source_type = image_info.get('source_type', '')
-    if source_type == 'gallery':
+    if source_type == 'structured':
+        score += 55
+    elif source_type == 'gallery':
         score += 50
     elif source_type == 'kabum_pattern':
         score += 40
@@ -291,8 +309,11 @@ def calculate_kabum_quality_score(image_info):
     if len(image_info['alt']) > 20:
         score += 15
     
-    # Pontuar por dimensões HTML
-    if image_info['width'] and image_info['height']:
+    # Pontuar por dimensões reais (cache de sondagens) ou, sem elas, pelas do HTML
+    pixel_score = pixel_area_score(image_info)
+    if pixel_score:
+        score += pixel_score
+    elif image_info['width'] and image_info['height']:
         try:
             width = int(image_info['width'])
             height = int(image_info['height'])
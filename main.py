@@ -1,11 +1,43 @@
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel, HttpUrl
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse, PlainTextResponse
+import asyncio
+import json
+import re
+from pydantic import BaseModel, HttpUrl, Field
 from typing import List, Optional, Dict, Any
 import uvicorn
 import requests
-from image_extractor import extract_product_images
+from image_extractor import extract_product_images, detect_store_from_url, IMAGES_DEFAULT_LIMIT, IMAGES_MAX_LIMIT
 from seo_extractor import extract_seo_meta_tags
-from product_extractor import extract_product, ExtractedProduct
+from product_extractor import extract_product, ExtractedProduct, detect_platform, is_shortened_url
+from driver_pool import get_driver_pool
+from executors import light_executor, chrome_executor, ExecutorSaturated
+from cache import result_cache, canonical_url
+from image_probe import probe_cache
+from singleflight import SingleFlight
+from batch_scheduler import BatchScheduler, interleave_by_group, BATCH_MAX_URLS
+from strategy_router import strategy_router
+from store_registry import lookup_store
+from structured_logging import (
+    get_logger, set_request_id, reset_request_id, new_request_id, current_request_id,
+    dropped_records, REQUEST_ID_HEADER,
+)
+import metrics
+import mercadolivre_api
+import resource_blocking
+import threading
+import time
+
+log = get_logger('api')
+
+# IDs de correlação aceitos do cliente (o resto é substituído por um novo)
+_REQUEST_ID_RE = re.compile(r'[\w.:-]{1,64}')
+
+# Extrações idênticas em andamento (mesmo endpoint + URL canônica) rodam uma vez só
+extraction_flights = SingleFlight()
+
+# Limites de concorrência dos lotes (por host e por executor)
+batch_scheduler = BatchScheduler()
 
 app = FastAPI(
     title="Extractor de Imagens de Produto",
@@ -13,9 +45,32 @@ app = FastAPI(
     version="1.0.0"
 )
 
+
+@app.middleware("http")
+async def correlation_id(request: Request, call_next):
+    """Associa um ID de correlação (X-Request-ID do cliente ou novo) aos logs da requisição"""
+    request_id = request.headers.get(REQUEST_ID_HEADER, '')
+    if not _REQUEST_ID_RE.fullmatch(request_id):
+        request_id = new_request_id()
+    token = set_request_id(request_id)
+    start = time.perf_counter()
+    try:
+        response = await call_next(request)
+        log.info(f"{request.method} {request.url.path} -> {response.status_code}", extra={
+            'method': request.method, 'path': request.url.path, 'status_code': response.status_code,
+            'duration_ms': round((time.perf_counter() - start) * 1000, 1),
+        })
+    finally:
+        reset_request_id(token)
+    response.headers[REQUEST_ID_HEADER] = request_id
+    return response
+
+
 class ExtractRequest(BaseModel):
     url: HttpUrl
     store_name: Optional[str] = None
+    # Quantidade de imagens na resposta (as melhores por qualidade)
+    limit: int = Field(IMAGES_DEFAULT_LIMIT, ge=1, le=IMAGES_MAX_LIMIT)
 
 class SearchImagesRequest(BaseModel):
     query: str
@@ -34,8 +89,14 @@ class ExtractResponse(BaseModel):
     store_name: str
     url: str
     total_images_found: int
+    # Nome mantido por compatibilidade: traz as `limit` melhores (15 por padrão)
     top_15_images: List[ImageInfo]
     extraction_method: str
+    page_ready_wait_s: Optional[float] = None
+    # Relatório de rede do Chrome (requisições bloqueadas, bytes, tempo de carga)
+    network: Optional[Dict[str, Any]] = None
+    # Segundos de cada estratégia que terminou na corrida com hedge
+    strategy_timings: Optional[Dict[str, float]] = None
 
 class SearchImagesResponse(BaseModel):
     images: List[str]
@@ -58,6 +119,10 @@ class ProductExtractRequest(BaseModel):
     url: HttpUrl
 
 
+class BatchExtractRequest(BaseModel):
+    urls: List[HttpUrl] = Field(..., min_length=1, max_length=BATCH_MAX_URLS)
+
+
 class ProductExtractResponse(BaseModel):
     url: str
     platform: str
@@ -74,6 +139,279 @@ class ProductExtractResponse(BaseModel):
     extraction_method: str = "selenium"
     status: str = "success"
     error: Optional[str] = None
+    page_ready_wait_s: Optional[float] = None
+    # Relatório de rede do Chrome (requisições bloqueadas, bytes, tempo de carga)
+    network: Optional[Dict[str, Any]] = None
+    # Segundos de cada estratégia que terminou na corrida com hedge
+    strategy_timings: Optional[Dict[str, float]] = None
+
+@app.on_event("startup")
+async def warm_chrome_pool():
+    """Pré-aquece o pool de Chrome em segundo plano (sem atrasar o boot no Heroku)"""
+    threading.Thread(target=get_driver_pool().warm, daemon=True).start()
+
+
+@app.on_event("shutdown")
+async def close_chrome_pool():
+    """Fecha os Chrome ociosos do pool e os executores de extração"""
+    get_driver_pool().shutdown()
+    light_executor.shutdown()
+    chrome_executor.shutdown()
+
+
+def executor_for_images(url: str, store_name: Optional[str]):
+    """Mercado Livre e Kabum extraem imagens só com requests; as demais lojas podem abrir o Chrome"""
+    store = store_name or detect_store_from_url(url)
+    return light_executor if store in ('Mercado Livre', 'Kabum') else chrome_executor
+
+
+def executor_for_product(url: str):
+    """
+    Só a Amazon pode abrir o Chrome na extração de produto (captcha, erro HTTP
+    ou hedge): ela fica no pool de Chrome, cuja fila e timeout cobrem a espera
+    por um driver; as demais lojas rodam no pool leve
+    """
+    return chrome_executor if detect_platform(url) == 'amazon' else light_executor
+
+
+async def run_extraction(executor, fn, *args):
+    """Roda um extrator bloqueante no executor, traduzindo saturação e timeout em HTTP"""
+    try:
+        return await executor.run(fn, *args)
+    except ExecutorSaturated as e:
+        log.warning(str(e))
+        raise HTTPException(
+            status_code=503,
+            detail="Servidor ocupado, tente novamente em instantes",
+            headers={"Retry-After": "5"}
+        )
+    except asyncio.TimeoutError:
+        raise HTTPException(
+            status_code=504,
+            detail=f"Tempo limite de extração excedido ({executor.timeout:.0f}s)"
+        )
+
+
+class ExtractionFailed(Exception):
+    """Falha da extração que vira resposta HTTP e entra no cache negativo"""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+def images_job(url: str, store_name: Optional[str], limit: int = IMAGES_DEFAULT_LIMIT) -> Dict[str, Any]:
+    """Extrai as limit melhores imagens e valida o resultado (roda no executor)"""
+    try:
+        result = extract_product_images(url, store_name, limit)
+    except Exception as e:
+        raise ExtractionFailed(500, f"Erro ao extrair imagens: {str(e)}")
+    if not result or not result.get('images'):
+        raise ExtractionFailed(404, "Nenhuma imagem de produto encontrada")
+    return result
+
+
+def seo_job(url: str) -> Dict[str, Any]:
+    """Extrai meta tags SEO e valida o resultado (roda no executor)"""
+    try:
+        result = extract_seo_meta_tags(url)
+    except Exception as e:
+        raise ExtractionFailed(500, f"Erro ao extrair meta tags: {str(e)}")
+    if not result or result['status'] != 'success':
+        error = result.get('error', 'Erro desconhecido') if result else 'Erro desconhecido'
+        raise ExtractionFailed(500, f"Erro ao extrair meta tags: {error}")
+    return result
+
+
+def product_job(url: str) -> Dict[str, Any]:
+    """Extrai o produto e valida o resultado (roda no executor)"""
+    try:
+        result = extract_product(url)
+    except Exception as e:
+        log.exception(f"Erro ao extrair produto: {e}", extra={'url': url})
+        raise ExtractionFailed(500, f"Erro ao extrair produto: {str(e)}")
+    if result.status == "error":
+        raise ExtractionFailed(500, f"Erro na extração: {result.error}")
+    payload = result.to_dict()
+    payload.pop('raw_html', None)
+    return payload
+
+
+async def cache_key_for(endpoint: str, url: str, extra: Optional[str] = None) -> str:
+    """Chave de cache pela URL canônica (encurtadores são resolvidos fora do event loop)"""
+    if is_shortened_url(url):
+        canonical = await run_extraction(light_executor, canonical_url, url)
+    else:
+        canonical = canonical_url(url)
+    return result_cache.make_key(endpoint, canonical, extra)
+
+
+async def extract_and_cache(key: str, endpoint: str, executor, job, *args):
+    """Roda o extrator e grava o resultado (ou a falha) no cache; retorna (valor, ttl)"""
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        value = await run_extraction(executor, job, *args)
+        outcome = "success"
+    except ExtractionFailed as e:
+        outcome = str(e.status_code)
+        ttl = result_cache.set_failure(key, e.status_code, e.detail)
+        raise HTTPException(
+            status_code=e.status_code,
+            detail=e.detail,
+            headers={"X-Cache": "MISS", "Cache-Control": f"max-age={ttl}"}
+        )
+    except HTTPException as e:
+        outcome = str(e.status_code)
+        raise
+    finally:
+        # O primeiro argumento dos jobs é sempre a URL
+        metrics.EXTRACTION_SECONDS.observe(time.perf_counter() - start, endpoint=endpoint,
+                                           store=lookup_store(args[0]).key, outcome=outcome)
+    ttl = result_cache.set_success(key, endpoint, value)
+    return value, ttl
+
+
+async def cached_extraction(endpoint: str, url: str, response: Response, executor, job, *args,
+                            key_extra: Optional[str] = None):
+    """
+    Executa job no executor passando pelo cache de resultados
+
+    Sucessos e falhas (ExtractionFailed) são cacheados com TTLs distintos;
+    saturação (503) e timeout (504) não entram no cache. Requisições idênticas
+    simultâneas são coalescidas: o extrator roda uma vez e todas recebem o resultado.
+    """
+    key = await cache_key_for(endpoint, url, key_extra)
+
+    entry = result_cache.get(key)
+    if entry is not None:
+        if entry['ok']:
+            response.headers.update({"X-Cache": "HIT", "Cache-Control": f"public, max-age={entry['max_age']}"})
+            return entry['value']
+        raise HTTPException(
+            status_code=entry['status_code'],
+            detail=entry['detail'],
+            headers={"X-Cache": "HIT", "Cache-Control": f"max-age={entry['max_age']}"}
+        )
+
+    (value, ttl), coalesced = await extraction_flights.do(
+        key, lambda: extract_and_cache(key, endpoint, executor, job, *args)
+    )
+    response.headers.update({
+        "X-Cache": "MISS",
+        "X-Coalesced": "1" if coalesced else "0",
+        "Cache-Control": f"public, max-age={ttl}"
+    })
+    return value
+
+
+def build_images_response(result: Dict[str, Any], url: str) -> ExtractResponse:
+    """Monta a resposta de /extract-images a partir do resultado do extrator"""
+    # O extrator já devolve só as limit melhores, ordenadas por qualidade
+    images_response = []
+    for img in result['images']:
+        size_mb = img.get('file_size_bytes', 0) / 1024 / 1024
+        images_response.append(ImageInfo(
+            url=img['url'],
+            alt=img.get('alt', ''),
+            title=img.get('title', ''),
+            # Dimensões reais da sondagem quando o HTML não as declara
+            width=str(img.get('width') or img.get('pixel_width') or ''),
+            height=str(img.get('height') or img.get('pixel_height') or ''),
+            quality_score=img.get('quality_score', 0),
+            file_size_mb=round(size_mb, 2)
+        ))
+    
+    return ExtractResponse(
+        store_name=result['store_name'],
+        url=url,
+        total_images_found=result.get('total_images_found', len(result['images'])),
+        top_15_images=images_response,
+        extraction_method=result['extraction_method'],
+        page_ready_wait_s=result.get('page_ready_wait_s'),
+        network=result.get('network'),
+        strategy_timings=result.get('strategy_timings')
+    )
+
+
+def build_seo_response(result: Dict[str, Any]) -> SEOExtractResponse:
+    """Monta a resposta de /extract-seo a partir do resultado do extrator"""
+    return SEOExtractResponse(
+        url=result['url'],
+        title=result['title'],
+        description=result['description'],
+        image=result['image'],
+        source=result['source'],
+        status=result['status']
+    )
+
+
+def build_product_response(result: Dict[str, Any], url: str) -> ProductExtractResponse:
+    """Monta a resposta de /extract-product (a URL da requisição prevalece, já que o cache é por URL canônica)"""
+    return ProductExtractResponse(**{**result, 'url': url})
+
+
+async def prefetch_mercadolivre(urls: List[str]):
+    """Pré-carrega pelo multi-get da API os itens do Mercado Livre de um lote de produtos"""
+    ml_urls = [url for url in urls if detect_platform(url) == 'mercadolivre']
+    if len(ml_urls) < 2:
+        return
+    try:
+        await run_extraction(light_executor, mercadolivre_api.prefetch_items_for_urls, ml_urls)
+    except HTTPException as e:
+        # Sem o pré-carregamento, cada item ainda é buscado individualmente
+        log.warning(f"Pré-carregamento do Mercado Livre ignorado: {e.detail}")
+
+
+async def stream_batch(endpoint: str, urls: List[str], plan, prefetch=None):
+    """
+    Executa um lote e devolve os resultados em NDJSON conforme cada item termina
+
+    Args:
+        endpoint (str): 'images', 'seo' ou 'product'
+        urls (list): URLs do lote
+        plan: Função url -> (plataforma, executor, job, args, builder)
+        prefetch: Corrotina opcional (urls) executada antes dos itens
+    """
+    async def run_item(index: int, url: str):
+        # Cada item do lote ganha seu próprio ID (ID do lote + índice) nos logs
+        set_request_id(f"{batch_id}.{index}")
+        platform, executor, job, args, builder = plan(url)
+        response = Response()
+        line = {"index": index, "url": url, "platform": platform}
+        try:
+            result = await batch_scheduler.run(
+                url, executor,
+                lambda: cached_extraction(endpoint, url, response, executor, job, *args)
+            )
+            line.update({
+                "status_code": 200,
+                "cache": response.headers.get("X-Cache"),
+                "result": builder(result, url).model_dump()
+            })
+        except HTTPException as e:
+            line.update({"status_code": e.status_code, "cache": (e.headers or {}).get("X-Cache"), "error": e.detail})
+        except Exception as e:
+            line.update({"status_code": 500, "error": str(e)})
+        return line
+
+    batch_id = current_request_id()
+    if prefetch is not None:
+        await prefetch(urls)
+
+    indexed = list(enumerate(urls))
+    ordered = interleave_by_group(indexed, lambda item: detect_platform(item[1]))
+    tasks = [asyncio.ensure_future(run_item(index, url)) for index, url in ordered]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            line = await next_done
+            yield json.dumps(line, ensure_ascii=False) + "\n"
+    finally:
+        # Cliente desconectou: cancelar o que ainda não começou
+        for task in tasks:
+            task.cancel()
+
 
 @app.get("/")
 async def root():
@@ -87,48 +425,32 @@ async def root():
     }
 
 @app.post("/extract-images", response_model=ExtractResponse)
-async def extract_images(request: ExtractRequest):
+async def extract_images(request: ExtractRequest, response: Response):
     """
-    Extrai as 15 melhores imagens de produto de uma URL de e-commerce.
+    Extrai as melhores imagens de produto de uma URL de e-commerce.
     
     - **url**: URL do produto (Amazon, Mercado Livre, etc.)
     - **store_name**: Nome da loja (opcional, será detectado automaticamente)
+    - **limit**: Quantidade de imagens (padrão IMAGES_DEFAULT_LIMIT, máximo IMAGES_MAX_LIMIT)
     """
     try:
-        # Extrair imagens
-        result = extract_product_images(str(request.url), request.store_name)
-        
-        if not result or not result.get('images'):
-            raise HTTPException(
-                status_code=404, 
-                detail="Nenhuma imagem de produto encontrada"
-            )
-        
-        # Pegar apenas as 15 primeiras (já ordenadas por qualidade)
-        top_15 = result['images'][:15]
-        
-        # Converter para o formato de resposta
-        images_response = []
-        for img in top_15:
-            size_mb = img.get('file_size_bytes', 0) / 1024 / 1024
-            images_response.append(ImageInfo(
-                url=img['url'],
-                alt=img.get('alt', ''),
-                title=img.get('title', ''),
-                width=img.get('width', ''),
-                height=img.get('height', ''),
-                quality_score=img.get('quality_score', 0),
-                file_size_mb=round(size_mb, 2)
-            ))
-        
-        return ExtractResponse(
-            store_name=result['store_name'],
-            url=str(request.url),
-            total_images_found=len(result['images']),
-            top_15_images=images_response,
-            extraction_method=result['extraction_method']
+        # Extrair imagens (fora do event loop, com cache)
+        url = str(request.url)
+        # O limite muda o resultado (só as limit melhores são sondadas): entra na chave de cache
+        key_extra = '|'.join(filter(None, [
+            request.store_name,
+            f"limit={request.limit}" if request.limit != IMAGES_DEFAULT_LIMIT else None,
+        ])) or None
+        result = await cached_extraction(
+            'images', url, response,
+            executor_for_images(url, request.store_name),
+            images_job, url, request.store_name, request.limit,
+            key_extra=key_extra
         )
+        return build_images_response(result, url)
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -136,7 +458,7 @@ async def extract_images(request: ExtractRequest):
         )
 
 @app.post("/extract-seo", response_model=SEOExtractResponse)
-async def extract_seo_meta_tags_endpoint(request: SEOExtractRequest):
+async def extract_seo_meta_tags_endpoint(request: SEOExtractRequest, response: Response):
     """
     MÉTODO DE TESTE: Extrai meta tags SEO como WhatsApp faz
     Focado em sites chineses e outros que não funcionam com métodos tradicionais
@@ -144,23 +466,12 @@ async def extract_seo_meta_tags_endpoint(request: SEOExtractRequest):
     - **url**: URL da página para extrair meta tags
     """
     try:
-        result = extract_seo_meta_tags(str(request.url))
-        
-        if result['status'] != 'success':
-            raise HTTPException(
-                status_code=500,
-                detail=f"Erro ao extrair meta tags: {result.get('error', 'Erro desconhecido')}"
-            )
-        
-        return SEOExtractResponse(
-            url=result['url'],
-            title=result['title'],
-            description=result['description'],
-            image=result['image'],
-            source=result['source'],
-            status=result['status']
-        )
+        url = str(request.url)
+        result = await cached_extraction('seo', url, response, light_executor, seo_job, url)
+        return build_seo_response(result)
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -168,7 +479,7 @@ async def extract_seo_meta_tags_endpoint(request: SEOExtractRequest):
         )
 
 @app.post("/extract-product", response_model=ProductExtractResponse)
-async def extract_product_endpoint(request: ProductExtractRequest):
+async def extract_product_endpoint(request: ProductExtractRequest, response: Response):
     """
     Extrai dados COMPLETOS de um produto de e-commerce
     
@@ -178,51 +489,163 @@ async def extract_product_endpoint(request: ProductExtractRequest):
     Usa Selenium para scraping robusto quando necessário.
     """
     try:
-        print(f"\n📦 [API] Recebida requisição de extração de produto")
-        print(f"   URL: {request.url}")
-        
-        # Chamar extrator principal
-        result = extract_product(str(request.url))
-        
-        if result.status == "error":
-            raise HTTPException(
-                status_code=500,
-                detail=f"Erro na extração: {result.error}"
-            )
+        log.info("Recebida requisição de extração de produto", extra={'url': str(request.url)})
+
+        # Chamar extrator principal (fora do event loop, com cache)
+        url = str(request.url)
+        result = await cached_extraction('product', url, response, executor_for_product(url), product_job, url)
         
-        return ProductExtractResponse(
-            url=result.url,
-            platform=result.platform,
-            title=result.title,
-            price=result.price,
-            original_price=result.original_price,
-            currency=result.currency,
-            description=result.description,
-            images=result.images or [],
-            seller=result.seller,
-            rating=result.rating,
-            review_count=result.review_count,
-            specifications=result.specifications or {},
-            extraction_method=result.extraction_method,
-            status=result.status,
-            error=result.error
-        )
+        return build_product_response(result, url)
         
     except HTTPException:
         raise
     except Exception as e:
-        print(f"❌ [API] Erro ao extrair produto: {str(e)}")
+        log.exception(f"Erro ao extrair produto: {e}", extra={'url': str(request.url)})
         raise HTTPException(
             status_code=500,
             detail=f"Erro ao extrair produto: {str(e)}"
         )
 
 
+@app.post("/extract-images/batch")
+async def extract_images_batch(request: BatchExtractRequest):
+    """
+    Extrai imagens de várias URLs em paralelo (loja detectada por URL)
+    
+    - **urls**: Lista de URLs de produto (máximo BATCH_MAX_URLS)
+    
+    Resposta em NDJSON: uma linha por URL, na ordem em que cada uma termina.
+    """
+    def plan(url):
+        return (
+            detect_platform(url), executor_for_images(url, None),
+            images_job, (url, None), build_images_response
+        )
+    urls = [str(u) for u in request.urls]
+    return StreamingResponse(stream_batch('images', urls, plan), media_type="application/x-ndjson")
+
+@app.post("/extract-seo/batch")
+async def extract_seo_batch(request: BatchExtractRequest):
+    """
+    Extrai meta tags SEO de várias URLs em paralelo
+    
+    - **urls**: Lista de URLs (máximo BATCH_MAX_URLS)
+    
+    Resposta em NDJSON: uma linha por URL, na ordem em que cada uma termina.
+    """
+    def plan(url):
+        return (
+            detect_platform(url), light_executor,
+            seo_job, (url,), lambda result, _url: build_seo_response(result)
+        )
+    urls = [str(u) for u in request.urls]
+    return StreamingResponse(stream_batch('seo', urls, plan), media_type="application/x-ndjson")
+
+@app.post("/extract-product/batch")
+async def extract_product_batch(request: BatchExtractRequest):
+    """
+    Extrai dados de vários produtos em paralelo
+    
+    - **urls**: Lista de URLs de produto (máximo BATCH_MAX_URLS)
+    
+    Resposta em NDJSON: uma linha por URL, na ordem em que cada uma termina.
+    Lojas que usam Chrome (Amazon) não bloqueiam as que usam só requests.
+    Itens do Mercado Livre são pré-carregados em blocos pelo multi-get da API.
+    """
+    def plan(url):
+        return (
+            detect_platform(url), executor_for_product(url),
+            product_job, (url,), build_product_response
+        )
+    urls = [str(u) for u in request.urls]
+    return StreamingResponse(
+        stream_batch('product', urls, plan, prefetch=prefetch_mercadolivre),
+        media_type="application/x-ndjson"
+    )
+
+
 @app.get("/health")
 async def health_check():
     """Endpoint de health check para Heroku"""
     return {"status": "healthy", "service": "image-extractor", "version": "2.0"}
 
+def runtime_metrics():
+    """Estatísticas já mantidas por caches, pool de Chrome, executores e bloqueio de recursos"""
+    cache = result_cache.stats()
+    probes = probe_cache.stats()
+    caches = {
+        # Acertos do SQLite aparecem como falta na memória
+        "results": (cache["hits"] + cache["disk_hits"], cache["misses"] - cache["disk_hits"]),
+        "image_probes": (probes["hits"] + probes["disk_hits"], probes["misses"] - probes["disk_hits"]),
+        **{f"ml_{name}": (stats["hits"], stats["misses"]) for name, stats in mercadolivre_api.stats().items()},
+    }
+    pool = get_driver_pool().stats()
+    executors = {"light": light_executor.stats(), "chrome": chrome_executor.stats()}
+    blocking = resource_blocking.stats()
+    flights = extraction_flights.stats()
+    return [
+        ("cache_lookups_total", "counter", "Consultas aos caches por resultado",
+         [({"cache": name, "result": result}, count)
+          for name, (hits, misses) in caches.items() for result, count in (("hit", hits), ("miss", misses))]),
+        ("chrome_pool_events_total", "counter", "Eventos do pool de Chrome",
+         [({"event": event}, pool[event]) for event in
+          ("created", "create_failures", "retired", "recycled_max_uses", "recycled_broken", "checkouts", "checkout_timeouts")]),
+        ("chrome_pool_drivers", "gauge", "Drivers do pool por estado",
+         [({"state": state}, pool[state]) for state in ("idle", "busy")]),
+        ("executor_tasks_total", "counter", "Tarefas dos executores de extração por resultado",
+         [({"executor": name, "result": result}, stats[result])
+          for name, stats in executors.items() for result in ("submitted", "rejected", "timeouts", "completed", "failed")]),
+        ("executor_pending", "gauge", "Tarefas pendentes por executor",
+         [({"executor": name}, stats["pending"]) for name, stats in executors.items()]),
+        ("chrome_blocked_requests_total", "counter", "Requisições bloqueadas no Chrome",
+         [({}, blocking["blocked_requests"])]),
+        ("chrome_bytes_transferred_total", "counter", "Bytes transferidos pelo Chrome (encodedDataLength)",
+         [({}, blocking["bytes_transferred"])]),
+        ("singleflight_requests_total", "counter", "Requisições idênticas executadas (leader) ou coalescidas",
+         [({"role": role}, flights[role]) for role in ("leaders", "coalesced")]),
+        ("log_records_dropped_total", "counter", "Linhas de log descartadas com a fila do logging cheia",
+         [({}, dropped_records())]),
+    ]
+
+
+metrics.registry.register_collector(runtime_metrics)
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """Métricas no formato de exposição do Prometheus (etapas, HTTP de saída, caches, pool)"""
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/debug/chrome-pool")
+async def chrome_pool_stats():
+    """Estatísticas do pool de drivers Chrome"""
+    return get_driver_pool().stats()
+
+@app.get("/debug/resource-blocking")
+async def resource_blocking_stats():
+    """Totais do bloqueio de recursos no Chrome (requisições bloqueadas, bytes, tempo de carga)"""
+    return resource_blocking.stats()
+
+@app.get("/debug/cache")
+async def cache_stats():
+    """Estatísticas do cache de resultados, das sondagens de imagem e dos caches da API do Mercado Livre"""
+    return {**result_cache.stats(), "image_probes": probe_cache.stats(), "mercadolivre_api": mercadolivre_api.stats()}
+
+@app.get("/debug/singleflight")
+async def singleflight_stats():
+    """Métricas de coalescência de requisições idênticas em andamento"""
+    return extraction_flights.stats()
+
+@app.get("/debug/strategies")
+async def strategy_router_table():
+    """Tabela aprendida por host e estratégia (sucesso, completude, latência) do roteamento adaptativo"""
+    return strategy_router.table()
+
+@app.get("/debug/executors")
+async def executors_stats():
+    """Estatísticas dos executores de extração (leve e Chrome)"""
+    return {"light": light_executor.stats(), "chrome": chrome_executor.stats()}
+
 if __name__ == "__main__":
     uvicorn.run(
         "main:app",
@@ -0,0 +1,165 @@
+"""
+Cliente da API pública do Mercado Livre
+- Item, descrição e vendedor buscados em paralelo (o vendedor assim que o item chega)
+- Cache com TTL para apelidos de vendedores e descrições (vários produtos do mesmo
+  vendedor não refazem a chamada via proxy)
+- Multi-get (/items?ids=A,B,C) para pré-carregar vários itens de um lote por chamada
+"""
+
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from cache import TTLCache
+from http_client import http_get
+from store_registry import proxies_for
+from structured_logging import get_logger
+
+log = get_logger('ml_api')
+
+MERCADOLIVRE_API_URL = os.getenv('MERCADOLIVRE_API_URL', 'https://api.mercadolibre.com').rstrip('/')
+ML_API_WORKERS = int(os.getenv('ML_API_WORKERS', '8'))
+# Aquecimento de descrições/vendedores do multi-get (pool separado para não
+# ocupar os workers que as extrações esperam em fetch_item_bundle)
+ML_API_WARMUP_WORKERS = int(os.getenv('ML_API_WARMUP_WORKERS', '2'))
+# Limite de ids por chamada do multi-get da API
+ML_MULTIGET_MAX = int(os.getenv('ML_MULTIGET_MAX', '20'))
+ML_SELLER_CACHE_TTL = int(os.getenv('ML_SELLER_CACHE_TTL', '86400'))
+ML_DESCRIPTION_CACHE_TTL = int(os.getenv('ML_DESCRIPTION_CACHE_TTL', '3600'))
+# Itens pré-carregados pelo multi-get ficam pouco tempo (só o suficiente para o lote)
+ML_ITEM_CACHE_TTL = int(os.getenv('ML_ITEM_CACHE_TTL', '120'))
+
+_ITEM_ID_RE = re.compile(r'(ML[A-Z]{1,2})-?(\d+)')
+
+seller_cache = TTLCache(max_entries=2048)
+description_cache = TTLCache(max_entries=1024)
+item_cache = TTLCache(max_entries=512)
+
+_api_executor = ThreadPoolExecutor(max_workers=ML_API_WORKERS, thread_name_prefix='ml-api')
+_warmup_executor = ThreadPoolExecutor(max_workers=max(1, ML_API_WARMUP_WORKERS), thread_name_prefix='ml-api-warmup')
+
+
+def extract_item_id(url):
+    """Extrai o ID do item (ex.: MLB123456) da URL; None se não houver"""
+    match = _ITEM_ID_RE.search((url or '').upper())
+    return f"{match.group(1)}{match.group(2)}" if match else None
+
+
+def _api_get(path, proxies, timeout):
+    response = http_get(f"{MERCADOLIVRE_API_URL}{path}", proxies=proxies, timeout=timeout)
+    response.raise_for_status()
+    return response.json()
+
+
+def fetch_item(item_id, proxies=None):
+    """Dados do item (usa o que o multi-get pré-carregou, se houver)"""
+    cached = item_cache.get(item_id)
+    if cached is not None:
+        return cached[0]
+    return _api_get(f"/items/{item_id}", proxies, timeout=15)
+
+
+def fetch_description(item_id, proxies=None):
+    """Descrição em texto do item (cacheada; '' se indisponível)"""
+    cached = description_cache.get(item_id)
+    if cached is not None:
+        return cached[0]
+    try:
+        data = _api_get(f"/items/{item_id}/description", proxies, timeout=10)
+        description = data.get('plain_text', '') or data.get('text', '')
+    except Exception:
+        return ''
+    description_cache.set(item_id, description, ML_DESCRIPTION_CACHE_TTL)
+    return description
+
+
+def fetch_seller_nickname(seller_id, proxies=None):
+    """Apelido do vendedor (cacheado; None se indisponível)"""
+    cached = seller_cache.get(seller_id)
+    if cached is not None:
+        return cached[0]
+    try:
+        nickname = _api_get(f"/users/{seller_id}", proxies, timeout=10).get('nickname')
+    except Exception:
+        return None
+    if nickname:
+        seller_cache.set(seller_id, nickname, ML_SELLER_CACHE_TTL)
+    return nickname
+
+
+def fetch_item_bundle(item_id, proxies=None):
+    """
+    Busca item, descrição e vendedor com o mínimo de espera sequencial
+
+    Item e descrição saem juntos; o vendedor é pedido assim que o item chega
+    (a descrição pode ainda estar em andamento).
+
+    Returns:
+        tuple: (item, descrição, apelido do vendedor ou None)
+    """
+    description_future = _api_executor.submit(fetch_description, item_id, proxies)
+    try:
+        item = fetch_item(item_id, proxies)
+    except Exception:
+        description_future.cancel()
+        raise
+    seller = None
+    if item.get('seller_id'):
+        seller = fetch_seller_nickname(item['seller_id'], proxies)
+    return item, description_future.result(), seller
+
+
+def prefetch_items(item_ids, proxies=None):
+    """
+    Pré-carrega vários itens pelo multi-get (/items?ids=...), em paralelo por bloco
+
+    Os itens ficam em item_cache para as extrações individuais do lote; as
+    descrições e os vendedores dos itens também são disparados em segundo plano,
+    num pool próprio e pequeno.
+
+    Returns:
+        int: Quantidade de itens carregados
+    """
+    pending = [item_id for item_id in dict.fromkeys(item_ids) if item_cache.get(item_id) is None]
+    if not pending:
+        return 0
+    chunks = [pending[i:i + ML_MULTIGET_MAX] for i in range(0, len(pending), ML_MULTIGET_MAX)]
+    log.info(f"Multi-get de {len(pending)} itens em {len(chunks)} chamada(s)")
+
+    def fetch_chunk(chunk):
+        return _api_get(f"/items?ids={','.join(chunk)}", proxies, timeout=20)
+
+    loaded = 0
+    for future in [_api_executor.submit(fetch_chunk, chunk) for chunk in chunks]:
+        try:
+            entries = future.result()
+        except Exception as e:
+            log.warning(f"Multi-get falhou: {e}")
+            continue
+        for entry in entries or []:
+            body = entry.get('body') or {}
+            if entry.get('code') == 200 and body.get('id'):
+                item_cache.set(body['id'], body, ML_ITEM_CACHE_TTL)
+                loaded += 1
+                _warmup_executor.submit(fetch_description, body['id'], proxies)
+                if body.get('seller_id'):
+                    _warmup_executor.submit(fetch_seller_nickname, body['seller_id'], proxies)
+    return loaded
+
+
+def prefetch_items_for_urls(urls):
+    """Pré-carrega os itens do Mercado Livre de uma lista de URLs (precisa de 2+ itens)"""
+    item_ids = [extract_item_id(url) for url in urls]
+    item_ids = [item_id for item_id in dict.fromkeys(item_ids) if item_id]
+    if len(item_ids) < 2:
+        return 0
+    return prefetch_items(item_ids, proxies_for(MERCADOLIVRE_API_URL, 'Mercado Livre'))
+
+
+def stats():
+    """Estatísticas dos caches da API"""
+    return {
+        'sellers': seller_cache.stats(),
+        'descriptions': description_cache.stats(),
+        'items': item_cache.stats(),
+    }
@@ -0,0 +1,239 @@
+"""
+Métricas da extração no formato texto do Prometheus (sem serviço externo)
+- Histogramas de duração por etapa (resolução de URL, fetch, parse, coleta de
+  candidatas, sondagem, score, dedup, criação/descarte do Chrome...), com
+  rótulos de loja, estratégia e resultado
+- Contadores de bytes recebidos (via proxy ou direto)
+- Coletores lidos na hora da raspagem, para estatísticas que já existem em
+  outros módulos (acertos dos caches, pool de Chrome, executores)
+"""
+
+import os
+import time
+import threading
+from contextlib import contextmanager
+
+from structured_logging import get_logger
+
+log = get_logger('metrics')
+
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', '1') == '1'
+
+# Limites dos buckets dos histogramas de duração (segundos)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labelnames, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    """Contador monotônico com rótulos"""
+
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        with self._lock:
+            return self._values.get(key, 0)
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [(self.name, _format_labels(self.labelnames, key), value) for key, value in items]
+
+
+class Histogram:
+    """Histograma cumulativo com rótulos (buckets, _sum e _count)"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series['counts'][index] += 1
+                    break
+            series['sum'] += value
+            series['count'] += 1
+
+    def samples(self):
+        with self._lock:
+            items = sorted((key, dict(series, counts=list(series['counts']))) for key, series in self._series.items())
+        samples = []
+        for key, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, series['counts']):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, f'le="{_format_number(bound)}"')
+                samples.append((f'{self.name}_bucket', labels, cumulative))
+            labels = _format_labels(self.labelnames, key)
+            samples.append((f'{self.name}_sum', labels, round(series['sum'], 6)))
+            samples.append((f'{self.name}_count', labels, series['count']))
+        return samples
+
+
+class Registry:
+    """Conjunto de métricas e coletores expostos em /metrics"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def register_collector(self, collector):
+        """
+        Registra uma função chamada na raspagem
+
+        A função devolve [(nome, tipo, documentação, [(rótulos dict, valor)])], para
+        expor estatísticas mantidas por outros módulos sem duplicar a contagem.
+        """
+        with self._lock:
+            self._collectors.append(collector)
+
+    def render(self):
+        """Texto no formato de exposição do Prometheus (text/plain; version=0.0.4)"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors)
+        lines = []
+        for metric in metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(f'{name}{labels} {_format_number(value)}' for name, labels, value in metric.samples())
+        for collector in collectors:
+            try:
+                families = collector()
+            except Exception as e:
+                log.warning(f"Erro no coletor {getattr(collector, '__name__', collector)}: {e}")
+                continue
+            for name, kind, documentation, samples in families:
+                lines.append(f'# HELP {name} {documentation}')
+                lines.append(f'# TYPE {name} {kind}')
+                for labels, value in samples:
+                    names = tuple(labels)
+                    lines.append(f'{name}{_format_labels(names, [labels[n] for n in names])} {_format_number(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+STAGE_SECONDS = registry.histogram(
+    'extraction_stage_seconds', 'Duração de cada etapa da extração',
+    ('stage', 'store', 'strategy', 'outcome'),
+)
+EXTRACTION_SECONDS = registry.histogram(
+    'extraction_seconds', 'Duração total da extração por endpoint',
+    ('endpoint', 'store', 'outcome'),
+)
+HTTP_REQUEST_SECONDS = registry.histogram(
+    'http_request_seconds', 'Duração das requisições HTTP de saída',
+    ('method', 'store', 'proxied', 'outcome'),
+)
+RESPONSE_BYTES = registry.counter(
+    'http_response_bytes_total', 'Bytes recebidos nas requisições de saída (corpo descomprimido)',
+    ('store', 'proxied'),
+)
+
+
+class StageTimer:
+    """Estado da etapa em andamento: o resultado pode ser ajustado dentro do bloco"""
+
+    __slots__ = ('outcome', 'strategy', 'store')
+
+    def __init__(self, store, strategy):
+        self.outcome = 'success'
+        self.store = store
+        self.strategy = strategy
+
+
+@contextmanager
+def stage(name, store='', strategy=''):
+    """
+    Mede uma etapa da extração
+
+    O resultado é 'success', ou 'error' se o bloco levantar exceção; pode ser
+    trocado dentro do bloco (ex.: timer.outcome = 'empty').
+
+    Exemplo:
+        with stage('probe', store=store_name) as timer:
+            ...
+    """
+    timer = StageTimer(store, strategy)
+    start = time.perf_counter()
+    try:
+        yield timer
+    except BaseException:
+        timer.outcome = 'error'
+        raise
+    finally:
+        if METRICS_ENABLED:
+            STAGE_SECONDS.observe(time.perf_counter() - start, stage=name, store=timer.store,
+                                  strategy=timer.strategy, outcome=timer.outcome)
+
+
+def observe_http(method, store, proxied, seconds, outcome, body_bytes=0):
+    """Registra uma requisição de saída (duração e bytes recebidos)"""
+    if not METRICS_ENABLED:
+        return
+    proxied = 'true' if proxied else 'false'
+    HTTP_REQUEST_SECONDS.observe(seconds, method=method, store=store, proxied=proxied, outcome=outcome)
+    if body_bytes:
+        RESPONSE_BYTES.inc(body_bytes, store=store, proxied=proxied)
+
+
+def count_response_bytes(store, proxied, body_bytes):
+    """Bytes lidos de uma resposta em streaming (ex.: só o <head> no SEO)"""
+    if METRICS_ENABLED and body_bytes:
+        RESPONSE_BYTES.inc(body_bytes, store=store, proxied='true' if proxied else 'false')
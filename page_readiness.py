@@ -0,0 +1,78 @@
+"""
+Espera por prontidão da página no Selenium
+Substitui os sleeps fixos após driver.get por uma espera baseada em sinais
+reais da página (seletores por loja, document.readyState e rede ociosa),
+sempre limitada por um teto.
+"""
+
+import os
+import time
+
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.common.exceptions import TimeoutException
+
+from store_registry import STORE_RULES
+from structured_logging import get_logger
+
+log = get_logger('readiness')
+
+# Teto da espera (segundos) e janela sem novos recursos para considerar a rede ociosa
+PAGE_READY_MAX_WAIT = float(os.getenv('PAGE_READY_MAX_WAIT', '8'))
+NETWORK_IDLE_WINDOW = float(os.getenv('PAGE_READY_IDLE_WINDOW', '0.5'))
+
+# Seletores que indicam que o conteúdo do produto já está no DOM (qualquer um basta)
+READINESS_SELECTORS = {rule.name: rule.readiness_selectors for rule in STORE_RULES if rule.readiness_selectors}
+
+_READY_SCRIPT = """
+var selectors = arguments[0];
+var found = false;
+for (var i = 0; i < selectors.length; i++) {
+    if (document.querySelector(selectors[i])) { found = true; break; }
+}
+return [document.readyState, found, performance.getEntriesByType('resource').length];
+"""
+
+
+class _PageReady:
+    """Condição do WebDriverWait: seletor da loja presente ou readyState completo com rede ociosa"""
+
+    def __init__(self, selectors):
+        self.selectors = selectors
+        self.last_count = -1
+        self.last_change = time.time()
+
+    def __call__(self, driver):
+        ready_state, found, resource_count = driver.execute_script(_READY_SCRIPT, self.selectors)
+        if found and ready_state in ('interactive', 'complete'):
+            return True
+
+        now = time.time()
+        if resource_count != self.last_count:
+            self.last_count = resource_count
+            self.last_change = now
+            return False
+        return ready_state == 'complete' and (now - self.last_change) >= NETWORK_IDLE_WINDOW
+
+
+def wait_for_page_ready(driver, store_name, max_wait=None):
+    """
+    Aguarda a página ficar pronta para extração
+
+    Args:
+        driver: WebDriver já navegado para a URL
+        store_name (str): Nome da loja (define os seletores de prontidão)
+        max_wait (float, optional): Teto da espera em segundos
+
+    Returns:
+        float: Tempo efetivamente aguardado, em segundos
+    """
+    max_wait = PAGE_READY_MAX_WAIT if max_wait is None else max_wait
+    selectors = READINESS_SELECTORS.get(store_name, [])
+    start = time.time()
+    try:
+        WebDriverWait(driver, max_wait, poll_frequency=0.1).until(_PageReady(selectors))
+    except TimeoutException:
+        log.info(f"Página não sinalizou prontidão em {max_wait:.1f}s, seguindo assim mesmo")
+    waited = time.time() - start
+    log.debug("Página pronta após %.2fs", waited)
+    return waited
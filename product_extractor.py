@@ -18,6 +18,7 @@ import re
 import time
 import random
 import json
+import threading
 from urllib.parse import urlparse, parse_qs, unquote
 from typing import Optional, Dict, List, Any
 from dataclasses import dataclass, asdict
@@ -35,11 +36,24 @@ from selenium.common.exceptions import TimeoutException, WebDriverException
 
 # Import helpers do image_extractor
 from image_extractor import (
-    setup_chrome_driver_heroku,
-    cleanup_chrome_temp_dir,
     get_proxies_for_url,
     normalize_mercado_livre_url,
 )
+from driver_pool import get_driver_pool
+from http_client import http_get, http_head
+from page_readiness import wait_for_page_ready
+from resource_blocking import load_page
+from dom_harvest import harvest_amazon_fields
+from amazon_extractor import fetch_amazon_product, AmazonRobotCheck
+from store_registry import lookup_store
+from structured_data import extract_structured_product, is_complete
+from mercadolivre_api import extract_item_id, fetch_item_bundle
+from strategy_race import Strategy, RaceOutcome, race, policy_for, PRODUCT_HEDGE_POLICIES
+from strategy_router import strategy_router
+from metrics import stage
+from structured_logging import get_logger
+
+log = get_logger('product')
 
 
 @dataclass
@@ -61,6 +75,9 @@ class ExtractedProduct:
     extraction_method: str = "selenium"
     status: str = "success"
     error: Optional[str] = None
+    page_ready_wait_s: Optional[float] = None
+    network: Optional[Dict[str, Any]] = None
+    strategy_timings: Optional[Dict[str, float]] = None
 
     def __post_init__(self):
         if self.images is None:
@@ -73,43 +90,33 @@ class ExtractedProduct:
 
 
 def detect_platform(url: str) -> str:
-    """Detecta a plataforma de e-commerce pela URL"""
-    url_lower = url.lower()
-    
-    if 'mercadolivre' in url_lower or 'mercadolibre' in url_lower or 'mlstatic.com' in url_lower:
-        return 'mercadolivre'
-    elif 'amazon' in url_lower or 'amzn' in url_lower:
-        return 'amazon'
-    elif 'shopee' in url_lower:
-        return 'shopee'
-    elif 'aliexpress' in url_lower:
-        return 'aliexpress'
-    elif 'shein' in url_lower:
-        return 'shein'
-    elif 'magalu' in url_lower or 'magazineluiza' in url_lower:
-        return 'magazineluiza'
-    elif 'kabum' in url_lower:
-        return 'kabum'
-    elif 'americanas' in url_lower:
-        return 'americanas'
-    else:
-        return 'generic'
+    """Detecta a plataforma de e-commerce pela URL (chave do registro de lojas)"""
+    return lookup_store(url).key
+
+
+SHORTENER_HOSTS = ['amzn.to', 'bit.ly', 'tinyurl.com', 'goo.gl', 't.co', 'cutt.ly']
+
+
+def is_shortened_url(url: str) -> bool:
+    """Verifica se a URL é de um encurtador (amzn.to, bit.ly, etc)"""
+    try:
+        netloc = urlparse(url).netloc.lower()
+        return any(s in netloc for s in SHORTENER_HOSTS)
+    except Exception:
+        return False
 
 
 def resolve_shortened_url(url: str) -> str:
     """Resolve URLs encurtadas (amzn.to, bit.ly, etc)"""
-    shorteners = ['amzn.to', 'bit.ly', 'tinyurl.com', 'goo.gl', 't.co', 'cutt.ly']
-    
     try:
-        parsed = urlparse(url)
-        if any(s in parsed.netloc.lower() for s in shorteners):
-            print(f"↪️ Resolvendo URL encurtada: {url}")
-            response = requests.head(url, allow_redirects=True, timeout=10)
+        if is_shortened_url(url):
+            log.info(f"Resolvendo URL encurtada: {url}")
+            response = http_head(url, timeout=10)
             resolved = response.url
-            print(f"   ➡️ Resolvido para: {resolved}")
+            log.info(f"Resolvido para: {resolved}")
             return resolved
     except Exception as e:
-        print(f"⚠️ Erro ao resolver URL: {e}")
+        log.warning(f"Erro ao resolver URL: {e}")
     
     return url
 
@@ -133,47 +140,47 @@ def parse_price(price_str: str) -> Optional[float]:
         return None
 
 
+def product_from_structured(url: str, platform: str, data: Dict[str, Any]) -> ExtractedProduct:
+    """Monta o ExtractedProduct a partir dos dados estruturados da página"""
+    return ExtractedProduct(
+        url=url,
+        platform=platform,
+        title=data.get('title'),
+        price=data.get('price'),
+        original_price=data.get('original_price'),
+        currency=data.get('currency') or 'BRL',
+        description=data['description'][:1000] if data.get('description') else None,
+        images=data.get('images', [])[:10],
+        seller=data.get('seller'),
+        rating=data.get('rating'),
+        review_count=data.get('review_count'),
+        extraction_method='structured_data'
+    )
+
+
 # ═══════════════════════════════════════════════════════════════════════════
 # EXTRATORES POR PLATAFORMA
 # ═══════════════════════════════════════════════════════════════════════════
 
 def extract_mercadolivre_with_api(url: str) -> Optional[ExtractedProduct]:
     """Extrai produto do Mercado Livre via API pública"""
-    print("🟡 [ML]: Tentando via API pública...")
+    log.debug("Mercado Livre: tentando via API pública")
     
     try:
-        # Extrair ID do item
-        item_id = None
-        parsed = urlparse(url)
-        
-        # Padrão: /p/MLBxxxx ou MLBxxxx no path
-        match = re.search(r'(ML[A-Z]{1,2}\d+)', url.upper())
-        if match:
-            item_id = match.group(1)
+        # Extrair ID do item (padrão: /p/MLBxxxx, MLB-xxxx ou MLBxxxx no path)
+        item_id = extract_item_id(url)
         
         if not item_id:
-            print("   ❌ Não foi possível extrair ID do item")
+            log.warning("Não foi possível extrair ID do item", extra={'url': url})
             return None
         
-        print(f"   📌 Item ID: {item_id}")
+        log.debug("Item ID: %s", item_id)
         
-        # Buscar na API
-        api_url = f"https://api.mercadolibre.com/items/{item_id}"
+        # Item, descrição e vendedor em paralelo (descrição e vendedor cacheados)
         proxies = get_proxies_for_url(url, 'Mercado Livre')
-        
-        response = requests.get(api_url, proxies=proxies, timeout=15)
-        response.raise_for_status()
-        data = response.json()
-        
-        # Buscar descrição
-        description = ""
-        try:
-            desc_response = requests.get(f"{api_url}/description", proxies=proxies, timeout=10)
-            if desc_response.ok:
-                desc_data = desc_response.json()
-                description = desc_data.get('plain_text', '') or desc_data.get('text', '')
-        except:
-            pass
+        with stage('api', store='mercadolivre', strategy='ml_api'):
+            data, description, seller = fetch_item_bundle(item_id, proxies)
+        seller = seller or "Mercado Livre"
         
         # Extrair imagens
         images = []
@@ -182,20 +189,6 @@ def extract_mercadolivre_with_api(url: str) -> Optional[ExtractedProduct]:
         elif data.get('thumbnail'):
             images = [data['thumbnail']]
         
-        # Buscar nome do vendedor
-        seller = "Mercado Livre"
-        try:
-            if data.get('seller_id'):
-                seller_response = requests.get(
-                    f"https://api.mercadolibre.com/users/{data['seller_id']}",
-                    proxies=proxies,
-                    timeout=10
-                )
-                if seller_response.ok:
-                    seller = seller_response.json().get('nickname', 'Mercado Livre')
-        except:
-            pass
-        
         product = ExtractedProduct(
             url=url,
             platform='mercadolivre',
@@ -209,35 +202,36 @@ def extract_mercadolivre_with_api(url: str) -> Optional[ExtractedProduct]:
             extraction_method='mercadolivre_api'
         )
         
-        print(f"   ✅ Extraído via API: {product.title[:50]}...")
+        log.info(f"Extraído via API: {product.title[:50]}")
         return product
         
     except Exception as e:
-        print(f"   ❌ API falhou: {e}")
+        log.warning(f"API falhou: {e}", extra={'url': url})
         return None
 
 
 def extract_mercadolivre_with_html(url: str) -> Optional[ExtractedProduct]:
     """Extrai produto do Mercado Livre via HTML scraping"""
-    print("🟡 [ML]: Tentando via HTML scraping...")
+    log.debug("Mercado Livre: tentando via HTML scraping")
     
     # Normalizar URL
     url = normalize_mercado_livre_url(url)
     
     try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
-            'Accept-Language': 'pt-BR,pt;q=0.9,en;q=0.8',
-            'Accept-Encoding': 'gzip, deflate',
-            'Referer': 'https://www.mercadolivre.com.br/',
-        }
-        
         proxies = get_proxies_for_url(url, 'Mercado Livre')
-        response = requests.get(url, headers=headers, proxies=proxies, timeout=30)
+        response = http_get(url, profile='mercadolivre', proxies=proxies, timeout=30)
         response.raise_for_status()
         
-        soup = BeautifulSoup(response.content, 'html.parser')
+        # Fast path: JSON-LD/__PRELOADED_STATE__ com título, preço e imagens
+        with stage('parse_structured', store='mercadolivre', strategy='ml_html'):
+            structured = extract_structured_product(response.content, url)
+        if is_complete(structured):
+            product = product_from_structured(url, 'mercadolivre', structured)
+            log.info(f"Extraído via dados estruturados ({', '.join(structured['sources'])}): {product.title[:50]}")
+            return product
+        
+        with stage('parse', store='mercadolivre', strategy='ml_html'):
+            soup = BeautifulSoup(response.content, 'html.parser')
         
         # Título
         title = None
@@ -291,64 +285,68 @@ def extract_mercadolivre_with_html(url: str) -> Optional[ExtractedProduct]:
             extraction_method='html_scraping'
         )
         
-        print(f"   ✅ Extraído via HTML: {product.title[:50] if product.title else 'N/A'}...")
+        log.info(f"Extraído via HTML: {product.title[:50] if product.title else 'N/A'}")
         return product
         
     except Exception as e:
-        print(f"   ❌ HTML scraping falhou: {e}")
+        log.warning(f"HTML scraping falhou: {e}", extra={'url': url})
         return None
 
 
-def extract_amazon(url: str) -> Optional[ExtractedProduct]:
-    """Extrai produto da Amazon"""
-    print("🟠 [Amazon]: Extraindo...")
-    
-    driver = None
-    temp_dir = None
+def extract_amazon_with_http(url: str) -> Optional[ExtractedProduct]:
+    """
+    Extrai produto da Amazon pelo HTML (sem Chrome): título, preço e imagens
+    hiRes embutidos na página. None em captcha/erro ou se a página não trouxe título.
+    """
+    log.debug("Amazon: extraindo via HTTP")
+    try:
+        data = fetch_amazon_product(url)
+    except AmazonRobotCheck:
+        return None
+    except Exception as e:
+        log.warning(f"Amazon via HTTP falhou: {e}", extra={'url': url})
+        return None
+    if not data['title']:
+        return None
+    return ExtractedProduct(
+        url=url,
+        platform='amazon',
+        title=data['title'],
+        price=parse_price(data['price']) if data['price'] else None,
+        description=data['description'],
+        images=data['images'][:10],
+        extraction_method='amazon_http',
+    )
+
+
+def extract_amazon(url: str, cancel_token=None) -> Optional[ExtractedProduct]:
+    """Extrai produto da Amazon (com cancel_token, o Chrome é fechado se a estratégia perder a corrida)"""
+    log.debug("Amazon: extraindo")
     
     try:
-        driver, temp_dir = setup_chrome_driver_heroku()
-        if not driver:
-            return None
-        
-        driver.get(url)
-        time.sleep(random.uniform(2, 4))
-        
-        # Título
-        title = None
-        try:
-            title_el = driver.find_element(By.ID, 'productTitle')
-            title = title_el.text.strip()
-        except:
-            pass
-        
-        # Preço
-        price = None
-        try:
-            price_el = driver.find_element(By.CSS_SELECTOR, '.a-price-whole')
-            price = parse_price(price_el.text)
-        except:
-            pass
-        
-        # Descrição
-        description = None
-        try:
-            desc_el = driver.find_element(By.ID, 'productDescription')
-            description = desc_el.text.strip()[:1000]
-        except:
-            pass
-        
-        # Imagens
-        images = []
-        try:
-            for img in driver.find_elements(By.CSS_SELECTOR, '#altImages img, #imgTagWrapperId img'):
-                src = img.get_attribute('src')
+        with get_driver_pool().session() as driver:
+            if not driver:
+                return None
+            
+            if cancel_token is None:
+                waited, network_report, fields = _amazon_page_fields(driver, url)
+            else:
+                with cancel_token.guard(driver.quit):
+                    if cancel_token.cancelled:
+                        return None
+                    waited, network_report, fields = _amazon_page_fields(driver, url)
+            
+            title = fields.get('title') or None
+            price = parse_price(fields['price']) if fields.get('price') else None
+            description = fields['description'][:1000] if fields.get('description') else None
+            
+            # Imagens
+            images = []
+            for src in fields['images']:
                 if src and 'amazon.com' in src and 'icon' not in src.lower():
                     # Converter para alta resolução
                     src = re.sub(r'\._[^.]+_\.', '.', src)
                     images.append(src)
-        except:
-            pass
         
         product = ExtractedProduct(
             url=url,
@@ -357,34 +355,46 @@ def extract_amazon(url: str) -> Optional[ExtractedProduct]:
             price=price,
             description=description,
             images=list(set(images))[:10],
-            extraction_method='selenium'
+            extraction_method='selenium',
+            page_ready_wait_s=round(waited, 3),
+            network=network_report
         )
         
-        print(f"   ✅ Extraído: {product.title[:50] if product.title else 'N/A'}...")
+        log.info(f"Extraído: {product.title[:50] if product.title else 'N/A'}")
         return product
         
     except Exception as e:
-        print(f"   ❌ Extração falhou: {e}")
+        if cancel_token is not None and cancel_token.cancelled:
+            log.info("Extração cancelada (outra estratégia venceu)")
+            return None
+        log.warning(f"Extração falhou: {e}", extra={'url': url})
         return None
-    finally:
-        if driver:
-            driver.quit()
-        if temp_dir:
-            cleanup_chrome_temp_dir(temp_dir)
+
+
+def _amazon_page_fields(driver, url: str):
+    """Abre a página e lê título, preço, descrição e imagens em uma única chamada ao chromedriver"""
+    waited, network_report = load_page(driver, url, 'Amazon', wait_for_page_ready)
+    return waited, network_report, harvest_amazon_fields(driver)
 
 
 def extract_generic(url: str) -> ExtractedProduct:
     """Extrai produto de site genérico usando meta tags"""
-    print("🔵 [Generic]: Extraindo via meta tags...")
+    log.debug("Genérico: extraindo via meta tags")
     
     try:
-        headers = {
-            'User-Agent': 'WhatsApp/2.23.24.81 (iPhone; iOS 17.1.2; Scale/3.00)',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
-        }
+        response = http_get(url, profile='whatsapp_plain', timeout=15)
+        platform = detect_platform(url)
         
-        response = requests.get(url, headers=headers, timeout=15)
-        soup = BeautifulSoup(response.content, 'html.parser')
+        # Fast path: dados estruturados completos dispensam a leitura das meta tags
+        with stage('parse_structured', store=platform, strategy='generic'):
+            structured = extract_structured_product(response.content, url) or {}
+        if is_complete(structured):
+            product = product_from_structured(url, platform, structured)
+            log.info(f"Extraído via dados estruturados ({', '.join(structured['sources'])}): {product.title[:50]}")
+            return product
+        
+        with stage('parse', store=platform, strategy='generic'):
+            soup = BeautifulSoup(response.content, 'html.parser')
         
         # Open Graph tags
         title = None
@@ -416,6 +426,12 @@ def extract_generic(url: str) -> ExtractedProduct:
         
         images = [image] if image else []
         
+        # Completar com o que os dados estruturados trouxeram (parciais)
+        title = title or structured.get('title')
+        price = price or structured.get('price')
+        description = description or structured.get('description')
+        images = images or structured.get('images', [])[:10]
+        
         product = ExtractedProduct(
             url=url,
             platform='generic',
@@ -426,11 +442,11 @@ def extract_generic(url: str) -> ExtractedProduct:
             extraction_method='meta_tags'
         )
         
-        print(f"   ✅ Extraído: {product.title[:50] if product.title else 'N/A'}...")
+        log.info(f"Extraído: {product.title[:50] if product.title else 'N/A'}")
         return product
         
     except Exception as e:
-        print(f"   ❌ Extração genérica falhou: {e}")
+        log.warning(f"Extração genérica falhou: {e}", extra={'url': url})
         return ExtractedProduct(
             url=url,
             platform='generic',
@@ -443,6 +459,50 @@ def extract_generic(url: str) -> ExtractedProduct:
 # FUNÇÃO PRINCIPAL
 # ═══════════════════════════════════════════════════════════════════════════
 
+def race_product_strategies(url: str, platform: str) -> RaceOutcome:
+    """
+    Corre as estratégias da política da plataforma (ver strategy_race), na ordem
+    aprendida para o host (ver strategy_router)
+    
+    Completo = título e preço; aceitável = título.
+    """
+    # Página da Amazon lida via HTTP (sem captcha): o Chrome não acharia mais nada
+    amazon_page_read = threading.Event()
+    
+    def amazon_http(token):
+        product = extract_amazon_with_http(url)
+        if product is not None:
+            amazon_page_read.set()
+        return product
+    
+    def amazon_selenium(token):
+        # Chrome só como fallback: captcha/erro no HTTP, ou hedge com o HTTP ainda pendente
+        # (desistir cancela o token: a corrida não conta a desistência como falha)
+        if amazon_page_read.is_set():
+            token.cancel()
+            return None
+        return extract_amazon(url, cancel_token=token)
+    
+    runners = {
+        'ml_api': lambda token: extract_mercadolivre_with_api(url),
+        'ml_html': lambda token: extract_mercadolivre_with_html(url),
+        'amazon_http': amazon_http,
+        'amazon': amazon_selenium,
+        'generic': lambda token: extract_generic(url),
+    }
+    policy = [(name, delay) for name, delay in policy_for(PRODUCT_HEDGE_POLICIES, platform) if name in runners]
+    # Ordem ajustada pelo histórico do host (strategy_router)
+    strategies = [Strategy(name, runners[name], delay) for name, delay in strategy_router.plan(url, policy)]
+    outcome = race(
+        strategies,
+        is_complete=lambda product: bool(product and product.title and product.price),
+        is_usable=lambda product: bool(product and product.title),
+        store=platform,
+    )
+    strategy_router.record_outcome(url, outcome)
+    return outcome
+
+
 def extract_product(url: str) -> ExtractedProduct:
     """
     Função principal de extração de produtos
@@ -453,48 +513,42 @@ def extract_product(url: str) -> ExtractedProduct:
     Returns:
         ExtractedProduct com dados do produto
     """
-    print(f"\n{'='*80}")
-    print(f"📦 Iniciando extração de produto...")
-    print(f"   URL: {url}")
-    print(f"{'='*80}\n")
+    log.info("Iniciando extração de produto", extra={'url': url})
     
     start_time = time.time()
     
     # Resolver URLs encurtadas
-    resolved_url = resolve_shortened_url(url)
+    with stage('resolve_url'):
+        resolved_url = resolve_shortened_url(url)
     
     # Detectar plataforma
     platform = detect_platform(resolved_url)
-    print(f"🏪 Plataforma detectada: {platform}")
-    
-    product = None
-    
-    # Roteamento por plataforma
-    if platform == 'mercadolivre':
-        # Tentar API primeiro, depois HTML
-        product = extract_mercadolivre_with_api(resolved_url)
-        if not product or not product.title:
-            product = extract_mercadolivre_with_html(resolved_url)
+    log.debug("Plataforma detectada: %s", platform)
     
-    elif platform == 'amazon':
-        product = extract_amazon(resolved_url)
+    # Estratégias da plataforma em corrida com hedge: a primeira completa vence
+    outcome = race_product_strategies(resolved_url, platform)
+    product = outcome.result
     
-    # Fallback para extração genérica
+    # Nenhuma estratégia trouxe título: usar o resultado genérico (mesmo com erro)
     if not product or not product.title:
-        print("⚠️ Usando extração genérica como fallback...")
+        product = outcome.results.get('generic')
+    if not product:
+        log.warning("Usando extração genérica como fallback")
         product = extract_generic(resolved_url)
+    product.strategy_timings = outcome.timings
     
     # Garantir que URL original está no resultado
     product.url = url
     
     duration = time.time() - start_time
-    print(f"\n{'='*80}")
-    print(f"✅ Extração concluída em {duration:.2f}s")
-    print(f"   Título: {product.title[:60] if product.title else 'N/A'}...")
-    print(f"   Preço: R$ {product.price or 'N/A'}")
-    print(f"   Imagens: {len(product.images)}")
-    print(f"   Método: {product.extraction_method}")
-    print(f"{'='*80}\n")
+    log.info(f"Extração concluída em {duration:.2f}s", extra={
+        'platform': platform,
+        'title': (product.title or '')[:60],
+        'price': product.price,
+        'image_count': len(product.images),
+        'extraction_method': product.extraction_method,
+        'duration_s': round(duration, 3),
+    })
     
     return product
 
@@ -0,0 +1,194 @@
+"""
+Bloqueio de recursos nas páginas abertas no Chrome (DevTools protocol)
+Só lemos URLs e atributos do DOM: corpos de imagem, vídeo, fontes e scripts
+de analytics/anúncios não precisam ser baixados. Os bloqueios são aplicados
+com Network.setBlockedURLs antes de cada navegação (o driver do pool é
+reaproveitado entre lojas) e o log de performance do Chrome informa quantas
+requisições foram bloqueadas, quantos bytes vieram pela rede e o tempo de carga.
+"""
+
+import os
+import json
+import time
+import threading
+
+from store_registry import rule_for_store
+from structured_logging import get_logger
+
+log = get_logger('block')
+
+CHROME_BLOCK_RESOURCES = os.getenv('CHROME_BLOCK_RESOURCES', '1') == '1'
+# Tipos bloqueados: image, media, font (separados por vírgula)
+CHROME_BLOCKED_TYPES = [t.strip() for t in os.getenv('CHROME_BLOCKED_TYPES', 'image,media,font').split(',') if t.strip()]
+CHROME_BLOCK_THIRD_PARTY = os.getenv('CHROME_BLOCK_THIRD_PARTY', '1') == '1'
+
+# Extensões por tipo de recurso
+RESOURCE_TYPE_EXTENSIONS = {
+    'image': ['jpg', 'jpeg', 'png', 'gif', 'webp', 'avif', 'svg', 'ico', 'bmp'],
+    'media': ['mp4', 'webm', 'm3u8', 'mp3', 'ogg', 'mov'],
+    'font': ['woff', 'woff2', 'ttf', 'otf', 'eot'],
+}
+
+
+def extension_patterns(extensions):
+    """
+    Curingas do Network.setBlockedURLs ancorados no fim do caminho ou antes da query
+
+    '*.gif*' casaria com o host (giftshop.com.br) e bloquearia a página inteira;
+    '*.gif' e '*.gif?*' só casam com o arquivo.
+    """
+    patterns = []
+    for ext in extensions:
+        patterns.extend([f'*.{ext}', f'*.{ext}?*'])
+    return patterns
+
+
+# Padrões de URL por tipo de recurso (curingas do Network.setBlockedURLs)
+RESOURCE_TYPE_PATTERNS = {
+    resource_type: extension_patterns(extensions)
+    for resource_type, extensions in RESOURCE_TYPE_EXTENSIONS.items()
+}
+
+# Hosts de analytics/anúncios de terceiros (comuns a todas as lojas)
+THIRD_PARTY_BLOCKED_PATTERNS = [
+    '*google-analytics.com*', '*googletagmanager.com*', '*googleadservices.com*',
+    '*googlesyndication.com*', '*doubleclick.net*', '*connect.facebook.net*',
+    '*facebook.com/tr*', '*hotjar.com*', '*clarity.ms*', '*criteo.com*', '*criteo.net*',
+    '*taboola.com*', '*outbrain.com*', '*analytics.tiktok.com*', '*bat.bing.com*',
+    '*scorecardresearch.com*', '*newrelic.com*', '*nr-data.net*', '*branch.io*',
+]
+
+# Tamanho médio estimado de cada tipo de recurso bloqueado (bytes)
+ESTIMATED_RESOURCE_BYTES = {
+    'Image': 60_000,
+    'Media': 500_000,
+    'Font': 40_000,
+    'Script': 30_000,
+    'XHR': 5_000,
+    'Fetch': 5_000,
+}
+DEFAULT_RESOURCE_BYTES = 10_000
+
+_totals = {
+    'pages': 0,
+    'blocked_requests': 0,
+    'bytes_transferred': 0,
+    'estimated_bytes_saved': 0,
+    'page_load_total_s': 0.0,
+}
+_totals_lock = threading.Lock()
+
+
+def blocked_patterns_for(store_name):
+    """Lista de padrões bloqueados para a loja (tipos configurados + terceiros + regras da loja)"""
+    patterns = []
+    for resource_type in CHROME_BLOCKED_TYPES:
+        patterns.extend(RESOURCE_TYPE_PATTERNS.get(resource_type, []))
+    if CHROME_BLOCK_THIRD_PARTY:
+        patterns.extend(THIRD_PARTY_BLOCKED_PATTERNS)
+        patterns.extend(rule_for_store(store_name).blocked_url_patterns)
+    return patterns
+
+
+def apply_resource_blocking(driver, store_name):
+    """
+    Configura os bloqueios da loja no driver e descarta o log de performance anterior
+
+    Returns:
+        int: Quantidade de padrões bloqueados (0 se desativado ou indisponível)
+    """
+    if not CHROME_BLOCK_RESOURCES:
+        return 0
+    patterns = blocked_patterns_for(store_name)
+    try:
+        driver.execute_cdp_cmd('Network.enable', {})
+        driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': patterns})
+    except Exception as e:
+        log.warning(f"Bloqueio de recursos indisponível: {e}")
+        return 0
+    # Eventos de navegações anteriores (ex.: about:blank da limpeza do pool)
+    _drain_performance_log(driver)
+    return len(patterns)
+
+
+def _drain_performance_log(driver):
+    try:
+        return driver.get_log('performance')
+    except Exception:
+        return []
+
+
+def collect_network_report(driver, load_time_s):
+    """
+    Resume a atividade de rede da última navegação a partir do log de performance
+
+    Args:
+        driver: WebDriver com goog:loggingPrefs performance habilitado
+        load_time_s (float): Tempo de carga medido (driver.get + espera de prontidão)
+
+    Returns:
+        dict: blocked_requests, bytes_transferred, estimated_bytes_saved, page_load_s
+    """
+    blocked = 0
+    saved = 0
+    transferred = 0
+    for entry in _drain_performance_log(driver):
+        try:
+            message = json.loads(entry['message'])['message']
+        except (KeyError, ValueError, TypeError):
+            continue
+        method = message.get('method')
+        params = message.get('params', {})
+        if method == 'Network.loadingFailed' and params.get('blockedReason'):
+            blocked += 1
+            saved += ESTIMATED_RESOURCE_BYTES.get(params.get('type'), DEFAULT_RESOURCE_BYTES)
+        elif method == 'Network.loadingFinished':
+            transferred += int(params.get('encodedDataLength') or 0)
+
+    report = {
+        'blocked_requests': blocked,
+        'bytes_transferred': transferred,
+        'estimated_bytes_saved': saved,
+        'page_load_s': round(load_time_s, 3),
+    }
+    with _totals_lock:
+        _totals['pages'] += 1
+        _totals['blocked_requests'] += blocked
+        _totals['bytes_transferred'] += transferred
+        _totals['estimated_bytes_saved'] += saved
+        _totals['page_load_total_s'] += load_time_s
+    log.info(f"{blocked} requisições bloqueadas (~{saved / 1024:.0f} KB economizados), "
+             f"{transferred / 1024:.0f} KB transferidos, carga em {load_time_s:.2f}s", extra=report)
+    return report
+
+
+def load_page(driver, url, store_name, wait_ready):
+    """
+    Navega com os bloqueios da loja aplicados e mede a carga
+
+    Args:
+        driver: WebDriver do pool
+        url (str): URL a abrir
+        store_name (str): Loja (define os bloqueios e os seletores de prontidão)
+        wait_ready: Função (driver, store_name) -> segundos esperados pela prontidão
+
+    Returns:
+        tuple: (segundos de espera de prontidão, relatório de rede)
+    """
+    apply_resource_blocking(driver, store_name)
+    start = time.time()
+    driver.get(url)
+    waited = wait_ready(driver, store_name)
+    report = collect_network_report(driver, time.time() - start)
+    return waited, report
+
+
+def stats():
+    """Totais acumulados do bloqueio de recursos"""
+    with _totals_lock:
+        totals = dict(_totals)
+    pages = totals['pages']
+    totals['page_load_avg_s'] = round(totals.pop('page_load_total_s') / pages, 3) if pages else 0.0
+    totals['enabled'] = CHROME_BLOCK_RESOURCES
+    totals['blocked_types'] = CHROME_BLOCKED_TYPES
+    return totals
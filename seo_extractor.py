@@ -3,52 +3,99 @@
 Extrator de meta tags SEO estilo WhatsApp
 """
 
+import os
+import re
 import requests
 from bs4 import BeautifulSoup
+from http_client import http_get
+from store_registry import proxies_for, lookup_store
+from metrics import count_response_bytes
+from structured_logging import get_logger
 from urllib.parse import urljoin, urlparse, parse_qs
 from datetime import datetime
 
-def _get_proxy_from_env():
-    """Retorna dict de proxy se PROXY_HOST (ou PROXY_USER) estiver configurado."""
-    import os
-    host = os.getenv('PROXY_HOST')
-    username = os.getenv('PROXY_USER')
-    if not host and not username:
-        return None
+log = get_logger('seo')
+
+# Leitura parcial do HTML: para no </head> ou neste limite de bytes
+SEO_HEAD_MAX_BYTES = int(os.getenv('SEO_HEAD_MAX_BYTES', '262144'))
+SEO_STREAM_CHUNK_SIZE = 16384
+
+_HEAD_END_RE = re.compile(rb'</head\s*>', re.I)
+
+
+class StreamedPage:
+    """
+    Resposta HTTP lida de forma incremental
+    - head: bytes até o fim do </head> (ou até o limite de bytes)
+    - read_all(): continua a leitura do mesmo stream só quando o corpo for necessário
+    Os bytes lidos entram em http_response_bytes_total (store/proxied).
+    """
+
+    def __init__(self, response, max_bytes=SEO_HEAD_MAX_BYTES, store='generic', proxied=False):
+        self.response = response
+        self.store = store
+        self.proxied = proxied
+        self._chunks = response.iter_content(chunk_size=SEO_STREAM_CHUNK_SIZE)
+        self._buffer = bytearray()
+        self.complete = False   # corpo inteiro já lido
+        self.truncated = False  # parou pelo limite de bytes sem achar </head>
+        self.head = self._read_head(max_bytes)
+        count_response_bytes(store, proxied, self.bytes_read)
+
+    def _read_head(self, max_bytes):
+        search_from = 0
+        for chunk in self._chunks:
+            self._buffer.extend(chunk)
+            match = _HEAD_END_RE.search(self._buffer, search_from)
+            if match:
+                return bytes(self._buffer[:match.end()])
+            if len(self._buffer) >= max_bytes:
+                self.truncated = True
+                return bytes(self._buffer)
+            # Recomeçar a busca um pouco antes, caso a tag tenha sido cortada entre chunks
+            search_from = max(0, len(self._buffer) - 8)
+        self.complete = True
+        return bytes(self._buffer)
+
+    @property
+    def bytes_read(self):
+        return len(self._buffer)
+
+    def read_all(self):
+        """Lê o restante do corpo e retorna o HTML completo"""
+        if not self.complete:
+            already_read = self.bytes_read
+            for chunk in self._chunks:
+                self._buffer.extend(chunk)
+            self.complete = True
+            self.close()
+            count_response_bytes(self.store, self.proxied, self.bytes_read - already_read)
+        return bytes(self._buffer)
+
+    def close(self):
+        self.response.close()
+
+
+def fetch_page_head(url, profile, timeout, proxies=None):
+    """
+    Busca a página em modo streaming e lê só o <head>
+
+    Returns:
+        StreamedPage (feche com close() quando terminar)
+    """
+    response = http_get(url, profile=profile, timeout=timeout, proxies=proxies, stream=True)
     try:
-        host = host or 'proxy.smartproxy.net'
-        port = int(os.getenv('PROXY_PORT', '3120'))
-        username = username or ''
-        password = os.getenv('PROXY_PASS', '')
-        proxy_url = f"http://{username}:{password}@{host}:{port}" if username else f"http://{host}:{port}"
-        return {'http': proxy_url, 'https': proxy_url}
+        response.raise_for_status()
+        page = StreamedPage(response, store=lookup_store(url).key, proxied=bool(proxies))
     except Exception:
-        return None
-
+        response.close()
+        raise
+    log.debug("Lidos %d bytes (%s)", page.bytes_read, 'limite atingido' if page.truncated else 'head completo')
+    return page
 
 def get_proxies_for_url(url: str):
     """Retorna proxies para requests quando a URL for do Mercado Livre ou AliExpress (proxy configurado no env)."""
-    try:
-        url_lower = (url or '').lower()
-        is_ml = ('mercadolivre' in url_lower) or ('mlstatic.com' in url_lower)
-        is_ae = 'aliexpress' in url_lower
-        if not is_ml and not is_ae:
-            return None
-
-        proxy = _get_proxy_from_env()
-        if proxy and is_ae:
-            return proxy  # AliExpress: usa proxy quando configurado (ex.: Heroku com IP de datacenter)
-        if is_ml:
-            import os
-            host = os.getenv('PROXY_HOST', 'proxy.smartproxy.net')
-            port = int(os.getenv('PROXY_PORT', '3120'))
-            username = os.getenv('PROXY_USER', 'smart-rsrg25meix8s_area-BR_city-aracruz')
-            password = os.getenv('PROXY_PASS', 'OGf8dvp75MD79qUN')
-            proxy_url = f"http://{username}:{password}@{host}:{port}"
-            return {'http': proxy_url, 'https': proxy_url}
-        return None
-    except Exception:
-        return None
+    return proxies_for(url)
 
 def normalize_mercado_livre_url(url: str) -> str:
     """Se for página de verificação (gz/account-verification), extrai o parâmetro 'go'"""
@@ -63,7 +110,7 @@ def normalize_mercado_livre_url(url: str) -> str:
                 from urllib.parse import unquote
                 real_url = unquote(go_vals[0])
                 if real_url:
-                    print("↪️ [SEO] Redirecionando para URL real do produto (go):", real_url)
+                    log.info(f"Redirecionando para URL real do produto (go): {real_url}")
                     return real_url
         return url
     except Exception:
@@ -111,28 +158,22 @@ def extract_youtube_meta_tags(url: str):
     - Extrai título e descrição do HTML
     """
     try:
-        print(f"🎬 [YOUTUBE] Extraindo meta tags de: {url}")
+        log.info("Extraindo meta tags do YouTube", extra={'url': url})
         
         video_id = extract_youtube_video_id(url)
         if not video_id:
-            print(f"⚠️ [YOUTUBE] Não foi possível extrair ID do vídeo")
+            log.warning("Não foi possível extrair ID do vídeo do YouTube", extra={'url': url})
             return None
         
-        print(f"📺 [YOUTUBE] Video ID: {video_id}")
-        
         # Thumbnail direta do YouTube (sem precisar de API!)
         thumbnail = get_youtube_thumbnail(video_id)
-        print(f"🖼️ [YOUTUBE] Thumbnail: {thumbnail}")
-        
-        # Buscar título e descrição do HTML
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
-            'Accept-Language': 'pt-BR,pt;q=0.9,en;q=0.8',
-        }
         
-        response = requests.get(url, headers=headers, timeout=10, allow_redirects=True)
-        soup = BeautifulSoup(response.content, 'html.parser')
+        # Buscar título e descrição do HTML (só o <head> é necessário)
+        page = fetch_page_head(url, 'youtube', timeout=10)
+        try:
+            soup = BeautifulSoup(page.head, 'html.parser')
+        finally:
+            page.close()
         
         # Extrair título
         title = None
@@ -165,15 +206,13 @@ def extract_youtube_meta_tags(url: str):
             'status': 'success'
         }
         
-        print(f"✅ [YOUTUBE] Extraído:")
-        print(f"  📄 Título: {title[:80] if title else 'N/A'}{'...' if title and len(title) > 80 else ''}")
-        print(f"  📝 Descrição: {description[:80] if description else 'N/A'}{'...' if description and len(description) > 80 else ''}")
-        print(f"  🖼️ Imagem: {thumbnail}")
+        log.info("Meta tags extraídas", extra={'source': 'youtube_direct', 'video_id': video_id,
+                                               'title': (title or '')[:80], 'image': thumbnail})
         
         return result
         
     except Exception as e:
-        print(f"❌ [YOUTUBE] Erro: {str(e)}")
+        log.warning(f"Erro no YouTube: {e}", extra={'url': url})
         # Mesmo com erro, tentar retornar a thumbnail
         video_id = extract_youtube_video_id(url)
         if video_id:
@@ -201,34 +240,23 @@ def extract_mercado_livre_meta_tags(url):
         dict: Dicionário com meta tags extraídas
     """
     try:
-        print(f"🛒 [MERCADO LIVRE] Extraindo meta tags de: {url}")
-        
-        # Headers específicos para ML - SEM Accept-Encoding para evitar problemas de compressão
-        headers = {
-            'User-Agent': 'WhatsApp/2.23.24.81 (iPhone; iOS 17.1.2; Scale/3.00)',
-            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
-            'Accept-Language': 'pt-BR,pt;q=0.9,en;q=0.8',
-            'Connection': 'keep-alive',
-            'Upgrade-Insecure-Requests': '1',
-        }
+        log.info("Extraindo meta tags do Mercado Livre", extra={'url': url})
         
         # Normalizar URL do Mercado Livre (evitar página de verificação)
         url = normalize_mercado_livre_url(url)
 
         proxies = get_proxies_for_url(url)
         if proxies:
-            print("🛡️ [ML] Usando proxy para Mercado Livre")
+            log.debug("Usando proxy para Mercado Livre")
         
+        # Headers específicos para ML - SEM Accept-Encoding para evitar problemas de compressão
+        # As meta tags ficam no <head>: o resto da página nem é baixado (com o
+        # limite de bytes, vale o que foi lido)
+        page = fetch_page_head(url, 'whatsapp_ml', timeout=10, proxies=proxies)
         try:
-            response = requests.get(url, headers=headers, timeout=10, allow_redirects=True, proxies=proxies)
-        except requests.exceptions.SSLError:
-            print("♻️ [ML] Re-tentando sem keep-alive por SSLError")
-            headers_retry = dict(headers)
-            headers_retry['Connection'] = 'close'
-            response = requests.get(url, headers=headers_retry, timeout=10, allow_redirects=True, proxies=proxies)
-        response.raise_for_status()
-        
-        soup = BeautifulSoup(response.content, 'html.parser')
+            soup = BeautifulSoup(page.head, 'html.parser')
+        finally:
+            page.close()
         
         # Extrair Open Graph tags (prioridade)
         og_title = None
@@ -277,15 +305,13 @@ def extract_mercado_livre_meta_tags(url):
             'status': 'success'
         }
         
-        print(f"✅ [MERCADO LIVRE] Extraído:")
-        print(f"  📄 Título: {og_title[:80]}{'...' if og_title and len(og_title) > 80 else ''}")
-        print(f"  📝 Descrição: {og_description[:80] if og_description else 'N/A'}{'...' if og_description and len(og_description) > 80 else ''}")
-        print(f"  🖼️ Imagem: {og_image[:80] if og_image else 'N/A'}{'...' if og_image and len(og_image) > 80 else ''}")
+        log.info("Meta tags extraídas", extra={'source': 'mercado_livre', 'title': (og_title or '')[:80],
+                                               'image': og_image})
         
         return result
         
     except Exception as e:
-        print(f"❌ [MERCADO LIVRE] Erro: {str(e)}")
+        log.warning(f"Erro no Mercado Livre: {e}", extra={'url': url})
         return {
             'url': url,
             'status': 'error',
@@ -306,6 +332,7 @@ def extract_seo_meta_tags(url):
     Returns:
         dict: Dicionário com meta tags extraídas (formato WhatsApp)
     """
+    page = None
     try:
         # Se for YouTube, usar extração específica (thumbnail direta)
         if is_youtube_url(url):
@@ -317,49 +344,25 @@ def extract_seo_meta_tags(url):
         
         # AliExpress: requisição mínima como "curl simples" (só UA + Accept) para receber og:tags
         use_browser_ua = is_aliexpress_url(url)
-        if use_browser_ua:
-            print(f"🛒 [ALIEXPRESS] Extraindo meta tags (request tipo curl): {url}")
-        else:
-            print(f"🔍 [WHATSAPP STYLE] Extraindo meta tags de: {url}")
+        log.info("Extraindo meta tags" + (" (request tipo curl)" if use_browser_ua else ""), extra={'url': url})
         
         # AliExpress: headers mínimos = mesmo que curl -L (só User-Agent browser + Accept)
         if use_browser_ua:
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
-            }
             proxies = get_proxies_for_url(url)
             if proxies:
-                print("🛡️ [ALIEXPRESS] Usando proxy configurado (PROXY_*)")
+                log.debug("Usando proxy configurado (PROXY_*) para o AliExpress")
             else:
-                print("⚠️ [ALIEXPRESS] Sem proxy (defina PROXY_HOST e PROXY_USER no Heroku para IP residencial)")
-            response = requests.get(url, headers=headers, timeout=15, allow_redirects=True, proxies=proxies)
+                log.warning("AliExpress sem proxy (defina PROXY_HOST e PROXY_USER no Heroku para IP residencial)")
+            page = fetch_page_head(url, 'aliexpress', timeout=15, proxies=proxies)
         else:
-            user_agent = 'WhatsApp/2.23.24.81 (iPhone; iOS 17.1.2; Scale/3.00)'
-            headers = {
-                'User-Agent': user_agent,
-                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
-                'Accept-Language': 'pt-BR,pt;q=0.9,en;q=0.8',
-                'Accept-Encoding': 'gzip, deflate, br',
-                'Connection': 'keep-alive',
-                'Upgrade-Insecure-Requests': '1',
-                'Cache-Control': 'no-cache',
-                'Pragma': 'no-cache'
-            }
             url = normalize_mercado_livre_url(url)
             proxies = get_proxies_for_url(url)
             if proxies:
-                print("🛡️ [SEO] Usando proxy para Mercado Livre")
-            try:
-                response = requests.get(url, headers=headers, timeout=10, allow_redirects=True, proxies=proxies)
-            except requests.exceptions.SSLError:
-                print("♻️ [SEO] Re-tentando sem keep-alive por SSLError")
-                headers_retry = dict(headers)
-                headers_retry['Connection'] = 'close'
-                response = requests.get(url, headers=headers_retry, timeout=10, allow_redirects=True, proxies=proxies)
-        response.raise_for_status()
+                log.debug("Usando proxy para Mercado Livre")
+            page = fetch_page_head(url, 'whatsapp', timeout=10, proxies=proxies)
         
-        soup = BeautifulSoup(response.content, 'html.parser')
+        # Meta tags ficam no <head>; se o limite de bytes cortou o head, vale o trecho lido
+        soup = BeautifulSoup(page.head, 'html.parser')
         
         # 1. PRIORIDADE: Open Graph tags (como WhatsApp prefere)
         og_title = None
@@ -412,6 +415,10 @@ def extract_seo_meta_tags(url):
         # 4. FALLBACK: Primeira imagem se não houver meta image
         fallback_image = None
         if not og_image and not twitter_image:
+            # Só agora o corpo é necessário: continuar a leitura do mesmo stream
+            if not page.complete:
+                log.debug("Sem meta image, lendo o corpo da página para buscar <img>")
+                soup = BeautifulSoup(page.read_all(), 'html.parser')
             for img in soup.find_all('img'):
                 src = img.get('src') or img.get('data-src') or img.get('data-lazy-src')
                 if src:
@@ -447,19 +454,18 @@ def extract_seo_meta_tags(url):
             'status': 'success'
         }
         
-        style_label = 'ALIEXPRESS' if use_browser_ua else 'WHATSAPP STYLE'
-        print(f"✅ [{style_label}] Extraído:")
-        print(f"  📄 Título: {final_title[:80]}{'...' if len(final_title) > 80 else ''}")
-        print(f"  📝 Descrição: {final_description[:80]}{'...' if len(final_description) > 80 else ''}")
-        print(f"  🖼️ Imagem: {final_image[:80] if final_image else 'N/A'}{'...' if final_image and len(final_image) > 80 else ''}")
-        print(f"  🔍 Fonte: {result['source']}")
+        log.info("Meta tags extraídas", extra={'source': result['source'], 'title': final_title[:80],
+                                               'image': final_image})
         
         return result
         
     except Exception as e:
-        print(f"❌ [SEO] Erro: {str(e)}")
+        log.warning(f"Erro ao extrair meta tags: {e}", extra={'url': url})
         return {
             'url': url,
             'status': 'error',
             'error': str(e)
         }
+    finally:
+        if page:
+            page.close()
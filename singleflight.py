@@ -0,0 +1,60 @@
+"""
+Coalescência de requisições idênticas em andamento (single-flight)
+Quando várias requisições chegam ao mesmo tempo para a mesma chave
+(endpoint + URL canônica), o extrator roda uma única vez e o resultado
+(ou o erro) é repassado para todas as requisições que estavam esperando.
+"""
+
+import asyncio
+
+
+class SingleFlight:
+    """Agrupa chamadas assíncronas concorrentes com a mesma chave"""
+
+    def __init__(self):
+        self._inflight = {}
+        self._waiters = {}
+        self._stats = {'leaders': 0, 'coalesced': 0, 'max_waiters': 0}
+
+    async def do(self, key, factory):
+        """
+        Executa factory() uma vez por chave em andamento
+
+        Args:
+            key: Chave da operação
+            factory: Função sem argumentos que retorna a corrotina a executar
+
+        Returns:
+            tuple: (resultado, coalesced) - coalesced=True se a chamada pegou carona
+        """
+        task = self._inflight.get(key)
+        coalesced = task is not None
+        if coalesced:
+            self._stats['coalesced'] += 1
+            self._waiters[key] += 1
+            self._stats['max_waiters'] = max(self._stats['max_waiters'], self._waiters[key])
+        else:
+            self._stats['leaders'] += 1
+            # A tarefa é independente de quem a iniciou: se o cliente líder
+            # desconectar, as demais requisições continuam recebendo o resultado
+            task = asyncio.ensure_future(factory())
+            self._inflight[key] = task
+            self._waiters[key] = 1
+            task.add_done_callback(lambda _task, _key=key: self._finish(_key, _task))
+
+        return await asyncio.shield(task), coalesced
+
+    def _finish(self, key, task):
+        self._inflight.pop(key, None)
+        self._waiters.pop(key, None)
+        # Marcar a exceção como consumida mesmo que todos os clientes tenham desconectado
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self):
+        """Retorna métricas de coalescência"""
+        stats = dict(self._stats)
+        stats['inflight'] = len(self._inflight)
+        total = stats['leaders'] + stats['coalesced']
+        stats['coalesced_ratio'] = round(stats['coalesced'] / total, 3) if total else 0.0
+        return stats
@@ -0,0 +1,277 @@
+"""
+Registro das regras por loja
+Montado uma única vez na importação e consultado por todos os extratores:
+- Detecção da loja pelo host (rótulos do domínio) com fallback por substring
+- Filtro de imagens com padrões de inclusão/exclusão pré-compilados
+- Pesos de score por loja (dados, em vez de uma escada de if/elif)
+- Perfil de headers, política de proxy, seletores de prontidão da página,
+  se a loja publica dados estruturados (JSON-LD, __NEXT_DATA__...) e os
+  recursos bloqueados no Chrome
+"""
+
+import os
+import re
+from urllib.parse import urlparse
+
+# Política de proxy por loja
+PROXY_ALWAYS = 'always'   # sempre via proxy (credenciais padrão quando PROXY_* ausente)
+PROXY_ENV = 'env'         # só quando PROXY_HOST/PROXY_USER estiver configurado
+
+# Exclusões comuns a todas as lojas (ícones, sprites, elementos de interface...)
+IMAGE_EXCLUDE_PATTERNS = [
+    'logo', 'icon', 'sprite', 'banner', 'ad', 'social',
+    'favicon', 'avatar', 'profile', 'thumb', 'small',
+    'transparent-pixel', 'grey-pixel', 'swatch-image',
+    'cr-lightbox', 'review-image', 'community-reviews',
+    'attach-accessory', 'button-icon', 'media-cheveron',
+    'loading', 'placeholder', 'no-image', 'blank',
+    'star', 'rating', 'review', 'coupon', 'discount',
+    'arrow', 'chevron', 'close', 'menu', 'hamburger',
+    'search', 'filter', 'sort', 'pagination',
+    'vlibras', 'accessibility', 'a11y', 'libras',
+    # Tamanhos de ícone
+    '16x16', '24x24', '32x32', '48x48', '64x64',
+]
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+
+
+def compile_substrings(patterns):
+    """Compila uma lista de substrings em uma única regex (None se vazia)"""
+    if not patterns:
+        return None
+    return re.compile('|'.join(re.escape(p.lower()) for p in patterns))
+
+
+IMAGE_EXCLUDE_RE = compile_substrings(IMAGE_EXCLUDE_PATTERNS)
+
+
+class StoreRule:
+    """Regras de uma loja (detecção, filtro de imagens, score e acesso)"""
+
+    def __init__(self, key, name, host_labels, include_patterns=(), score_weights=(),
+                 header_profile='browser', proxy_policy=None, readiness_selectors=(),
+                 structured_data=False, blocked_url_patterns=()):
+        self.key = key
+        self.name = name
+        self.host_labels = tuple(host_labels)
+        self.include_patterns = tuple(include_patterns)
+        self.include_re = compile_substrings(self.include_patterns)
+        # Pares (substring, pontos) somados quando a URL contém a substring
+        self.score_weights = tuple((pattern.lower(), points) for pattern, points in score_weights)
+        self.header_profile = header_profile
+        self.proxy_policy = proxy_policy
+        self.readiness_selectors = list(readiness_selectors)
+        # A loja publica o produto em JSON-LD/__NEXT_DATA__/__PRELOADED_STATE__
+        self.structured_data = structured_data
+        # Padrões extras bloqueados no Chrome (Network.setBlockedURLs): rastreadores
+        # da própria loja e caminhos de imagem sem extensão
+        self.blocked_url_patterns = list(blocked_url_patterns)
+
+    def matches_include(self, src_lower):
+        return bool(self.include_re and self.include_re.search(src_lower))
+
+    def score_url(self, url_lower):
+        return sum(points for pattern, points in self.score_weights if pattern in url_lower)
+
+    def __repr__(self):
+        return f"StoreRule({self.key!r})"
+
+
+STORE_RULES = [
+    StoreRule(
+        'mercadolivre', 'Mercado Livre',
+        host_labels=['mercadolivre', 'mercadolibre', 'mlstatic'],
+        include_patterns=[
+            'http2.mlstatic.com/', 'http2.mlstatic.com/D_', 'mlstatic.com/',
+            'product', 'produto', 'mercadolivre',
+        ],
+        score_weights=[('http2.mlstatic.com/D_', 30), ('mlstatic.com/', 25), ('product', 20)],
+        header_profile='mercadolivre',
+        proxy_policy=PROXY_ALWAYS,
+        readiness_selectors=['.ui-pdp-gallery__figure img', 'h1.ui-pdp-title'],
+        structured_data=True,
+    ),
+    StoreRule(
+        'amazon', 'Amazon',
+        host_labels=['amazon', 'amzn', 'media-amazon', 'ssl-images-amazon'],
+        include_patterns=[
+            'images-na.ssl-images-amazon.com/images/', 'images.amazon.com/images/',
+            'm.media-amazon.com/images/', 'product', 'prod', 'amazon',
+        ],
+        score_weights=[
+            ('images-na.ssl-images-amazon.com/images/', 30),
+            ('m.media-amazon.com/images/', 30),
+            ('product', 25),
+        ],
+        header_profile='amazon',
+        readiness_selectors=['#altImages img', '#landingImage', '#productTitle'],
+        blocked_url_patterns=['*amazon-adsystem.com*', '*fls-na.amazon.com*', '*unagi.amazon.com*'],
+    ),
+    StoreRule(
+        'shopee', 'Shopee',
+        host_labels=['shopee'],
+        include_patterns=[
+            'cf.shopee.com.br/', 'shopee.com.br/arquivos/', 'shopee.com.br/images/',
+            'deo.shopeemobile.com/', 'down-br.img.susercontent.com/',
+            'down-cvs-br.img.susercontent.com/', 'img.susercontent.com/', 'susercontent.com/',
+            'product', 'produto', 'shopee',
+        ],
+        score_weights=[('shopee.com.br/arquivos/', 30), ('product', 25)],
+        readiness_selectors=['[class*="product-briefing"] img', 'picture img'],
+        blocked_url_patterns=['*susercontent.com/file/*', '*shopee.com.br/__t__*'],
+    ),
+    StoreRule(
+        'aliexpress', 'AliExpress',
+        host_labels=['aliexpress'],
+        include_patterns=[
+            'ae01.alicdn.com/kf/', 'ae02.alicdn.com/kf/', 'ae03.alicdn.com/kf/', 'ae04.alicdn.com/kf/',
+            'product', 'prod', 'item', 'aliexpress',
+        ],
+        score_weights=[('ae01.alicdn.com/kf/', 30), ('product', 25)],
+        proxy_policy=PROXY_ENV,
+        readiness_selectors=['[class*="slider--img"] img', '[class*="magnifier--image"]', 'h1[data-pl="product-title"]'],
+        blocked_url_patterns=['*mmstat.com*', '*arms-retcode.aliyuncs.com*'],
+    ),
+    StoreRule(
+        'shein', 'Shein',
+        host_labels=['shein'],
+        include_patterns=[
+            'img.ltwebstatic.com/images3_ccc/', 'sheinm.ltwebstatic.com/pwa_dist/images/',
+            'product', 'produto', 'shein',
+        ],
+        score_weights=[('img.ltwebstatic.com/images3_ccc/', 30), ('product', 25)],
+        readiness_selectors=['.product-intro__head-name', '.crop-image-container img'],
+        structured_data=True,
+    ),
+    StoreRule(
+        'magazineluiza', 'Magazine Luiza',
+        host_labels=['magalu', 'magazineluiza'],
+        structured_data=True,
+    ),
+    StoreRule(
+        'kabum', 'Kabum',
+        host_labels=['kabum'],
+        include_patterns=[
+            'images.kabum.com.br/produtos/fotos/', 'kabum.com.br/produtos/fotos/', 'kabum.com.br',
+            'product', 'produto', 'kabum',
+        ],
+        score_weights=[('images.kabum.com.br/produtos/fotos/', 30), ('kabum.com.br', 25), ('product', 25)],
+        header_profile='kabum',
+        readiness_selectors=['figure img[src*="/produtos/fotos/"]', '[class*="gallery"] img[src*="/produtos/fotos/"]'],
+        structured_data=True,
+    ),
+    StoreRule(
+        'americanas', 'Americanas',
+        host_labels=['americanas'],
+        include_patterns=[
+            'americanas.vtexassets.com/arquivos/ids/', 'vtexassets.com/arquivos/ids/',
+            'product', 'produto', 'americanas',
+        ],
+        score_weights=[('americanas.vtexassets.com/arquivos/ids/', 30), ('product', 25)],
+        readiness_selectors=['[class*="product-image"] img', 'img[class*="productImageTag"]'],
+        structured_data=True,
+    ),
+    StoreRule(
+        'casasbahia', 'Casas Bahia',
+        host_labels=['casasbahia'],
+        include_patterns=[
+            'casasbahia.com.br/arquivos/ids/', 'vtexassets.com/arquivos/ids/',
+            'product', 'produto', 'casasbahia',
+        ],
+        score_weights=[('casasbahia.com.br/arquivos/ids/', 30), ('product', 25)],
+        readiness_selectors=['[class*="product-image"] img', 'img[class*="productImageTag"]'],
+        structured_data=True,
+    ),
+]
+
+GENERIC_RULE = StoreRule('generic', 'Generic', host_labels=[])
+
+RULES_BY_KEY = {rule.key: rule for rule in STORE_RULES}
+RULES_BY_NAME = {rule.name: rule for rule in STORE_RULES}
+_RULES_BY_LABEL = {label: rule for rule in STORE_RULES for label in rule.host_labels}
+# Fallback: rótulo em qualquer parte da URL (ex.: host sem esquema, URL de CDN)
+_FALLBACK_RE = re.compile('|'.join(
+    f'(?P<{rule.key}>' + '|'.join(re.escape(label) for label in rule.host_labels) + ')'
+    for rule in STORE_RULES
+))
+
+
+def _host_of(url):
+    try:
+        return (urlparse(url).hostname or '').lower()
+    except Exception:
+        return ''
+
+
+def lookup_store(url):
+    """
+    Retorna a StoreRule da URL (GENERIC_RULE se nenhuma loja for reconhecida)
+
+    Procura primeiro pelos rótulos do host (www.amazon.com.br -> 'amazon');
+    se nenhum rótulo bater, procura os rótulos em qualquer parte da URL.
+    """
+    url_lower = (url or '').lower()
+    host = _host_of(url_lower)
+    for label in host.split('.'):
+        rule = _RULES_BY_LABEL.get(label)
+        if rule is not None:
+            return rule
+    match = _FALLBACK_RE.search(url_lower)
+    if match:
+        return RULES_BY_KEY[match.lastgroup]
+    return GENERIC_RULE
+
+
+def rule_for_store(store_name):
+    """Retorna a StoreRule pelo nome de exibição (ex.: 'Mercado Livre')"""
+    return RULES_BY_NAME.get(store_name, GENERIC_RULE)
+
+
+def _default_proxy():
+    """Proxy padrão (credenciais do PROXY_* com valores padrão)"""
+    host = os.getenv('PROXY_HOST', 'proxy.smartproxy.net')
+    port = int(os.getenv('PROXY_PORT', '3120'))
+    username = os.getenv('PROXY_USER', 'smart-rsrg25meix8s_area-BR_city-aracruz')
+    password = os.getenv('PROXY_PASS', 'OGf8dvp75MD79qUN')
+    proxy_url = f"http://{username}:{password}@{host}:{port}"
+    return {'http': proxy_url, 'https': proxy_url}
+
+
+def proxy_from_env():
+    """Retorna dict de proxy se PROXY_HOST ou PROXY_USER estiver configurado."""
+    host = os.getenv('PROXY_HOST')
+    username = os.getenv('PROXY_USER')
+    if not host and not username:
+        return None
+    try:
+        host = host or 'proxy.smartproxy.net'
+        port = int(os.getenv('PROXY_PORT', '3120'))
+        username = username or ''
+        password = os.getenv('PROXY_PASS', '')
+        proxy_url = f"http://{username}:{password}@{host}:{port}" if username else f"http://{host}:{port}"
+        return {'http': proxy_url, 'https': proxy_url}
+    except Exception:
+        return None
+
+
+def proxies_for(url, store_name=None):
+    """
+    Proxies para requests conforme a política da loja
+
+    Args:
+        url (str): URL da requisição
+        store_name (str, optional): Nome da loja (tem precedência sobre a URL)
+
+    Returns:
+        dict | None: Proxies no formato do requests
+    """
+    try:
+        rule = RULES_BY_NAME.get(store_name) or lookup_store(url)
+        if rule.proxy_policy == PROXY_ENV:
+            return proxy_from_env()
+        if rule.proxy_policy == PROXY_ALWAYS:
+            return _default_proxy()
+        return None
+    except Exception:
+        return None
@@ -0,0 +1,240 @@
+"""
+Corrida de estratégias de extração com hedge
+Em vez de uma cadeia estritamente sequencial (uma falha lenta no início soma
+todo o seu timeout à resposta), cada estratégia começa após um atraso de
+hedge configurável — ou imediatamente, se todas as já iniciadas falharam.
+O primeiro resultado completo vence e as demais são canceladas (o Chrome da
+estratégia perdedora é fechado pelo gancho de cancelamento).
+"""
+
+import os
+import json
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+from metrics import stage
+from structured_logging import get_logger
+
+log = get_logger('hedge')
+
+HEDGE_WORKERS = int(os.getenv('HEDGE_WORKERS', '16'))
+# Prazo global da corrida em segundos (0 = sem prazo além do timeout do executor)
+HEDGE_DEADLINE = float(os.getenv('HEDGE_DEADLINE', '0'))
+# Quantidade mínima de imagens para o resultado de uma estratégia ser considerado completo
+HEDGE_MIN_IMAGES = int(os.getenv('HEDGE_MIN_IMAGES', '3'))
+
+# Políticas por loja (chave do registro de lojas): [(estratégia, atraso de hedge em segundos)]
+IMAGE_HEDGE_POLICIES = {
+    'default': [('structured', 0.0), ('selenium', 1.5), ('requests', 4.0), ('seo', 8.0)],
+    'mercadolivre': [('requests', 0.0), ('seo', 6.0)],
+    'amazon': [('amazon_http', 0.0), ('selenium', 6.0), ('seo', 12.0)],
+    'shopee': [('selenium', 0.0), ('seo', 10.0)],
+    'aliexpress': [('selenium', 0.0), ('seo', 8.0)],
+}
+PRODUCT_HEDGE_POLICIES = {
+    'default': [('generic', 0.0)],
+    'mercadolivre': [('ml_api', 0.0), ('ml_html', 2.0), ('generic', 6.0)],
+    'amazon': [('amazon_http', 0.0), ('amazon', 6.0), ('generic', 15.0)],
+}
+
+
+def _load_policy_overrides(env_name, policies):
+    """Sobrescreve políticas via JSON no env, ex.: {"amazon": [["selenium", 0], ["requests", 3]]}"""
+    raw = os.getenv(env_name)
+    if not raw:
+        return policies
+    try:
+        overrides = {key: [(name, float(delay)) for name, delay in steps] for key, steps in json.loads(raw).items()}
+    except (ValueError, TypeError) as e:
+        log.warning(f"{env_name} inválido, usando políticas padrão: {e}")
+        return policies
+    return {**policies, **overrides}
+
+
+IMAGE_HEDGE_POLICIES = _load_policy_overrides('IMAGE_HEDGE_POLICIES', IMAGE_HEDGE_POLICIES)
+PRODUCT_HEDGE_POLICIES = _load_policy_overrides('PRODUCT_HEDGE_POLICIES', PRODUCT_HEDGE_POLICIES)
+
+
+def policy_for(policies, store_key):
+    """Política da loja (ou a padrão)"""
+    return policies.get(store_key) or policies['default']
+
+
+class CancelToken:
+    """Sinal de cancelamento de uma estratégia, com ganchos (ex.: fechar o Chrome)"""
+
+    def __init__(self):
+        self._cancelled = False
+        self._callbacks = []
+        # Os ganchos rodam segurando o lock: guard() só sai depois que o gancho terminou
+        self._lock = threading.RLock()
+
+    @property
+    def cancelled(self):
+        return self._cancelled
+
+    @contextmanager
+    def guard(self, callback):
+        """
+        Registra um gancho de cancelamento válido apenas dentro do bloco
+
+        Se a estratégia já foi cancelada, o gancho roda na entrada. Ao sair do
+        bloco o gancho é removido (ex.: o driver já voltou ao pool e não pode
+        mais ser fechado por esta estratégia).
+        """
+        with self._lock:
+            if self._cancelled:
+                _run_callback(callback)
+            else:
+                self._callbacks.append(callback)
+        try:
+            yield self
+        finally:
+            with self._lock:
+                if callback in self._callbacks:
+                    self._callbacks.remove(callback)
+
+    def cancel(self):
+        with self._lock:
+            if self._cancelled:
+                return
+            self._cancelled = True
+            callbacks, self._callbacks = self._callbacks, []
+            for callback in callbacks:
+                _run_callback(callback)
+
+
+def _run_callback(callback):
+    try:
+        callback()
+    except Exception as e:
+        log.warning(f"Erro no gancho de cancelamento: {e}")
+
+
+class Strategy:
+    """
+    Estratégia da corrida: fn(token) -> resultado (None/vazio = falha)
+
+    Uma estratégia que desiste sem tentar (ex.: outra já leu a página) cancela
+    o próprio token: como as perdedoras canceladas, ela não entra nos statuses.
+    """
+
+    def __init__(self, name, fn, delay=0.0):
+        self.name = name
+        self.fn = fn
+        self.delay = delay
+
+
+class RaceOutcome:
+    """Resultado da corrida"""
+
+    def __init__(self, winner, result, results, timings, complete, statuses):
+        self.winner = winner        # nome da estratégia escolhida (ou None)
+        self.result = result        # resultado da estratégia escolhida
+        self.results = results      # resultados de todas as estratégias que terminaram
+        self.timings = timings      # segundos de cada estratégia que terminou
+        self.complete = complete    # o vencedor atingiu o critério de completude
+        self.statuses = statuses    # 'complete', 'usable' ou 'failed' de cada estratégia que terminou sem ser cancelada
+
+
+_race_executor = ThreadPoolExecutor(max_workers=HEDGE_WORKERS, thread_name_prefix='hedge')
+
+
+def race(strategies, is_complete, is_usable=bool, deadline=None, store=''):
+    """
+    Executa as estratégias com hedge e devolve a primeira completa
+
+    Args:
+        strategies (list): Strategy em ordem de preferência (atrasos crescentes)
+        is_complete: Função resultado -> bool (critério para vencer e cancelar as demais)
+        is_usable: Função resultado -> bool (aceitável se nenhuma ficar completa)
+        deadline (float, optional): Prazo global em segundos (padrão: HEDGE_DEADLINE)
+        store (str, optional): Rótulo da loja nas métricas de cada estratégia
+
+    Returns:
+        RaceOutcome
+    """
+    deadline = HEDGE_DEADLINE if deadline is None else deadline
+    pending = sorted(strategies, key=lambda s: s.delay)
+    tokens = {s.name: CancelToken() for s in strategies}
+    condition = threading.Condition()
+    results, statuses, timings, finish_order, started = {}, {}, {}, [], []
+    start = time.monotonic()
+
+    def run(strategy):
+        began = time.monotonic()
+        token = tokens[strategy.name]
+        with stage('strategy', store=store, strategy=strategy.name) as timer:
+            try:
+                result = strategy.fn(token)
+                status = 'complete' if is_complete(result) else 'usable' if is_usable(result) else 'failed'
+            except Exception as e:
+                if not token.cancelled:
+                    log.warning(f"Estratégia '{strategy.name}' falhou: {e}", extra={'store': store, 'strategy': strategy.name})
+                result, status = None, 'failed'
+            if token.cancelled:
+                status = 'cancelled'
+            timer.outcome = status
+        with condition:
+            results[strategy.name] = result
+            statuses[strategy.name] = status
+            timings[strategy.name] = round(time.monotonic() - began, 3)
+            finish_order.append(strategy.name)
+            condition.notify_all()
+
+    winner = None
+    checked = 0
+    with condition:
+        while True:
+            for name in finish_order[checked:]:
+                if statuses[name] == 'complete':
+                    winner = name
+                    break
+            checked = len(finish_order)
+            if winner:
+                break
+
+            elapsed = time.monotonic() - start
+            # Iniciar as estratégias vencidas; se todas as iniciadas já falharam, não esperar o atraso
+            while pending and (pending[0].delay <= elapsed or len(finish_order) == len(started)):
+                strategy = pending.pop(0)
+                started.append(strategy.name)
+                if strategy.delay > 0:
+                    log.info(f"Iniciando '{strategy.name}' após {elapsed:.2f}s", extra={'store': store, 'strategy': strategy.name})
+                context = contextvars.copy_context()
+                _race_executor.submit(context.run, run, strategy)
+            if not pending and len(finish_order) == len(started):
+                break
+
+            waits = []
+            if pending:
+                waits.append(pending[0].delay - elapsed)
+            if deadline:
+                remaining = deadline - elapsed
+                if remaining <= 0:
+                    log.warning(f"Prazo de {deadline:g}s esgotado", extra={'store': store})
+                    break
+                waits.append(remaining)
+            condition.wait(max(0.0, min(waits)) if waits else None)
+
+        # Canceladas (pela própria estratégia) não contam como tentativa
+        finished = {name: result for name, result in results.items() if statuses[name] != 'cancelled'}
+        finished_statuses = {name: statuses[name] for name in finished}
+        # Cancelar as perdedoras ainda em andamento
+        losers = [name for name in started if name not in finished]
+
+    for name in losers:
+        log.info(f"Cancelando '{name}'", extra={'store': store, 'strategy': name})
+        tokens[name].cancel()
+
+    complete = winner is not None
+    if winner is None:
+        # Nenhuma completa: a primeira aceitável na ordem de preferência
+        winner = next((s.name for s in strategies if finished_statuses.get(s.name) == 'usable'), None)
+    if winner:
+        log.info(f"Vencedora: '{winner}' em {time.monotonic() - start:.2f}s ({'completa' if complete else 'parcial'})",
+                 extra={'store': store, 'strategy': winner, 'complete': complete, 'timings': dict(timings)})
+    return RaceOutcome(winner, finished.get(winner), finished, dict(timings), complete, finished_statuses)
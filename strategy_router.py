@@ -0,0 +1,199 @@
+"""
+Roteamento adaptativo de estratégias por host
+Cada corrida registra, por host e estratégia, se o resultado foi aceitável,
+se foi completo e quanto tempo levou (médias móveis exponenciais, para que
+mudanças recentes pesem mais). Com amostras suficientes, a política estática
+da loja é reordenada (estratégias mais completas e rápidas primeiro, herdando
+os menores atrasos de hedge) e as que quase nunca funcionam no host são
+puladas. Uma fração das requisições explora a política original, para que
+uma estratégia que voltou a funcionar seja promovida de novo.
+"""
+
+import os
+import time
+import random
+import threading
+from collections import OrderedDict
+from urllib.parse import urlparse
+
+from cache import SQLiteCache
+from structured_logging import get_logger
+
+log = get_logger('router')
+
+# Peso da amostra nova nas médias móveis
+ROUTER_ALPHA = float(os.getenv('ROUTER_ALPHA', '0.2'))
+# Amostras mínimas antes de reordenar/pular uma estratégia no host
+ROUTER_MIN_SAMPLES = int(os.getenv('ROUTER_MIN_SAMPLES', '5'))
+# Taxa de sucesso abaixo da qual a estratégia é pulada no host
+ROUTER_SKIP_BELOW = float(os.getenv('ROUTER_SKIP_BELOW', '0.1'))
+# Fração das requisições que usa a política original (exploração)
+ROUTER_EXPLORE_RATE = float(os.getenv('ROUTER_EXPLORE_RATE', '0.1'))
+ROUTER_MAX_HOSTS = int(os.getenv('ROUTER_MAX_HOSTS', '1024'))
+# Caminho do SQLite (vazio = só memória) e validade das estatísticas gravadas
+STRATEGY_ROUTER_DB = os.getenv('STRATEGY_ROUTER_DB', '')
+STRATEGY_ROUTER_TTL = int(os.getenv('STRATEGY_ROUTER_TTL', str(7 * 86400)))
+
+# Nota neutra de estratégias ainda sem amostras suficientes
+NEUTRAL_SCORE = 0.5
+
+
+def host_of(url):
+    """Host da URL sem 'www.' (chave do roteamento)"""
+    host = (urlparse(url).hostname or '').lower()
+    return host[4:] if host.startswith('www.') else host
+
+
+class StrategyStats:
+    """Médias móveis de uma estratégia em um host"""
+
+    __slots__ = ('attempts', 'success_rate', 'complete_rate', 'latency_s', 'updated_at')
+
+    def __init__(self, attempts=0, success_rate=0.0, complete_rate=0.0, latency_s=0.0, updated_at=0.0):
+        self.attempts = attempts
+        self.success_rate = success_rate
+        self.complete_rate = complete_rate
+        self.latency_s = latency_s
+        self.updated_at = updated_at
+
+    def update(self, success, complete, latency_s):
+        # A primeira amostra define a média; as seguintes entram com peso ROUTER_ALPHA
+        alpha = 1.0 if self.attempts == 0 else ROUTER_ALPHA
+        self.attempts += 1
+        self.success_rate += alpha * (float(success) - self.success_rate)
+        self.complete_rate += alpha * (float(complete) - self.complete_rate)
+        self.latency_s += alpha * (latency_s - self.latency_s)
+        self.updated_at = time.time()
+
+    def to_dict(self):
+        return {
+            'attempts': self.attempts,
+            'success_rate': round(self.success_rate, 3),
+            'complete_rate': round(self.complete_rate, 3),
+            'latency_s': round(self.latency_s, 3),
+            'updated_at': self.updated_at,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**{key: data[key] for key in cls.__slots__ if key in data})
+
+
+class StrategyRouter:
+    """Tabela host -> estratégia -> StrategyStats, com camada opcional em SQLite"""
+
+    def __init__(self, db_path=STRATEGY_ROUTER_DB, max_hosts=ROUTER_MAX_HOSTS):
+        self.max_hosts = max_hosts
+        self._hosts = OrderedDict()
+        self._lock = threading.Lock()
+        self.plans = 0
+        self.explorations = 0
+        self.skips = 0
+        self.disk = None
+        if db_path:
+            try:
+                self.disk = SQLiteCache(db_path, table='strategy_stats')
+            except Exception as e:
+                log.warning(f"SQLite indisponível ({db_path}): {e}")
+
+    def _host_table(self, host, strategies):
+        """Estatísticas do host (carregando do SQLite as estratégias ainda não vistas)"""
+        with self._lock:
+            table = self._hosts.get(host)
+            if table is None:
+                table = self._hosts[host] = {}
+                if len(self._hosts) > self.max_hosts:
+                    self._hosts.popitem(last=False)
+            else:
+                self._hosts.move_to_end(host)
+            missing = [name for name in strategies if name not in table]
+        if self.disk is None or not missing:
+            return table
+        for name in missing:
+            try:
+                item = self.disk.get(f"{host}|{name}")
+            except Exception as e:
+                log.warning(f"Erro lendo SQLite: {e}")
+                break
+            with self._lock:
+                table.setdefault(name, StrategyStats.from_dict(item[0]) if item else StrategyStats())
+        return table
+
+    def plan(self, url, policy):
+        """
+        Reordena a política da loja conforme o histórico do host
+
+        Args:
+            url (str): URL da extração
+            policy (list): [(estratégia, atraso)] da política estática
+
+        Returns:
+            list: [(estratégia, atraso)] — os atrasos da política são redistribuídos
+                  na nova ordem (a primeira estratégia herda o menor atraso)
+        """
+        host = host_of(url)
+        table = self._host_table(host, [name for name, _ in policy])
+        with self._lock:
+            self.plans += 1
+            if random.random() < ROUTER_EXPLORE_RATE:
+                self.explorations += 1
+                return list(policy)
+
+            ranked, skipped = [], []
+            for index, (name, _) in enumerate(policy):
+                stats = table.get(name)
+                if stats is None or stats.attempts < ROUTER_MIN_SAMPLES:
+                    ranked.append(((-NEUTRAL_SCORE, float('inf'), index), name))
+                elif stats.success_rate < ROUTER_SKIP_BELOW:
+                    skipped.append(name)
+                else:
+                    ranked.append(((-round(stats.complete_rate, 1), stats.latency_s, index), name))
+            if not ranked:
+                # Nada funciona no host: manter a política original
+                return list(policy)
+            self.skips += len(skipped)
+
+        ranked.sort()
+        delays = sorted(delay for _, delay in policy)
+        planned = [(name, delays[position]) for position, (_, name) in enumerate(ranked)]
+        if skipped or [name for name, _ in planned] != [name for name, _ in policy]:
+            log.info(f"{host}: {', '.join(f'{n}@{d:g}s' for n, d in planned)}"
+                     + (f" (puladas: {', '.join(skipped)})" if skipped else ''))
+        return planned
+
+    def record(self, url, strategy, success, complete, latency_s):
+        """Registra o resultado de uma estratégia no host"""
+        host = host_of(url)
+        table = self._host_table(host, [strategy])
+        with self._lock:
+            stats = table.setdefault(strategy, StrategyStats())
+            stats.update(success, complete, latency_s)
+            snapshot = stats.to_dict()
+        if self.disk is not None:
+            try:
+                self.disk.set(f"{host}|{strategy}", snapshot, STRATEGY_ROUTER_TTL)
+            except Exception as e:
+                log.warning(f"Erro gravando SQLite: {e}")
+
+    def record_outcome(self, url, outcome):
+        """Registra as estratégias que terminaram na corrida (as canceladas não contam)"""
+        for name, status in outcome.statuses.items():
+            self.record(url, name, status != 'failed', status == 'complete', outcome.timings.get(name, 0.0))
+
+    def table(self):
+        """Tabela aprendida (host -> estratégia -> estatísticas) e contadores"""
+        with self._lock:
+            hosts = {host: {name: stats.to_dict() for name, stats in table.items() if stats.attempts}
+                     for host, table in self._hosts.items()}
+            return {
+                'plans': self.plans,
+                'explorations': self.explorations,
+                'skips': self.skips,
+                'explore_rate': ROUTER_EXPLORE_RATE,
+                'min_samples': ROUTER_MIN_SAMPLES,
+                'disk_enabled': self.disk is not None,
+                'hosts': {host: table for host, table in hosts.items() if table},
+            }
+
+
+strategy_router = StrategyRouter()
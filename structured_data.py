@@ -0,0 +1,327 @@
+"""
+Extração de dados estruturados embutidos na página
+A maioria das lojas publica o produto (título, preço e a lista de imagens em
+resolução cheia) em JSON dentro do HTML:
+- <script type="application/ld+json"> (schema.org Product)
+- <script id="__NEXT_DATA__"> (Next.js: Magalu, Kabum...)
+- __PRELOADED_STATE__ (Mercado Livre, VTEX)
+
+Os blocos são localizados direto nos bytes da resposta, sem montar a árvore
+do BeautifulSoup, e convertidos em um dict de produto comum.
+"""
+
+import re
+import json
+from collections import deque
+from urllib.parse import urljoin
+
+from structured_logging import get_logger
+
+log = get_logger('structured')
+
+_JSON_LD_RE = re.compile(
+    rb'<script[^>]*type\s*=\s*["\']application/ld\+json["\'][^>]*>(.*?)</script\s*>', re.I | re.S
+)
+_SCRIPT_JSON_BY_ID_RE = re.compile(
+    rb'<script[^>]*id\s*=\s*["\'](__NEXT_DATA__|__PRELOADED_STATE__)["\'][^>]*>(.*?)</script\s*>', re.I | re.S
+)
+_ASSIGNED_STATE_RE = re.compile(rb'(?:window\.)?__PRELOADED_STATE__\s*=\s*', re.I)
+
+# Placeholders de tamanho usados por CDNs (ex.: Magalu "{w}x{h}")
+_SIZE_PLACEHOLDER_RE = re.compile(r'\{w\}x\{h\}', re.I)
+STRUCTURED_IMAGE_SIZE = '1500x1500'
+
+# Chaves usadas para localizar o produto em estados de aplicação (Next.js, Redux...)
+_TITLE_KEYS = ('name', 'title')
+_PRICE_KEYS = ('price', 'bestPrice', 'salePrice', 'priceInfo', 'offers', 'prices')
+_IMAGE_KEYS = ('images', 'pictures', 'image', 'media', 'medias', 'gallery', 'photos')
+_IMAGE_URL_KEYS = ('url', 'src', 'secure_url', 'contentUrl', 'imageUrl', 'zoom', 'original', 'large')
+_ORIGINAL_PRICE_KEYS = ('original_price', 'originalPrice', 'listPrice', 'oldPrice', 'priceWithoutDiscount')
+
+# Limite de nós visitados ao percorrer estados muito grandes
+MAX_STATE_NODES = 20000
+
+
+def _decode(raw):
+    try:
+        return json.loads(raw.strip().decode('utf-8', errors='replace'))
+    except (ValueError, TypeError):
+        return None
+
+
+def _types_of(node):
+    value = node.get('@type') if isinstance(node, dict) else None
+    if isinstance(value, list):
+        return {str(v) for v in value}
+    return {str(value)} if value else set()
+
+
+def _iter_json_ld_nodes(data):
+    """Percorre os nós de um bloco JSON-LD (listas, @graph)"""
+    stack = [data]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            stack.extend(node)
+        elif isinstance(node, dict):
+            yield node
+            if '@graph' in node:
+                stack.append(node['@graph'])
+
+
+def _to_float(value):
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    cleaned = re.sub(r'[^\d.,]', '', str(value))
+    # Formato brasileiro (1.234,56)
+    if ',' in cleaned:
+        cleaned = cleaned.replace('.', '').replace(',', '.')
+    try:
+        return float(cleaned)
+    except ValueError:
+        return None
+
+
+def _image_urls(value, depth=0):
+    """Coleta URLs de imagem de string, lista ou objeto (ImageObject, {url: ...})"""
+    if depth > 4 or value is None:
+        return []
+    if isinstance(value, str):
+        return [value] if value.startswith(('http://', 'https://', '//')) else []
+    if isinstance(value, list):
+        urls = []
+        for item in value:
+            urls.extend(_image_urls(item, depth + 1))
+        return urls
+    if isinstance(value, dict):
+        for key in _IMAGE_URL_KEYS:
+            if key in value:
+                urls = _image_urls(value[key], depth + 1)
+                if urls:
+                    return urls
+        for key in _IMAGE_KEYS:
+            if key in value:
+                return _image_urls(value[key], depth + 1)
+    return []
+
+
+def _normalize_images(urls, base_url=None):
+    seen = set()
+    images = []
+    for url in urls:
+        url = _SIZE_PLACEHOLDER_RE.sub(STRUCTURED_IMAGE_SIZE, url.strip())
+        if url.startswith('//'):
+            url = 'https:' + url
+        elif base_url and not url.startswith('http'):
+            url = urljoin(base_url, url)
+        if url not in seen:
+            seen.add(url)
+            images.append(url)
+    return images
+
+
+def _empty_product(source):
+    return {
+        'title': None,
+        'price': None,
+        'original_price': None,
+        'currency': None,
+        'description': None,
+        'images': [],
+        'seller': None,
+        'rating': None,
+        'review_count': None,
+        'source': source,
+    }
+
+
+def _map_json_ld_product(node):
+    product = _empty_product('json_ld')
+    product['title'] = node.get('name')
+    product['description'] = node.get('description') if isinstance(node.get('description'), str) else None
+    product['images'] = _image_urls(node.get('image'))
+
+    offers = node.get('offers')
+    if isinstance(offers, list):
+        offers = offers[0] if offers else None
+    if isinstance(offers, dict):
+        product['price'] = _to_float(offers.get('price') or offers.get('lowPrice'))
+        product['currency'] = offers.get('priceCurrency')
+        seller = offers.get('seller')
+        if isinstance(seller, dict):
+            product['seller'] = seller.get('name')
+
+    rating = node.get('aggregateRating')
+    if isinstance(rating, dict):
+        product['rating'] = _to_float(rating.get('ratingValue'))
+        count = _to_float(rating.get('reviewCount') or rating.get('ratingCount'))
+        product['review_count'] = int(count) if count is not None else None
+
+    # ProductGroup: imagens das variantes quando o grupo não tem as suas
+    if not product['images'] and isinstance(node.get('hasVariant'), list):
+        for variant in node['hasVariant']:
+            if isinstance(variant, dict):
+                product['images'].extend(_image_urls(variant.get('image')))
+    return product
+
+
+def _price_from_state(value, depth=0):
+    if depth > 3:
+        return None
+    if isinstance(value, dict):
+        for key in ('bestPrice', 'salePrice', 'sellingPrice', 'price', 'value', 'amount'):
+            if key in value:
+                price = _price_from_state(value[key], depth + 1)
+                if price:
+                    return price
+        return None
+    if isinstance(value, list):
+        return _price_from_state(value[0], depth + 1) if value else None
+    return _to_float(value)
+
+
+def _looks_like_product(node):
+    has_title = any(isinstance(node.get(k), str) and node.get(k).strip() for k in _TITLE_KEYS)
+    has_price = any(k in node for k in _PRICE_KEYS)
+    has_images = any(k in node for k in _IMAGE_KEYS)
+    return has_title and has_price and has_images
+
+
+def _find_state_product(state):
+    """Busca em largura pelo primeiro objeto com cara de produto (título + preço + imagens)"""
+    queue = deque([state])
+    visited = 0
+    while queue and visited < MAX_STATE_NODES:
+        node = queue.popleft()
+        visited += 1
+        if isinstance(node, dict):
+            if 'Product' in _types_of(node):
+                return _map_json_ld_product(node)
+            if _looks_like_product(node):
+                return _map_state_product(node)
+            queue.extend(v for v in node.values() if isinstance(v, (dict, list)))
+        elif isinstance(node, list):
+            queue.extend(v for v in node if isinstance(v, (dict, list)))
+    return None
+
+
+def _map_state_product(node):
+    product = _empty_product('state')
+    product['title'] = next((node[k] for k in _TITLE_KEYS if isinstance(node.get(k), str)), None)
+    for key in _PRICE_KEYS:
+        if key in node:
+            product['price'] = _price_from_state(node[key])
+            if product['price']:
+                break
+    for key in _ORIGINAL_PRICE_KEYS:
+        if key in node:
+            product['original_price'] = _price_from_state(node[key])
+            break
+    for key in _IMAGE_KEYS:
+        if key in node:
+            product['images'] = _image_urls(node[key])
+            if product['images']:
+                break
+    if isinstance(node.get('description'), str):
+        product['description'] = node['description']
+    currency = node.get('currency') or node.get('currency_id') or node.get('priceCurrency')
+    product['currency'] = currency if isinstance(currency, str) else None
+    return product
+
+
+def _find_assigned_state(html):
+    """Lê o objeto atribuído a window.__PRELOADED_STATE__ = {...}"""
+    match = _ASSIGNED_STATE_RE.search(html)
+    if not match:
+        return None
+    start = match.end()
+    text = html[start:].decode('utf-8', errors='replace')
+    try:
+        state, _ = json.JSONDecoder().raw_decode(text)
+        return state
+    except ValueError:
+        return None
+
+
+def find_structured_products(html):
+    """
+    Localiza e converte todos os blocos de dados estruturados da página
+
+    Args:
+        html (bytes | str): Conteúdo bruto da página
+
+    Returns:
+        list: Dicts de produto, na ordem JSON-LD, __NEXT_DATA__, __PRELOADED_STATE__
+    """
+    if isinstance(html, str):
+        html = html.encode('utf-8', errors='replace')
+    products = []
+
+    for raw in _JSON_LD_RE.findall(html):
+        data = _decode(raw)
+        for node in _iter_json_ld_nodes(data):
+            if _types_of(node) & {'Product', 'ProductGroup'}:
+                products.append(_map_json_ld_product(node))
+
+    states = [(name.decode().strip('_').lower(), _decode(raw)) for name, raw in _SCRIPT_JSON_BY_ID_RE.findall(html)]
+    if not any(name == 'preloaded_state' for name, _ in states):
+        states.append(('preloaded_state', _find_assigned_state(html)))
+    for name, state in states:
+        if state is None:
+            continue
+        product = _find_state_product(state)
+        if product is not None:
+            product['source'] = name
+            products.append(product)
+
+    return products
+
+
+def extract_structured_product(html, base_url=None):
+    """
+    Combina os blocos estruturados em um único produto
+
+    O primeiro bloco com cada campo preenchido vence; as imagens vêm do
+    primeiro bloco que tiver alguma.
+
+    Args:
+        html (bytes | str): Conteúdo bruto da página
+        base_url (str, optional): URL da página, para resolver imagens relativas
+
+    Returns:
+        dict | None: Produto (título, preço, imagens, ...) e 'sources' usados
+    """
+    try:
+        products = find_structured_products(html)
+    except Exception as e:
+        log.warning(f"Erro lendo dados estruturados: {e}")
+        return None
+    if not products:
+        return None
+
+    merged = _empty_product(None)
+    sources = []
+    for product in products:
+        used = False
+        for key, value in product.items():
+            if key == 'source' or value in (None, '', []):
+                continue
+            if merged[key] in (None, '', []):
+                merged[key] = value
+                used = True
+        if used:
+            sources.append(product['source'])
+
+    merged.pop('source')
+    merged['images'] = _normalize_images(merged['images'], base_url)
+    merged['sources'] = sources
+    if not merged['title'] and not merged['images']:
+        return None
+    return merged
+
+
+def is_complete(product):
+    """Produto estruturado completo o bastante para dispensar as estratégias lentas"""
+    return bool(product and product.get('title') and product.get('price') and product.get('images'))
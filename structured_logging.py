@@ -0,0 +1,167 @@
+"""
+Logging estruturado, com níveis e fora do caminho da requisição
+- Cada linha é um JSON (ou texto, com LOG_FORMAT=text) com nível, módulo,
+  mensagem, ID de correlação da requisição e campos extras (extra={...})
+- O ID de correlação vive em um contextvar: segue a requisição pelos
+  executores e pela corrida de estratégias, que já copiam o contexto
+- Os registros vão para uma fila limitada; uma thread escreve no stdout.
+  Com a fila cheia o registro é descartado (e contado) em vez de bloquear
+- Linhas de depuração de alto volume (por candidata, por imagem) podem ser
+  amostradas com extra=SAMPLED
+
+Em laços quentes use argumentos % (log.debug('... %s', x, extra=SAMPLED)):
+a mensagem só é montada se o nível estiver ativo e a linha for amostrada.
+"""
+
+import os
+import sys
+import json
+import uuid
+import queue
+import atexit
+import random
+import logging
+import threading
+import contextvars
+from logging.handlers import QueueHandler, QueueListener
+
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+# json (padrão, para o log drain do Heroku) ou text (leitura no terminal)
+LOG_FORMAT = os.getenv('LOG_FORMAT', 'json').lower()
+# Fração das linhas marcadas com SAMPLED que é mantida
+LOG_SAMPLE_RATE = float(os.getenv('LOG_SAMPLE_RATE', '0.1'))
+LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', '10000'))
+
+ROOT_LOGGER = 'extractor'
+REQUEST_ID_HEADER = 'X-Request-ID'
+
+# Marca uma linha de alto volume para amostragem
+SAMPLED = {'sampled': True}
+
+request_id_var = contextvars.ContextVar('request_id', default='-')
+
+# Atributos padrão do LogRecord: o resto veio de extra={...} e vira campo do JSON
+_RESERVED = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime', 'request_id', 'sampled'}
+
+
+def new_request_id():
+    return uuid.uuid4().hex[:16]
+
+
+def current_request_id():
+    return request_id_var.get()
+
+
+def set_request_id(request_id=None):
+    """Define o ID de correlação do contexto atual; devolve o token para reset_request_id"""
+    return request_id_var.set(request_id or new_request_id())
+
+
+def reset_request_id(token):
+    request_id_var.reset(token)
+
+
+class SamplingFilter(logging.Filter):
+    """Mantém só LOG_SAMPLE_RATE das linhas marcadas com SAMPLED"""
+
+    def __init__(self, rate=LOG_SAMPLE_RATE):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        return not getattr(record, 'sampled', False) or random.random() < self.rate
+
+
+class DroppingQueueHandler(QueueHandler):
+    """
+    QueueHandler que nunca bloqueia a thread da requisição
+
+    A mensagem é montada aqui (com o ID de correlação do contexto atual); a
+    serialização e a escrita ficam com a thread do QueueListener.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        record.request_id = request_id_var.get()
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'ts': round(record.created, 3),
+            'level': record.levelname.lower(),
+            'logger': record.name,
+            'request_id': getattr(record, 'request_id', '-'),
+            'msg': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RESERVED and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__('%(asctime)s %(levelname)-7s [%(request_id)s] %(name)s: %(message)s')
+
+    def format(self, record):
+        line = super().format(record)
+        fields = {key: value for key, value in vars(record).items()
+                  if key not in _RESERVED and not key.startswith('_')}
+        if fields:
+            line += ' ' + ' '.join(f'{key}={value}' for key, value in fields.items())
+        return line
+
+
+_setup_lock = threading.Lock()
+_queue_handler = None
+_listener = None
+
+
+def setup_logging(level=LOG_LEVEL, fmt=LOG_FORMAT):
+    """Configura o logger raiz 'extractor' (idempotente)"""
+    global _queue_handler, _listener
+    with _setup_lock:
+        if _queue_handler is not None:
+            return
+        stream = logging.StreamHandler(sys.stdout)
+        stream.setFormatter(TextFormatter() if fmt == 'text' else JsonFormatter())
+        _queue_handler = DroppingQueueHandler(queue.Queue(maxsize=LOG_QUEUE_SIZE))
+        _queue_handler.addFilter(SamplingFilter())
+        _listener = QueueListener(_queue_handler.queue, stream, respect_handler_level=False)
+        _listener.start()
+        atexit.register(_listener.stop)
+
+        root = logging.getLogger(ROOT_LOGGER)
+        root.setLevel(level)
+        root.addHandler(_queue_handler)
+        root.propagate = False
+
+
+def get_logger(name):
+    """Logger do módulo (ex.: get_logger('hedge') -> 'extractor.hedge')"""
+    setup_logging()
+    return logging.getLogger(f'{ROOT_LOGGER}.{name}')
+
+
+def dropped_records():
+    """Registros descartados com a fila cheia"""
+    return _queue_handler.dropped if _queue_handler is not None else 0
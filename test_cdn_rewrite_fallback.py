@@ -0,0 +1,79 @@
+"""
+Reescritas de CDN que não existem
+A URL da maior resolução (cdn_rules) é um palpite: se a sondagem dela falha
+(404), a candidata volta para a URL original da página, e a entrada negativa
+no cache evita a reescrita nas próximas extrações.
+
+Uso:
+    python -m pytest -q test_cdn_rewrite_fallback.py
+"""
+
+import pytest
+from bs4 import BeautifulSoup
+
+import image_probe
+import image_extractor
+from image_probe import ImageProbe, ProbeCache
+from image_extractor import create_image_info, canonicalize_candidates, select_top_images, probe_image_sizes
+from kabum_extractor import collect_kabum_images
+
+ORIGINAL = 'https://http2.mlstatic.com/D_Q_NP_645678-MLB7123456792_012024-V.webp'
+REWRITTEN = 'https://http2.mlstatic.com/D_NQ_NP_2X_645678-MLB7123456792_012024-F.webp'
+KABUM_ORIGINAL = 'https://images.kabum.com.br/produtos/fotos/512345/notebook_g.jpg'
+KABUM_REWRITTEN = 'https://images.kabum.com.br/produtos/fotos/512345/notebook_gg.jpg'
+
+
+@pytest.fixture
+def probed_urls(monkeypatch):
+    """Cache de sondagens vazio e uma CDN em que só as URLs originais existem"""
+    cache = ProbeCache(db_path='')
+    monkeypatch.setattr(image_probe, 'probe_cache', cache)
+    monkeypatch.setattr(image_extractor, 'probe_cache', cache)
+    requested = []
+
+    def fake_probe_image(url, proxies=None, timeout=None):
+        requested.append(url)
+        if url in (REWRITTEN, KABUM_REWRITTEN):
+            return None
+        return ImageProbe('webp', 800, 800, file_size_bytes=50_000)
+
+    monkeypatch.setattr(image_probe, 'probe_image', fake_probe_image)
+    return requested
+
+
+def test_missing_rewrite_falls_back_to_original(probed_urls):
+    candidates = canonicalize_candidates([create_image_info(ORIGINAL, {'alt': 'Smartphone'}, 'Mercado Livre')])
+    assert candidates[0]['url'] == REWRITTEN
+
+    top = select_top_images(candidates, 'Mercado Livre', limit=1)
+
+    assert probed_urls == [REWRITTEN, ORIGINAL]
+    assert top[0]['url'] == ORIGINAL
+    assert 'original_url' not in top[0]
+    assert (top[0]['pixel_width'], top[0]['pixel_height']) == (800, 800)
+
+
+def test_known_missing_rewrite_is_not_applied_again(probed_urls):
+    first = canonicalize_candidates([create_image_info(ORIGINAL, {}, 'Mercado Livre')])
+    select_top_images(first, 'Mercado Livre', limit=1)
+
+    again = canonicalize_candidates([create_image_info(ORIGINAL, {}, 'Mercado Livre')])
+
+    assert again[0]['url'] == ORIGINAL
+    assert 'original_url' not in again[0]
+
+
+def test_kabum_rewrite_falls_back_to_original(probed_urls):
+    image = {'url': KABUM_REWRITTEN, 'original_url': KABUM_ORIGINAL, 'probed': False, 'file_size_bytes': 0}
+
+    probe_image_sizes([image])
+
+    assert image['url'] == KABUM_ORIGINAL
+    assert image['pixel_width'] == 800
+
+
+def test_kabum_collection_keeps_original_url(probed_urls):
+    soup = BeautifulSoup(f'<img class="gallery-image" src="{KABUM_ORIGINAL}" alt="Notebook">', 'html.parser')
+    images = collect_kabum_images(soup, 'https://www.kabum.com.br/produto/512345')
+
+    assert [(img['url'], img['original_url']) for img in images] == [(KABUM_REWRITTEN, KABUM_ORIGINAL)]
@@ -0,0 +1,72 @@
+"""
+Tabela de verificação das regras de CDN (cdn_rules.py)
+Para cada CDN, variantes de tamanho da mesma foto: identidade comum e URL da
+maior resolução.
+
+Uso:
+    python -m pytest -q test_cdn_rules.py
+"""
+
+import pytest
+
+from cdn_rules import CDN_RULES, canonical_image_id, max_resolution_url
+
+
+CDN_CASES = [
+    # (URL, identidade, URL de maior resolução)
+    ('https://http2.mlstatic.com/D_Q_NP_645678-MLB7123456792_012024-V.webp',
+     'mlstatic:645678-MLB7123456792_012024',
+     'https://http2.mlstatic.com/D_NQ_NP_2X_645678-MLB7123456792_012024-F.webp'),
+    ('https://http2.mlstatic.com/D_NQ_NP_2X_645678-MLB7123456792_012024-F.jpg',
+     'mlstatic:645678-MLB7123456792_012024',
+     'https://http2.mlstatic.com/D_NQ_NP_2X_645678-MLB7123456792_012024-F.jpg'),
+    ('https://m.media-amazon.com/images/I/71Qe6uTq9cL._AC_SX679_.jpg',
+     'amazon:71Qe6uTq9cL',
+     'https://m.media-amazon.com/images/I/71Qe6uTq9cL._AC_SL1500_.jpg'),
+    ('https://m.media-amazon.com/images/I/71Qe6uTq9cL.jpg',
+     'amazon:71Qe6uTq9cL',
+     'https://m.media-amazon.com/images/I/71Qe6uTq9cL._AC_SL1500_.jpg'),
+    # O id é preguiçoso: o _tn final não entra na identidade
+    ('https://down-br.img.susercontent.com/file/br-11134207-7r98o-lm1abc2def3g45_tn',
+     'shopee:br-11134207-7r98o-lm1abc2def3g45',
+     'https://down-br.img.susercontent.com/file/br-11134207-7r98o-lm1abc2def3g45'),
+    ('https://cf.shopee.com.br/file/8c1f0e2d3b4a5968_tn.webp',
+     'shopee:8c1f0e2d3b4a5968',
+     'https://cf.shopee.com.br/file/8c1f0e2d3b4a5968.webp'),
+    ('https://ae01.alicdn.com/kf/S1a2b3c4d5e6f.jpg_80x80.jpg',
+     'alicdn:S1a2b3c4d5e6f.jpg',
+     'https://ae01.alicdn.com/kf/S1a2b3c4d5e6f.jpg'),
+    ('https://ae01.alicdn.com/kf/S1a2b3c4d5e6f.jpg_Q90.jpg_.webp',
+     'alicdn:S1a2b3c4d5e6f.jpg',
+     'https://ae01.alicdn.com/kf/S1a2b3c4d5e6f.jpg'),
+    ('https://americanas.vtexassets.com/arquivos/ids/123456-500-500/produto.jpg?v=638',
+     'vtex:americanas.vtexassets.com:123456',
+     'https://americanas.vtexassets.com/arquivos/ids/123456/produto.jpg?v=638'),
+    ('https://www.casasbahia.com.br/arquivos/ids/98765/foto.png',
+     'vtex:www.casasbahia.com.br:98765',
+     'https://www.casasbahia.com.br/arquivos/ids/98765/foto.png'),
+    # _g e _gg são a mesma foto (o _gg não pode virar id "..._g" + "g")
+    ('https://images.kabum.com.br/produtos/fotos/sync_mirakl/512345/Notebook-Z_1_1699999999_g.jpg',
+     'kabum:sync_mirakl/512345/Notebook-Z_1_1699999999',
+     'https://images.kabum.com.br/produtos/fotos/sync_mirakl/512345/Notebook-Z_1_1699999999_gg.jpg'),
+    ('https://images.kabum.com.br/produtos/fotos/sync_mirakl/512345/Notebook-Z_1_1699999999_gg.jpg',
+     'kabum:sync_mirakl/512345/Notebook-Z_1_1699999999',
+     'https://images.kabum.com.br/produtos/fotos/sync_mirakl/512345/Notebook-Z_1_1699999999_gg.jpg'),
+    ('https://images.kabum.com.br/produtos/fotos/512345/notebook_p.jpg',
+     'kabum:512345/notebook',
+     'https://images.kabum.com.br/produtos/fotos/512345/notebook_gg.jpg'),
+    # CDN desconhecida: sem identidade, URL inalterada
+    ('https://loja.exemplo.com.br/img/cafeteira_g.jpg', None, 'https://loja.exemplo.com.br/img/cafeteira_g.jpg'),
+]
+
+
+@pytest.mark.parametrize('url, identity, max_url', CDN_CASES)
+def test_cdn_rules(url, identity, max_url):
+    assert canonical_image_id(url) == identity
+    assert max_resolution_url(url) == max_url
+
+
+def test_cdn_rules_table_covers_every_rule():
+    covered = {canonical_image_id(url).split(':')[0] for url, identity, _ in CDN_CASES if identity}
+    prefixes = {rule.identity.split(':')[0] for rule in CDN_RULES}
+    assert prefixes <= covered
@@ -0,0 +1,105 @@
+"""
+Tabela de verificação de parse_image_header (image_probe.py)
+Cabeçalhos montados byte a byte a partir das especificações: offsets do SOF
+do JPEG, VP8/VP8L/VP8X do WebP e ispe do AVIF, além dos cortes que pedem mais
+bytes (NeedMoreData).
+
+Uso:
+    python -m pytest -q test_image_probe.py
+"""
+
+import struct
+
+import pytest
+
+from image_probe import parse_image_header, NeedMoreData
+
+
+def _segment(marker, payload):
+    return b'\xff' + bytes([marker]) + struct.pack('>H', len(payload) + 2) + payload
+
+
+def jpeg(width, height, sof=0xC0, before_sof=()):
+    """SOI, APP0 (JFIF), segmentos extras e o SOF com altura/largura"""
+    data = b'\xff\xd8' + _segment(0xE0, b'JFIF\x00\x01\x01\x00\x00\x01\x00\x01\x00\x00')
+    for marker, payload in before_sof:
+        data += _segment(marker, payload)
+    return data + _segment(sof, struct.pack('>BHHB', 8, height, width, 3) + b'\x01\x22\x00' * 3)
+
+
+def _riff(chunk, payload):
+    body = b'WEBP' + chunk + struct.pack('<I', len(payload)) + payload
+    return b'RIFF' + struct.pack('<I', len(body)) + body
+
+
+def webp_vp8(width, height, scale=0):
+    # Tag do quadro (3 bytes), assinatura 9d 01 2a, largura/altura com 2 bits de escala
+    payload = b'\x50\x02\x00' + b'\x9d\x01\x2a' + struct.pack('<HH', width | scale << 14, height | scale << 14)
+    return _riff(b'VP8 ', payload + b'\x00' * 8)
+
+
+def webp_vp8l(width, height):
+    # Assinatura 0x2f e (largura-1) | (altura-1) << 14 em 28 bits little-endian
+    bits = (width - 1) | (height - 1) << 14
+    return _riff(b'VP8L', b'\x2f' + bits.to_bytes(4, 'little') + b'\x00' * 8)
+
+
+def webp_vp8x(width, height):
+    # Flags (4 bytes) e (largura-1)/(altura-1) em 24 bits little-endian
+    payload = b'\x10\x00\x00\x00' + (width - 1).to_bytes(3, 'little') + (height - 1).to_bytes(3, 'little')
+    return _riff(b'VP8X', payload)
+
+
+def _box(kind, payload):
+    return struct.pack('>I', len(payload) + 8) + kind + payload
+
+
+def avif(*sizes, mdat=False):
+    """ftyp avif + meta com um ispe (versão/flags, largura, altura) por tamanho"""
+    ftyp = _box(b'ftyp', b'avif' + b'\x00\x00\x00\x00' + b'mif1miaf')
+    ispes = b''.join(_box(b'ispe', b'\x00\x00\x00\x00' + struct.pack('>II', w, h)) for w, h in sizes)
+    data = ftyp + _box(b'meta', b'\x00\x00\x00\x00' + _box(b'iprp', _box(b'ipco', ispes)))
+    if mdat:
+        data += _box(b'mdat', b'\x00' * 64)
+    return data
+
+
+HEADER_CASES = [
+    # (caso, bytes, resultado esperado)
+    ('jpeg baseline', jpeg(1200, 800), ('jpeg', 1200, 800)),
+    ('jpeg progressivo (SOF2)', jpeg(640, 480, sof=0xC2), ('jpeg', 640, 480)),
+    ('jpeg com DQT/DHT antes do SOF', jpeg(1500, 1500, before_sof=[(0xDB, b'\x00' * 65), (0xC4, b'\x00' * 30)]),
+     ('jpeg', 1500, 1500)),
+    ('jpeg com preenchimento 0xFF', jpeg(300, 200).replace(b'\xff\xc0', b'\xff\xff\xff\xc0'), ('jpeg', 300, 200)),
+    ('jpeg com SOS antes do SOF', b'\xff\xd8' + _segment(0xDA, b'\x00' * 10), None),
+    ('png', b'\x89PNG\r\n\x1a\n' + struct.pack('>I', 13) + b'IHDR' + struct.pack('>II', 1000, 750) + b'\x08\x06\x00\x00\x00',
+     ('png', 1000, 750)),
+    ('gif', b'GIF89a' + struct.pack('<HH', 320, 240) + b'\x00' * 8, ('gif', 320, 240)),
+    ('webp VP8', webp_vp8(1024, 768), ('webp', 1024, 768)),
+    ('webp VP8 com bits de escala', webp_vp8(800, 600, scale=1), ('webp', 800, 600)),
+    ('webp VP8L', webp_vp8l(500, 16383), ('webp', 500, 16383)),
+    ('webp VP8X', webp_vp8x(2000, 3000), ('webp', 2000, 3000)),
+    ('avif', avif((1920, 1080)), ('avif', 1920, 1080)),
+    ('avif com miniatura (vale o maior ispe)', avif((160, 90), (1920, 1080)), ('avif', 1920, 1080)),
+    ('avif sem ispe antes do mdat', avif(mdat=True), None),
+    ('html', b'<!DOCTYPE html><html><head><title>x</title></head></html>', None),
+]
+
+TRUNCATED_CASES = [
+    ('jpeg cortado antes do SOF', jpeg(1200, 800, before_sof=[(0xDB, b'\x00' * 65)])[:40]),
+    ('jpeg cortado no meio do SOF', jpeg(1200, 800)[:24]),
+    ('png só com a assinatura', b'\x89PNG\r\n\x1a\n'),
+    ('webp VP8 cortado', webp_vp8(1024, 768)[:28]),
+    ('avif cortado antes do ispe', avif((1920, 1080))[:40]),
+]
+
+
+@pytest.mark.parametrize('data, expected', [case[1:] for case in HEADER_CASES], ids=[case[0] for case in HEADER_CASES])
+def test_parse_image_header(data, expected):
+    assert parse_image_header(data) == expected
+
+
+@pytest.mark.parametrize('data', [case[1] for case in TRUNCATED_CASES], ids=[case[0] for case in TRUNCATED_CASES])
+def test_parse_image_header_needs_more_data(data):
+    with pytest.raises(NeedMoreData):
+        parse_image_header(data)
@@ -0,0 +1,62 @@
+"""
+Roteamento de estratégias a partir das corridas com hedge
+Uma estratégia que desiste porque outra já leu a página (Chrome da Amazon
+depois do amazon_http) não pode ser rebaixada nem pulada no host.
+
+Uso:
+    python -m pytest -q test_strategy_router.py
+"""
+
+import threading
+
+from strategy_race import Strategy, race
+from strategy_router import StrategyRouter, ROUTER_MIN_SAMPLES
+
+URL = 'https://www.amazon.com.br/dp/B0TESTE001'
+POLICY = [('amazon_http', 0.0), ('selenium', 0.0)]
+
+
+def run_amazon_race(router, selenium_gives_up):
+    """Corrida em que o HTTP lê a página, mas só com resultado aceitável (poucas imagens)"""
+    page_read = threading.Event()
+
+    def amazon_http(token):
+        page_read.set()
+        return ['https://m.media-amazon.com/images/I/foto.jpg']
+
+    def selenium(token):
+        page_read.wait(5)
+        if selenium_gives_up:
+            token.cancel()
+        return None
+
+    runners = {'amazon_http': amazon_http, 'selenium': selenium}
+    strategies = [Strategy(name, runners[name], delay) for name, delay in router.plan(URL, POLICY)]
+    outcome = race(strategies, is_complete=lambda images: bool(images and len(images) >= 3), store='amazon')
+    router.record_outcome(URL, outcome)
+    return outcome
+
+
+def test_selenium_that_gives_up_is_not_demoted():
+    router = StrategyRouter(db_path='')
+    for _ in range(ROUTER_MIN_SAMPLES * 3):
+        outcome = run_amazon_race(router, selenium_gives_up=True)
+        assert outcome.winner == 'amazon_http'
+        assert 'selenium' not in outcome.statuses
+
+    table = router.table()['hosts']['amazon.com.br']
+    assert 'selenium' not in table
+    assert table['amazon_http']['attempts'] == ROUTER_MIN_SAMPLES * 3
+    assert 'selenium' in [name for name, _ in router.plan(URL, POLICY)]
+
+
+def test_selenium_that_fails_is_skipped():
+    # Controle: uma falha de verdade continua rebaixando a estratégia
+    router = StrategyRouter(db_path='')
+    for _ in range(ROUTER_MIN_SAMPLES):
+        run_amazon_race(router, selenium_gives_up=False)
+
+    table = router.table()['hosts']['amazon.com.br']
+    assert table['selenium']['success_rate'] == 0.0
+    plans = [[name for name, _ in router.plan(URL, POLICY)] for _ in range(50)]
+    assert any('selenium' not in plan for plan in plans)